@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Count
 from django.utils import timezone
@@ -12,11 +13,16 @@ from .authentication import CookieJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from .permissions import IsAdminUserStrict
-from .models import MLModel, InferenceEvent
-from .serializers import MLModelSerializer, MLModelListSerializer
+from .models import InferenceEvent, MLModel, ModelUpload
+from . import profiling, rollups, uploads
+from .serializers import MLModelSerializer, MLModelListSerializer, ModelUploadSerializer
 
 from django.contrib.auth import get_user_model
 
+from inference import metrics, shadow
+from inference.backends import BACKENDS, artifact_path
+from inference.predictor import cascade_plan, request_model_refresh, shadow_candidates
+
 
 
 @api_view(["GET"])
@@ -26,15 +32,9 @@ def admin_overview(request):
     enabled_models = MLModel.objects.filter(enabled=True).count()
     active = MLModel.objects.filter(is_active=True).first()
 
-    # last 7 days inference counts
+    # last 7 days inference counts (pre-aggregated, see api/rollups.py)
     since = timezone.now() - timedelta(days=7)
-    daily = (
-        InferenceEvent.objects.filter(created_at__gte=since)
-        .extra(select={"day": "date(created_at)"})
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
+    daily = rollups.daily_counts(since)
 
     # unique users last 7d
     User = get_user_model()
@@ -51,7 +51,8 @@ def admin_overview(request):
             "usage": {
                 "active_users_7d": registrations_7d,
 
-                "daily_inferences_7d": list(daily),
+                "daily_inferences_7d": daily,
+                "by_model_7d": rollups.per_model(since),
             },
         }
     )
@@ -60,10 +61,47 @@ def admin_overview(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUserStrict])
 def admin_models_list(request):
+    profiling.expire_stale()
     qs = MLModel.objects.all().order_by("-created_at")
     return Response(MLModelListSerializer(qs, many=True).data)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_model_usage(request, model_id: int):
+    if not MLModel.objects.filter(id=model_id).exists():
+        return Response({"detail": "Model not found"}, status=404)
+
+    now = timezone.now()
+    summary = rollups.per_model(now - timedelta(days=7), model_id=model_id)
+    return Response(
+        {
+            "model_id": model_id,
+            "last_7d": summary[0] if summary else None,
+            "hourly_24h": rollups.hourly(now - timedelta(hours=24), model_id=model_id),
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_model_metrics(request, model_id: int):
+    """
+    Latency (decode/preprocess/queue/forward/postprocess/total) p50/p95/p99,
+    confidence distribution and per-class counts for one model.
+    ?hours=N (default 24, max 720) selects the window.
+    """
+    if not MLModel.objects.filter(id=model_id).exists():
+        return Response({"detail": "Model not found"}, status=404)
+    try:
+        hours = min(720, max(1, int(request.query_params.get("hours", 24))))
+    except ValueError:
+        return Response({"detail": "hours must be an integer"}, status=400)
+
+    since = (timezone.now() - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
+    return Response({"model_id": model_id, "hours": hours, **metrics.read(model_id, since).summary()})
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsAdminUserStrict])
 @parser_classes([MultiPartParser, FormParser])
@@ -94,8 +132,92 @@ def admin_models_upload(request):
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
     m = ser.save(created_by=request.user)
+    profiling.schedule(m)
     return Response(MLModelSerializer(m).data, status=status.HTTP_201_CREATED)
 
+# ---- chunked, resumable uploads (api/uploads.py) ----
+def _get_upload(upload_id):
+    return ModelUpload.objects.filter(id=upload_id).select_related("model").first()
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_upload_start(request):
+    """
+    JSON: name, arch, version (optional), description (optional),
+    filename, size (total bytes). Then PUT the bytes to the returned id.
+    """
+    ser = ModelUploadSerializer(data=request.data)
+    if not ser.is_valid():
+        return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    meta = {k: ser.validated_data[k] for k in ("name", "arch", "version", "description") if k in ser.validated_data}
+    upload = uploads.start(request.user, meta, ser.validated_data["filename"], ser.validated_data["size"])
+    data = ModelUploadSerializer(upload).data
+    data["chunk_size"] = getattr(settings, "MODEL_UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024)
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_upload_chunk(request, upload_id):
+    """
+    GET: current offset (resume from there).
+    PUT: raw bytes (application/octet-stream) with Upload-Offset (or ?offset=)
+         equal to the current offset; 409 + {"offset"} otherwise.
+    DELETE: abort and remove the partial file.
+    """
+    upload = _get_upload(upload_id)
+    if not upload:
+        return Response({"detail": "Upload not found"}, status=404)
+
+    if request.method == "GET":
+        return Response(ModelUploadSerializer(upload).data)
+    if request.method == "DELETE":
+        uploads.abort(upload)
+        return Response({"detail": "deleted"}, status=204)
+
+    try:
+        offset = int(request.headers.get("Upload-Offset") or request.query_params.get("offset") or 0)
+        length = int(request.headers.get("Content-Length") or -1)
+    except ValueError:
+        return Response({"detail": "Upload-Offset and Content-Length must be integers"}, status=400)
+    if length < 0:
+        return Response({"detail": "Content-Length required"}, status=status.HTTP_411_LENGTH_REQUIRED)
+    limit = getattr(settings, "MODEL_UPLOAD_CHUNK_MAX_BYTES", 64 * 1024 * 1024)
+    if length > limit:
+        return Response({"detail": f"Chunk too large; max {limit} bytes."}, status=413)
+
+    try:
+        received = uploads.write_chunk(upload, offset, request.stream, length) if length else upload.received
+    except uploads.UploadConflict as e:
+        return Response({"detail": "Offset mismatch or chunk in progress", "offset": e.offset}, status=409)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+    return Response({"offset": received, "size": upload.size}, headers={"Upload-Offset": str(received)})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_upload_complete(request, upload_id):
+    """Optional JSON: sha256 (hex) to verify. Creates the MLModel (not served until activated)."""
+    upload = _get_upload(upload_id)
+    if not upload:
+        return Response({"detail": "Upload not found"}, status=404)
+
+    try:
+        m = uploads.finish(upload, sha256=str(request.data.get("sha256") or ""))
+    except uploads.UploadConflict as e:
+        return Response({"detail": "Upload incomplete", "offset": e.offset, "size": upload.size}, status=409)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+
+    profiling.schedule(m)
+    data = MLModelSerializer(m).data
+    data["sha256"] = upload.sha256
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsAdminUserStrict])
 def admin_models_toggle(request, model_id: int):
@@ -112,6 +234,7 @@ def admin_models_toggle(request, model_id: int):
     if not m.enabled and m.is_active:
         m.is_active = False
     m.save(update_fields=["enabled", "is_active"])
+    request_model_refresh()
     return Response({"detail": "ok", "model": MLModelListSerializer(m).data})
 
 
@@ -124,14 +247,187 @@ def admin_models_set_active(request, model_id: int):
     if not m.enabled:
         return Response({"detail": "Cannot activate a disabled model"}, status=400)
 
+    # gate on the upload profile (api/profiling.py); {"force": true} overrides all but a run in progress
+    if profiling.expire_stale():
+        m.refresh_from_db()
+    blocker = profiling.activation_blocker(m, MLModel.objects.filter(is_active=True).first(),
+                                           force=bool(request.data.get("force")))
+    if blocker:
+        return Response({"detail": blocker, "model": MLModelListSerializer(m).data}, status=409)
+
     with transaction.atomic():
         MLModel.objects.filter(is_active=True).update(is_active=False)
         m.is_active = True
         m.save(update_fields=["is_active"])
 
+    request_model_refresh()
     return Response({"detail": "ok", "active": MLModelListSerializer(m).data})
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_profile(request, model_id: int):
+    """Re-run the background performance profile (e.g. after moving to new hardware)."""
+    profiling.expire_stale()
+    m = MLModel.objects.filter(id=model_id).first()
+    if not m:
+        return Response({"detail": "Model not found"}, status=404)
+    if m.profile_status == MLModel.PROFILE_PENDING:
+        return Response({"detail": "Profiling already in progress"}, status=409)
+    if not profiling.schedule(m):
+        return Response({"detail": "Profiling is disabled (INFER_PROFILE_ON_UPLOAD)"}, status=400)
+    return Response({"detail": "ok", "model": MLModelListSerializer(m).data}, status=202)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_cascade(request, model_id: int):
+    """
+    Configure a model as an early-exit cascade stage:
+      - enabled (optional): take part in the cascade
+      - threshold (optional): top-1 confidence at which its answer is final,
+        0 < threshold <= 1, or null for INFER_CASCADE_DEFAULT_THRESHOLD
+    """
+    m = MLModel.objects.filter(id=model_id).first()
+    if not m:
+        return Response({"detail": "Model not found"}, status=404)
+
+    fields = []
+    if "enabled" in request.data:
+        m.cascade_enabled = str(request.data["enabled"]).lower() in ("1", "true")
+        fields.append("cascade_enabled")
+    if "threshold" in request.data:
+        threshold = request.data["threshold"]
+        if threshold in (None, ""):
+            m.cascade_threshold = None
+        else:
+            try:
+                m.cascade_threshold = float(threshold)
+            except (TypeError, ValueError):
+                return Response({"detail": "threshold must be a number"}, status=400)
+            if not 0.0 < m.cascade_threshold <= 1.0:
+                return Response({"detail": "threshold must be in (0, 1]"}, status=400)
+        fields.append("cascade_threshold")
+    if not fields:
+        return Response({"detail": "enabled or threshold is required"}, status=400)
+
+    m.save(update_fields=fields)
+    request_model_refresh()
+    return Response({"detail": "ok", "model": MLModelListSerializer(m).data})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_cascade(request):
+    """
+    The configured cascade, cheapest stage first, then the active model, with
+    traffic over ?hours=N (default 24, max 720): frames that reached each stage,
+    how many it answered and its escalation rate. Counted from the stage each
+    InferenceEvent was answered by, so cache hits and frames served under a
+    different chain (a stage at another position) are left out.
+    """
+    try:
+        hours = min(720, max(1, int(request.query_params.get("hours", 24))))
+    except ValueError:
+        return Response({"detail": "hours must be an integer"}, status=400)
+
+    stages, active = cascade_plan()
+    since = timezone.now() - timedelta(hours=hours)
+    answered = {
+        (r["cascade_stage"], r["model_id"]): r["n"]
+        for r in InferenceEvent.objects.filter(created_at__gte=since, cascade_stage__isnull=False)
+        .values("cascade_stage", "model_id").annotate(n=Count("id"))
+    }
+
+    chain = [(m, threshold) for (m, threshold) in stages] + [(active, None)]
+    counts = [answered.get((i, m.id if m is not None else None), 0) for i, (m, _) in enumerate(chain)]
+    reached = sum(counts)
+    total, out = reached, []
+    for (m, threshold), n in zip(chain, counts):
+        out.append({
+            "model_id": m.id if m is not None else None,
+            "name": m.name if m is not None else "bundled weights",
+            "arch": m.arch if m is not None else "effnet_b0",
+            "threshold": threshold,
+            "reached": reached,
+            "answered": n,
+            "escalation_rate": round((reached - n) / reached, 4) if reached and threshold is not None else None,
+        })
+        reached -= n
+
+    return Response({
+        "enabled": settings.INFER_CASCADE_ENABLED,
+        "hours": hours,
+        "frames": total,
+        "stages": out,
+        # share of all frames the active (most expensive) model had to run on
+        "escalated_to_final": round(out[-1]["answered"] / total, 4) if total else None,
+    })
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_models_shadow(request, model_id: int):
+    """
+    enabled: evaluate this model on sampled live frames (inference/shadow.py,
+    needs INFER_SHADOW_SAMPLE_RATE > 0). The active model is never shadowed.
+    """
+    enabled = request.data.get("enabled")
+    if enabled is None:
+        return Response({"detail": "enabled is required"}, status=400)
+
+    m = MLModel.objects.filter(id=model_id).first()
+    if not m:
+        return Response({"detail": "Model not found"}, status=404)
+
+    m.shadow_enabled = str(enabled).lower() in ("1", "true")
+    m.save(update_fields=["shadow_enabled"])
+    return Response({"detail": "ok", "model": MLModelListSerializer(m).data})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUserStrict])
+def admin_shadow(request):
+    """
+    Shadow results over ?hours=N (default 24, max 720), per candidate and the
+    model that served the frames: top-1 / top-3 agreement with the served
+    answer and the candidate's forward latency, next to the served model's
+    own forward latency from the serving metrics.
+    """
+    try:
+        hours = min(720, max(1, int(request.query_params.get("hours", 24))))
+    except ValueError:
+        return Response({"detail": "hours must be an integer"}, status=400)
+
+    since = timezone.now() - timedelta(hours=hours)
+    stats = shadow.read(since)
+    candidates = {m.id: m for m in shadow_candidates()}
+    names = dict(MLModel.objects.filter(id__in={k for pair in stats for k in pair} | set(candidates))
+                 .values_list("id", "name"))
+
+    served_latency = {}
+    out = []
+    for (model_id, served_id), st in sorted(stats.items(), key=lambda kv: (kv[0][0], kv[0][1] or 0)):
+        if served_id not in served_latency:
+            served_latency[served_id] = metrics.read(served_id, since).summary()["latency_ms"].get("forward")
+        out.append({
+            "model_id": model_id,
+            "name": names.get(model_id),
+            "shadowing": model_id in candidates,
+            "served_model_id": served_id,
+            "served_name": names.get(served_id, "bundled weights" if served_id is None else None),
+            **st.summary(),
+            "served_forward_ms": served_latency[served_id],
+        })
+
+    return Response({
+        "sample_rate": settings.INFER_SHADOW_SAMPLE_RATE,
+        "hours": hours,
+        "candidates": [{"model_id": m.id, "name": m.name, "arch": m.arch} for m in candidates.values()],
+        "results": out,
+    })
+
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated, IsAdminUserStrict])
 def admin_models_delete(request, model_id: int):
@@ -139,10 +435,14 @@ def admin_models_delete(request, model_id: int):
     if not m:
         return Response({"detail": "Model not found"}, status=404)
 
-    # delete file from disk first
+    # delete files from disk first: the converted artifacts next to the .pth, then the .pth
     if m.file:
+        for backend in BACKENDS:
+            if backend != "eager":
+                artifact_path(m.file.path, backend).unlink(missing_ok=True)
         m.file.delete(save=False)
 
     m.delete()
+    request_model_refresh()
     return Response({"detail": "deleted"}, status=204)
 
@@ -1,5 +1,16 @@
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from inference.telemetry import AUTH_SECONDS, AUTH_USER_CACHE
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -9,6 +20,16 @@ class CookieJWTAuthentication(JWTAuthentication):
     """
 
     def authenticate(self, request):
+        t0 = time.perf_counter()
+        result = "failed"
+        try:
+            user_auth = self._authenticate(request)
+            result = "anonymous" if user_auth is None else "ok"
+            return user_auth
+        finally:
+            AUTH_SECONDS.observe(time.perf_counter() - t0, result)
+
+    def _authenticate(self, request):
         # 1. Try Authorization header first
         header = self.get_header(request)
         if header is not None:
@@ -21,3 +42,86 @@ class CookieJWTAuthentication(JWTAuthentication):
 
         validated_token = self.get_validated_token(raw_token)
         return self.get_user(validated_token), validated_token
+
+
+class UserCache:
+    """Bounded TTL map user id -> User, for this process only (ids keyed as str: token claims are strings)."""
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10000):
+        self.ttl = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._users = OrderedDict()  # user id -> (expires_at, user)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            item = self._users.get(user_id)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._users[user_id]
+                return None
+            return item[1]
+
+    def put(self, user_id, user):
+        user_id = str(user_id)
+        with self._lock:
+            self._users[user_id] = (time.monotonic() + self.ttl, user)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(
+    ttl_seconds=getattr(settings, "INFER_AUTH_USER_CACHE_SECONDS", 30),
+    max_entries=getattr(settings, "INFER_AUTH_USER_CACHE_SIZE", 10000),
+)
+
+
+class InferenceJWTAuthentication(CookieJWTAuthentication):
+    """
+    Per-frame auth for the inference endpoints.
+
+    The access token's signature and expiry are checked on every request as
+    usual, but the user is resolved from `user_cache` instead of one User
+    query per frame. A user saved or deleted in this process is evicted
+    right away (api/signals.py); other processes notice within
+    INFER_AUTH_USER_CACHE_SECONDS. Deactivation and, with CHECK_REVOKE_TOKEN,
+    password changes are re-checked against the cached row.
+
+    Only access tokens are accepted (AUTH_TOKEN_CLASSES). SIMPLE_JWT's
+    BLACKLIST_AFTER_ROTATION applies to refresh tokens only, and only when
+    rest_framework_simplejwt.token_blacklist is installed; access tokens are
+    never looked up in the blacklist, so this path stays DB-free either way.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            AUTH_USER_CACHE.inc("miss")
+            user = super().get_user(validated_token)  # DB lookup + active / revoke checks
+            user_cache.put(user_id, user)
+            return user
+
+        AUTH_USER_CACHE.inc("hit")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
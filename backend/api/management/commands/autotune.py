@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import time
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import MLModel
+from inference import predictor, tuning
+from inference.backends import artifact_path, load_artifact
+from inference.model_manager import ModelSpec, load_model
+from inference.preprocess import INPUT_SIZE
+from inference.profiling import percentile
+
+
+def _ints(value: str):
+    return [int(v) for v in str(value).split(",") if v.strip()]
+
+
+def _powers_of_two(limit: int):
+    n, out = 1, []
+    while n <= limit:
+        out.append(n)
+        n *= 2
+    return out
+
+
+def _bench_worker(model, cpus, threads: int, batch_sizes, seconds: float, barrier, results):
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+    for b in batch_sizes:
+        x = torch.randn(b, 3, INPUT_SIZE, INPUT_SIZE)
+        times = []
+        with torch.inference_mode():
+            model(x)
+            model(x)
+            barrier.wait()  # all workers contend for the CPU at the same time
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                model(x)
+                times.append((time.perf_counter() - t0) * 1000)
+        results.put((b, times))
+
+
+def measure(model, cpus, workers: int, threads: int, batch_sizes, seconds: float, pin: bool = True):
+    """Run `workers` forked processes of `threads` torch threads each; one result row per batch size."""
+    ctx = multiprocessing.get_context("fork")
+    sets = tuning.cpu_sets(cpus, workers, threads)
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [
+        ctx.Process(target=_bench_worker, args=(model, sets[w] if pin else None, threads, batch_sizes, seconds,
+                                                barrier, results), daemon=True)
+        for w in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    rows = []
+    try:
+        for b in batch_sizes:
+            times = []
+            calls = 0
+            for _ in range(workers):
+                _, t = results.get(timeout=seconds * 10 + 120)
+                times.extend(t)
+                calls += len(t)
+            times.sort()
+            rows.append({
+                "workers": workers,
+                "torch_threads": threads,
+                "batch_size": b,
+                "images_per_s": round(calls * b / seconds, 1),
+                "p50_ms": round(statistics.median(times), 2),
+                "p95_ms": round(percentile(times, 0.95), 2),
+            })
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.kill()
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the served model on this host across worker counts, torch threads per worker and batch sizes, "
+        "and write the best layout (incl. a CPU set per worker) to the tuning file that gunicorn, "
+        "run_inference_pool and the micro-batcher read at boot. Rerun after changing hardware or model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model-id", type=int, help="tune for this MLModel (default: the active one)")
+        parser.add_argument("--workers", help="worker counts to try (default: powers of two up to the CPU count)")
+        parser.add_argument("--threads", help="torch threads per worker to try (default: powers of two)")
+        parser.add_argument("--batch-sizes", default="1,4,8,16")
+        parser.add_argument("--seconds", type=float, default=2.0, help="measurement time per configuration")
+        parser.add_argument("--max-latency-ms", type=float, default=100.0,
+                            help="p95 forward time a batch may take; the fastest layout within it wins")
+        parser.add_argument("--no-pin", action="store_true", help="do not pin workers to CPU sets")
+        parser.add_argument("--output", help=f"tuning file (default INFER_TUNING_FILE or {tuning.DEFAULT_PATH})")
+        parser.add_argument("--dry-run", action="store_true", help="print the result without writing the file")
+
+    def _spec(self, model_id):
+        if model_id is not None:
+            m = MLModel.objects.filter(id=model_id).first()
+            if not m or not m.file:
+                raise CommandError(f"MLModel {model_id} not found or has no file")
+            return ModelSpec(m.id, m.arch, m.file.path, m.version)
+        return predictor._resolve_spec()
+
+    def handle(self, *args, **opts):
+        # forked benchmark workers must not inherit a busy OpenMP pool
+        torch.set_num_threads(1)
+
+        spec = self._spec(opts["model_id"])
+        labels = predictor.LABELS_PATH if predictor.LABELS_PATH.exists() else predictor.BUNDLED_LABELS_PATH
+        with open(labels, "r", encoding="utf-8") as f:
+            num_classes = len(json.load(f))
+
+        backend = getattr(settings, "INFER_BACKEND", "eager")
+        path = artifact_path(spec.path, backend)
+        if backend != "eager" and path.exists():
+            model = load_artifact(backend, path)
+        else:
+            backend, model = "eager", load_model(spec.arch, spec.path, num_classes)
+
+        cpus = tuning.available_cpus()
+        worker_counts = _ints(opts["workers"]) if opts["workers"] else _powers_of_two(len(cpus))
+        thread_counts = _ints(opts["threads"]) if opts["threads"] else _powers_of_two(len(cpus))
+        batch_sizes = _ints(opts["batch_sizes"])
+        self.stdout.write(f"model {spec.model_id} [{spec.arch}/{backend}] on {len(cpus)} CPUs")
+
+        results = []
+        for workers in worker_counts:
+            for threads in thread_counts:
+                if workers * threads > len(cpus):
+                    continue  # oversubscribed by construction
+                rows = measure(model, cpus, workers, threads, batch_sizes, opts["seconds"], pin=not opts["no_pin"])
+                for r in rows:
+                    self.stdout.write(
+                        f"  workers {workers:>2}  threads {threads:>2}  batch {r['batch_size']:>3}  "
+                        f"{r['images_per_s']:>8.1f} img/s  p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms"
+                    )
+                results.extend(rows)
+        if not results:
+            raise CommandError("no configuration fits the available CPUs")
+
+        within = [r for r in results if r["p95_ms"] <= opts["max_latency_ms"]]
+        if within:
+            best = max(within, key=lambda r: (r["images_per_s"], -r["p95_ms"]))
+        else:
+            self.stdout.write(self.style.WARNING(f"nothing meets --max-latency-ms {opts['max_latency_ms']}; "
+                                                 "taking the lowest p95"))
+            best = min(results, key=lambda r: r["p95_ms"])
+
+        config = {
+            "workers": best["workers"],
+            "torch_threads": best["torch_threads"],
+            "batch_size": best["batch_size"],
+            "affinity": None if opts["no_pin"] else tuning.cpu_sets(cpus, best["workers"], best["torch_threads"]),
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f"best: {config['workers']} workers x {config['torch_threads']} threads, batch {config['batch_size']} "
+            f"({best['images_per_s']} img/s, p95 {best['p95_ms']} ms)"
+        ))
+
+        data = {
+            "created_at": timezone.now().isoformat(),
+            "host": {"hostname": socket.gethostname(), "cpus": cpus, "torch": torch.__version__},
+            "model": {"id": spec.model_id, "arch": spec.arch, "backend": backend, "checksum": spec.checksum},
+            "max_latency_ms": opts["max_latency_ms"],
+            "config": config,
+            "results": results,
+        }
+        if opts["dry_run"]:
+            self.stdout.write(json.dumps(config))
+            return
+        path = tuning.save(data, opts["output"])
+        self.stdout.write(f"wrote {path}")
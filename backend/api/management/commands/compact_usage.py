@@ -0,0 +1,66 @@
+import time as clock
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import rollups
+
+
+def _utc_day(value: str) -> datetime:
+    try:
+        return datetime.combine(date.fromisoformat(value), time.min, tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f"Expected a date like 2026-01-31, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain usage rollups: merge duplicate rollup rows and per-process metrics / shadow metrics rows written "
+        "by the event flusher, optionally rebuild a date range from raw events, and delete raw InferenceEvents "
+        "older than the retention. Run it periodically: from cron, or as a long-running process with --every "
+        "(the `maintenance` service in docker-compose.yml)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=settings.INFER_EVENTS_RETENTION_DAYS,
+                            help="delete raw events older than this (0 keeps everything)")
+        parser.add_argument("--since-days", type=int, default=None,
+                            help="only merge rollups of the last N days (default: all)")
+        parser.add_argument("--rebuild-from", help="recompute rollups from raw events starting at this UTC date")
+        parser.add_argument("--rebuild-to", help="... up to (excluding) this UTC date (default: today)")
+        parser.add_argument("--every", type=float, default=0,
+                            help="keep running and compact every N seconds (rebuild runs once, first)")
+
+    def handle(self, *args, **opts):
+        self._run(opts)
+        opts["rebuild_from"] = None
+        while opts["every"] > 0:
+            clock.sleep(opts["every"])
+            try:
+                self._run(opts)
+            except Exception as e:  # e.g. the database restarting; try again next round
+                self.stderr.write(f"compaction failed: {e}")
+
+    def _run(self, opts):
+        now = timezone.now()
+
+        if opts["rebuild_from"]:
+            start = _utc_day(opts["rebuild_from"])
+            end = _utc_day(opts["rebuild_to"]) if opts["rebuild_to"] else rollups.bucket_start(now, "day")
+            n = rollups.rebuild(start, end)
+            self.stdout.write(f"rebuilt {n} rollup rows for {start.date()}..{end.date()}")
+
+        since = now - timedelta(days=opts["since_days"]) if opts["since_days"] else None
+        merged = rollups.compact(since)
+        self.stdout.write(f"merged {merged} duplicate rollup rows")
+        merged = rollups.compact_metrics(since)
+        self.stdout.write(f"merged {merged} metrics rows")
+        merged = rollups.compact_shadow(since)
+        self.stdout.write(f"merged {merged} shadow metrics rows")
+
+        if opts["retention_days"] > 0:
+            cutoff = now - timedelta(days=opts["retention_days"])
+            deleted = rollups.prune_events(cutoff)
+            self.stdout.write(f"deleted {deleted} raw events before {cutoff:%Y-%m-%d %H:%M}")
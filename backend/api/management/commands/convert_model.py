@@ -0,0 +1,146 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from api.models import MLModel
+from inference import predictor
+from inference.backends import artifact_path, available_backends, convert, load_artifact
+from inference.model_manager import load_model
+from inference.preprocess import INPUT_SIZE, preprocess_batch
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_samples(root, limit: int, batch_size: int):
+    """Sample images under `root` as preprocessed [B, 3, H, W] batches (random noise if no dir)."""
+    if root is None:
+        g = torch.Generator().manual_seed(0)
+        return [torch.randn(batch_size, 3, INPUT_SIZE, INPUT_SIZE, generator=g) for _ in range(max(1, limit // batch_size))]
+
+    files = sorted(p for p in Path(root).rglob("*") if p.suffix.lower() in IMAGE_EXTS)[:limit]
+    if not files:
+        raise CommandError(f"No images found under {root}")
+
+    batches = []
+    for i in range(0, len(files), batch_size):
+        imgs = [Image.open(p) for p in files[i:i + batch_size]]
+        batches.append(preprocess_batch(imgs).clone())
+    return batches
+
+
+def median_latency_ms(model, x, runs: int = 20) -> float:
+    times = []
+    with torch.inference_mode():
+        model(x)
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            model(x)
+            times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert an MLModel .pth into optimized CPU artifacts (TorchScript, INT8, ONNX) "
+        "next to it, and check top-1 agreement with the FP32 model on a sample set. "
+        "Artifacts below --min-agreement are removed so they are never served."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model_id", nargs="?", type=int, help="MLModel id (or use --path)")
+        parser.add_argument("--path", help="convert this .pth instead of a registry row")
+        parser.add_argument("--arch", default="effnet_b0", help="arch for --path (default effnet_b0)")
+        parser.add_argument("--backends", default="torchscript,int8,int8_static,onnx")
+        parser.add_argument("--samples", help="directory of sample images for calibration + parity")
+        parser.add_argument("--max-samples", type=int, default=256)
+        parser.add_argument("--batch-size", type=int, default=16)
+        parser.add_argument("--min-agreement", type=float, default=0.98)
+        parser.add_argument("--keep-failing", action="store_true", help="keep artifacts that fail parity")
+        parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+
+    def handle(self, *args, **opts):
+        if opts["model_id"] is not None:
+            m = MLModel.objects.filter(id=opts["model_id"]).first()
+            if not m or not m.file:
+                raise CommandError(f"MLModel {opts['model_id']} not found or has no file")
+            weights, arch = Path(m.file.path), m.arch
+        elif opts["path"]:
+            weights, arch = Path(opts["path"]), opts["arch"]
+        else:
+            raise CommandError("Give an MLModel id or --path")
+
+        # only the class count matters here, so the repo's label map will do outside the container
+        labels = predictor.LABELS_PATH if predictor.LABELS_PATH.exists() else predictor.BUNDLED_LABELS_PATH
+        with open(labels, "r", encoding="utf-8") as f:
+            num_classes = len(json.load(f))
+
+        fp32 = load_model(arch, weights, num_classes)
+        samples = load_samples(opts["samples"], opts["max_samples"], opts["batch_size"])
+        if opts["samples"] is None:
+            self.stdout.write(self.style.WARNING("No --samples given: using random inputs (parity is only indicative)."))
+
+        with torch.inference_mode():
+            ref = [fp32(x).argmax(dim=1) for x in samples]
+        single = samples[0][:1]
+
+        report = [{
+            "backend": "eager",
+            "path": str(weights),
+            "size_mb": round(weights.stat().st_size / 1e6, 2),
+            "latency_ms_b1": round(median_latency_ms(fp32, single), 2),
+            "top1_agreement": 1.0,
+        }]
+
+        wanted = [b.strip() for b in opts["backends"].split(",") if b.strip()]
+        for backend in wanted:
+            if backend not in available_backends():
+                self.stdout.write(self.style.WARNING(f"skip {backend}: not available (is onnxruntime installed?)"))
+                continue
+
+            # written next to the final name and moved into place only once it passes, so
+            # a serving process (which swaps to a new artifact) never sees a half-written one
+            out = artifact_path(weights, backend)
+            tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+            try:
+                convert(fp32, backend, tmp, calibration=samples)
+                model = load_artifact(backend, tmp)
+                with torch.inference_mode():
+                    agree = sum(int((model(x).argmax(dim=1) == r).sum()) for (x, r) in zip(samples, ref))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{backend}: conversion failed: {e}"))
+                tmp.unlink(missing_ok=True)
+                continue
+
+            total = sum(len(r) for r in ref)
+            row = {
+                "backend": backend,
+                "path": str(out),
+                "size_mb": round(tmp.stat().st_size / 1e6, 2),
+                "latency_ms_b1": round(median_latency_ms(model, single), 2),
+                "top1_agreement": round(agree / total, 4),
+            }
+            row["speedup"] = round(report[0]["latency_ms_b1"] / row["latency_ms_b1"], 2)
+            row["passed"] = row["top1_agreement"] >= opts["min_agreement"]
+            if row["passed"] or opts["keep_failing"]:
+                os.replace(tmp, out)
+            else:
+                tmp.unlink(missing_ok=True)
+                row["path"] = None
+            report.append(row)
+
+        for r in report:
+            status = "" if r.get("passed", True) else "  FAILED parity (removed)" if r["path"] is None else "  FAILED parity"
+            self.stdout.write(
+                f"{r['backend']:<12} {r['size_mb']:>8.2f} MB  {r['latency_ms_b1']:>8.2f} ms/img  "
+                f"x{r.get('speedup', 1.0):<5} top1 agree {r['top1_agreement']:.4f}{status}"
+            )
+
+        if opts["json_path"]:
+            with open(opts["json_path"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
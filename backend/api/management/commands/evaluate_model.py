@@ -0,0 +1,326 @@
+import io
+import json
+import os
+import random
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from torch.utils.data import DataLoader, Dataset, default_collate
+
+from api.models import MLModel
+from inference import predictor
+from inference.backends import BACKENDS, artifact_path, load_artifact
+from inference.model_manager import load_model
+from inference.preprocess import INPUT_SIZE, load_rgb, normalize, open_image
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+UNKNOWN_CLASS = -1
+
+
+def _pixels(fileobj):
+    """Decode + resize in a loader worker; uint8 [3, H, W] is 4x less to ship back than float32."""
+    rgb = load_rgb(open_image(fileobj))
+    return torch.frombuffer(bytearray(rgb.tobytes()), dtype=torch.uint8).view(INPUT_SIZE, INPUT_SIZE, 3).permute(2, 0, 1)
+
+
+def _sample(pixels_or_none, label: int):
+    if pixels_or_none is None:
+        return torch.zeros((3, INPUT_SIZE, INPUT_SIZE), dtype=torch.uint8), label, False
+    return pixels_or_none, label, True
+
+
+def _class_of(name: str, class_index: dict) -> int:
+    """Images are labelled by their parent directory: a label from idx_to_bangla.json or its index."""
+    return class_index.get(Path(name).parent.name, UNKNOWN_CLASS)
+
+
+class FolderImages(Dataset):
+    """<root>/<class>/**/<image> files, or the same layout inside a .zip."""
+
+    def __init__(self, root: Path, class_index: dict):
+        self.root = root
+        self.is_zip = zipfile.is_zipfile(root) if root.is_file() else False
+        if self.is_zip:
+            with zipfile.ZipFile(root) as zf:
+                names = [n for n in zf.namelist() if n.lower().endswith(IMAGE_EXTS)]
+        else:
+            names = [str(p.relative_to(root)) for p in root.rglob("*") if p.suffix.lower() in IMAGE_EXTS]
+        names.sort()
+        labelled = [(n, _class_of(n, class_index)) for n in names]
+        self.items = [(n, label) for (n, label) in labelled if label != UNKNOWN_CLASS]
+        self.unknown = len(labelled) - len(self.items)  # not worth decoding
+        self._zip, self._zip_pid = None, None
+
+    def restrict(self, limit: int, seed: int):
+        if limit and limit < len(self.items):
+            self.items = sorted(random.Random(seed).sample(self.items, limit))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        name, label = self.items[i]
+        try:
+            if self.is_zip:
+                if self._zip_pid != os.getpid():  # one handle per loader worker
+                    self._zip, self._zip_pid = zipfile.ZipFile(self.root), os.getpid()
+                with self._zip.open(name) as f:
+                    return _sample(_pixels(f), label)
+            with open(self.root / name, "rb") as f:
+                return _sample(_pixels(f), label)
+        except Exception:
+            return _sample(None, label)
+
+
+class TarImages:
+    """
+    The same layout inside a .tar / .tar.gz. A tar only reads front to back (and a .tar.gz only
+    decompresses that way), so this process reads each member once and hands the raw bytes to
+    the decode processes a batch at a time, at most `workers * prefetch` batches ahead.
+    Yields collated (pixels, labels, ok) batches, like the DataLoader over FolderImages.
+    """
+
+    def __init__(self, root: Path, class_index: dict, limit: int = 0):
+        self.root = root
+        self.class_index = class_index
+        self.limit = limit
+        self.unknown = 0  # counted while reading, never decoded
+
+    def _members(self):
+        n = 0
+        with tarfile.open(self.root, "r|*") as tf:
+            for member in tf:
+                if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTS):
+                    continue
+                if self.limit and n >= self.limit:
+                    return
+                n += 1
+                label = _class_of(member.name, self.class_index)
+                if label == UNKNOWN_CLASS:
+                    self.unknown += 1
+                    continue
+                yield tf.extractfile(member).read(), label
+
+    def _chunks(self, size: int):
+        chunk = []
+        for item in self._members():
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def batches(self, batch_size: int, workers: int, prefetch: int):
+        if not workers:
+            for chunk in self._chunks(batch_size):
+                yield _decode_batch(chunk)
+            return
+        with ProcessPoolExecutor(workers, initializer=_worker_init) as pool:
+            window = deque()
+            for chunk in self._chunks(batch_size):
+                window.append(pool.submit(_decode_batch, chunk))
+                if len(window) >= workers * prefetch:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
+
+def _decode_batch(items):
+    samples = []
+    for raw, label in items:
+        try:
+            samples.append(_sample(_pixels(io.BytesIO(raw)), label))
+        except Exception:
+            samples.append(_sample(None, label))
+    return default_collate(samples)
+
+
+def _worker_init(_=None):
+    torch.set_num_threads(1)  # decode workers; the main process owns the forward threads
+
+
+class Command(BaseCommand):
+    help = (
+        "Score an MLModel (or a .pth) on labelled images: a directory or .zip/.tar(.gz) with one folder per class "
+        "(named by its idx_to_bangla.json label or index). Decoding runs in worker processes feeding "
+        "large batched forward passes; memory stays bounded by the prefetch queue, not the dataset size. "
+        "Reports accuracy, top-3 accuracy, a confusion matrix and images/s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model_id", nargs="?", type=int, help="MLModel id (or use --path)")
+        parser.add_argument("--path", help="evaluate this .pth instead of a registry row")
+        parser.add_argument("--arch", default="effnet_b0", help="arch for --path (default effnet_b0)")
+        parser.add_argument("--backend", default="eager", choices=BACKENDS,
+                            help="evaluate the converted artifact next to the .pth (see convert_model)")
+        parser.add_argument("--data", required=True, help="image directory, .zip or .tar(.gz)")
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                            help="decode processes (default: half the CPUs)")
+        parser.add_argument("--threads", type=int, default=0, help="torch threads for the forward pass "
+                            "(default: the CPUs not used by --workers)")
+        parser.add_argument("--prefetch", type=int, default=2, help="batches queued per worker")
+        parser.add_argument("--limit", type=int, default=0, help="evaluate a random sample of N images")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", dest="json_path", help="also write the report (incl. the full matrix) here")
+
+    def handle(self, *args, **opts):
+        if opts["model_id"] is not None:
+            m = MLModel.objects.filter(id=opts["model_id"]).first()
+            if not m or not m.file:
+                raise CommandError(f"MLModel {opts['model_id']} not found or has no file")
+            weights, arch = Path(m.file.path), m.arch
+        elif opts["path"]:
+            weights, arch = Path(opts["path"]), opts["arch"]
+        else:
+            raise CommandError("Give an MLModel id or --path")
+
+        labels_path = predictor.LABELS_PATH if predictor.LABELS_PATH.exists() else predictor.BUNDLED_LABELS_PATH
+        with open(labels_path, "r", encoding="utf-8") as f:
+            idx_to_label = {int(k): v for k, v in json.load(f).items()}
+        num_classes = len(idx_to_label)
+        class_index = {**{v: k for k, v in idx_to_label.items()}, **{str(k): k for k in idx_to_label}}
+
+        if opts["backend"] == "eager":
+            model = load_model(arch, weights, num_classes)
+        else:
+            path = artifact_path(weights, opts["backend"])
+            if not path.exists():
+                raise CommandError(f"No {opts['backend']} artifact at {path}; run convert_model first")
+            model = load_artifact(opts["backend"], path)
+
+        data = Path(opts["data"])
+        if not data.exists():
+            raise CommandError(f"{data} does not exist")
+        workers = max(0, opts["workers"])
+        prefetch = max(1, opts["prefetch"])
+        if data.is_file() and tarfile.is_tarfile(data) and not zipfile.is_zipfile(data):
+            dataset, total = TarImages(data, class_index, limit=opts["limit"]), None
+            batches = dataset.batches(opts["batch_size"], workers, prefetch)
+        elif data.is_dir() or zipfile.is_zipfile(data):
+            dataset = FolderImages(data, class_index)
+            dataset.restrict(opts["limit"], opts["seed"])
+            total = len(dataset)
+            if not total:
+                raise CommandError(f"No images found in {data}")
+            batches = DataLoader(
+                dataset,
+                batch_size=opts["batch_size"],
+                num_workers=workers,
+                prefetch_factor=prefetch if workers else None,
+                worker_init_fn=_worker_init if workers else None,
+            )
+        else:
+            raise CommandError("--data must be a directory, .zip or .tar(.gz)")
+
+        torch.set_num_threads(opts["threads"] or max(1, (os.cpu_count() or 1) - workers))
+
+        confusion = torch.zeros((num_classes, num_classes), dtype=torch.int64)
+        top3_hits = failed = done = unknown = 0
+        forward_s = 0.0
+        t0 = time.perf_counter()
+        buf = torch.empty((opts["batch_size"], 3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+
+        for pixels, y, ok in batches:
+            done += 1
+            failed += int((~ok).sum())
+            unknown += int((ok & (y == UNKNOWN_CLASS)).sum())
+            keep = ok & (y != UNKNOWN_CLASS)
+            if not bool(keep.any()):
+                continue
+            pixels, y = pixels[keep], y[keep]
+            x = normalize(pixels, out=buf[:len(y)])
+
+            t_fwd = time.perf_counter()
+            with torch.inference_mode():
+                logits = model(x)
+            forward_s += time.perf_counter() - t_fwd
+
+            top3 = torch.topk(logits, k=min(3, num_classes), dim=1).indices
+            confusion += torch.bincount(y * num_classes + top3[:, 0], minlength=num_classes ** 2) \
+                .view(num_classes, num_classes)
+            top3_hits += int((top3 == y.unsqueeze(1)).any(dim=1).sum())
+
+            if done % 50 == 0:
+                seen = int(confusion.sum())
+                self.stdout.write(f"  {seen}{f'/{total}' if total else ''} images, "
+                                  f"{seen / (time.perf_counter() - t0):.1f} img/s")
+
+        elapsed = time.perf_counter() - t0
+        unknown += dataset.unknown
+        report = self._report(confusion, idx_to_label, top3_hits, unknown, failed, elapsed, forward_s)
+        report.update({"weights": str(weights), "arch": arch, "backend": opts["backend"], "data": str(data)})
+        self._print(report)
+
+        if opts["json_path"]:
+            report["confusion"] = confusion.tolist()
+            with open(opts["json_path"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    def _report(self, confusion, idx_to_label, top3_hits, unknown, failed, elapsed, forward_s) -> dict:
+        n = int(confusion.sum())
+        correct = int(confusion.diag().sum())
+        support, predicted = confusion.sum(dim=1), confusion.sum(dim=0)
+
+        per_class = []
+        for i in range(confusion.shape[0]):
+            tp = int(confusion[i, i])
+            per_class.append({
+                "index": i,
+                "label": idx_to_label.get(i, str(i)),
+                "support": int(support[i]),
+                "recall": round(tp / int(support[i]), 4) if int(support[i]) else None,
+                "precision": round(tp / int(predicted[i]), 4) if int(predicted[i]) else None,
+            })
+
+        off = confusion.clone()
+        off.fill_diagonal_(0)
+        values, flat = torch.topk(off.flatten(), k=min(10, off.numel()))
+        confusions = [
+            {"true": idx_to_label.get(int(i) // off.shape[0]), "predicted": idx_to_label.get(int(i) % off.shape[0]),
+             "count": int(v)}
+            for v, i in zip(values, flat) if int(v)
+        ]
+
+        return {
+            "images": n,
+            "accuracy": round(correct / n, 4) if n else None,
+            "top3_accuracy": round(top3_hits / n, 4) if n else None,
+            "skipped_unknown_class": unknown,
+            "failed_to_decode": failed,
+            "seconds": round(elapsed, 2),
+            "images_per_s": round(n / elapsed, 1) if elapsed > 0 else None,
+            "forward_images_per_s": round(n / forward_s, 1) if forward_s > 0 else None,
+            "per_class": per_class,
+            "top_confusions": confusions,
+        }
+
+    def _print(self, r: dict):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{r['images']} images  accuracy {r['accuracy']}  top-3 {r['top3_accuracy']}  "
+            f"{r['images_per_s']} img/s end to end ({r['forward_images_per_s']} img/s forward only)"
+        )
+        if r["skipped_unknown_class"] or r["failed_to_decode"]:
+            self.stdout.write(self.style.WARNING(
+                f"skipped {r['skipped_unknown_class']} images of unknown classes, "
+                f"{r['failed_to_decode']} that failed to decode"
+            ))
+        self.stdout.write(f"{'class':<8} {'support':>8} {'recall':>8} {'precision':>10}")
+        for c in r["per_class"]:
+            if not c["support"] and c["precision"] is None:
+                continue
+            recall = f"{c['recall']:.4f}" if c["recall"] is not None else "-"
+            precision = f"{c['precision']:.4f}" if c["precision"] is not None else "-"
+            self.stdout.write(f"{c['label']:<8} {c['support']:>8} {recall:>8} {precision:>10}")
+        if r["top_confusions"]:
+            self.stdout.write("most confused (true -> predicted):")
+            for c in r["top_confusions"]:
+                self.stdout.write(f"  {c['true']} -> {c['predicted']}: {c['count']}")
@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import MLModel
+from inference import predictor
+from inference.profiling import sweep
+
+
+def _ints(value: str):
+    return [int(v) for v in str(value).split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile an MLModel: load time, peak RSS and latency / throughput for each batch size and "
+        "torch thread count. Results are stored on the model (admin uploads run this in the background)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model_id", type=int)
+        parser.add_argument("--batch-sizes", default=settings.INFER_PROFILE_BATCH_SIZES)
+        parser.add_argument("--threads", default=settings.INFER_PROFILE_THREADS)
+        parser.add_argument("--runs", type=int, default=settings.INFER_PROFILE_RUNS)
+        parser.add_argument("--json", dest="json_path", help="also write the profile to this file")
+
+    def handle(self, *args, **opts):
+        m = MLModel.objects.filter(id=opts["model_id"]).first()
+        if not m or not m.file:
+            raise CommandError(f"MLModel {opts['model_id']} not found or has no file")
+
+        # only the class count matters here, so the repo's label map will do outside the container
+        labels = predictor.LABELS_PATH if predictor.LABELS_PATH.exists() else predictor.BUNDLED_LABELS_PATH
+        with open(labels, "r", encoding="utf-8") as f:
+            num_classes = len(json.load(f))
+
+        try:
+            profile = sweep(m.arch, m.file.path, num_classes, batch_sizes=_ints(opts["batch_sizes"]),
+                            threads=_ints(opts["threads"]), runs=opts["runs"])
+        except Exception as e:
+            first_line = (str(e).strip().splitlines() or [""])[0]
+            MLModel.objects.filter(id=m.id).update(
+                profile_status=MLModel.PROFILE_FAILED, profile={"error": f"{type(e).__name__}: {first_line}"},
+                profile_p95_ms=None, profile_load_ms=None, profile_peak_rss_mb=None, profiled_at=timezone.now(),
+            )
+            raise CommandError(f"model {m.id} failed to load or run: {e}")
+
+        MLModel.objects.filter(id=m.id).update(
+            profile_status=MLModel.PROFILE_OK, profile=profile, profile_p95_ms=profile["p95_ms"],
+            profile_load_ms=profile["load_ms"], profile_peak_rss_mb=profile["peak_rss_mb"],
+            profiled_at=timezone.now(),
+        )
+
+        self.stdout.write(f"model {m.id}: load {profile['load_ms']:.0f} ms, peak RSS {profile['peak_rss_mb']:.0f} MB")
+        for r in profile["results"]:
+            self.stdout.write(
+                f"  threads {r['threads']:>2}  batch {r['batch_size']:>3}  p50 {r['p50_ms']:>8.2f} ms  "
+                f"p95 {r['p95_ms']:>8.2f} ms  {r['images_per_s']:>8.1f} img/s"
+            )
+        if opts["json_path"]:
+            with open(opts["json_path"], "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=2)
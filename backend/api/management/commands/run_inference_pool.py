@@ -0,0 +1,67 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inference import tuning
+from inference.pool import InferencePool, PoolServer
+
+
+def _stop(*_):
+    raise SystemExit(0)  # unwinds serve_forever(); daemon workers exit with us
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the local inference service: a pool of model-holding worker processes "
+        "behind a Unix socket (set INFER_POOL_SOCKET on the web side to use it)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.INFER_POOL_SOCKET or "/tmp/bsl-infer.sock")
+        parser.add_argument("--workers", type=int, default=settings.INFER_POOL_WORKERS,
+                            help="0: from the tuning file (manage.py autotune), else 2")
+        parser.add_argument("--queue-depth", type=int, default=settings.INFER_POOL_QUEUE_DEPTH)
+        parser.add_argument("--timeout-ms", type=int, default=settings.INFER_POOL_TIMEOUT_MS)
+        parser.add_argument("--torch-threads", type=int, default=settings.INFER_POOL_TORCH_THREADS,
+                            help="0: from the tuning file, else 1")
+        parser.add_argument("--threads", type=int, default=settings.INFER_POOL_WORKER_THREADS,
+                            help="requests in flight per worker, batched together (0: the micro-batch size)")
+        parser.add_argument("--batch-timeout-ms", type=int, default=settings.INFER_POOL_BATCH_TIMEOUT_MS,
+                            help="deadline for /api/infer/batch requests")
+
+    def handle(self, *args, **opts):
+        tuned = tuning.load()
+        workers = opts["workers"] or tuned.get("workers", 2)
+        if workers < 1:
+            raise CommandError("--workers must be >= 1")
+        threads = opts["threads"]
+        if not threads:
+            batching = getattr(settings, "INFER_BATCHING", True)
+            threads = (settings.INFER_BATCH_MAX_SIZE or tuned.get("batch_size", 8)) if batching else 1
+
+        pool = InferencePool(
+            workers=workers,
+            queue_depth=opts["queue_depth"],
+            timeout_ms=opts["timeout_ms"],
+            torch_threads=opts["torch_threads"] or tuned.get("torch_threads", 1),
+            affinity=tuning.affinity(),
+            threads=threads,
+            batch_timeout_ms=opts["batch_timeout_ms"],
+        )
+        pool.start()
+
+        server = PoolServer(opts["socket"], pool)
+        signal.signal(signal.SIGTERM, _stop)
+
+        self.stdout.write(
+            f"inference pool: {workers} workers x {pool.torch_threads} torch threads, {threads} requests in flight "
+            f"per worker, queue {opts['queue_depth']}, "
+            f"timeout {opts['timeout_ms']} ms, listening on {opts['socket']}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
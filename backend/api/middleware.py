@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from inference.telemetry import DB_QUERIES, DB_SECONDS, HTTP_REQUESTS, HTTP_SECONDS, enable_spool
+
+
+class _QueryTimer:
+    """connection.execute_wrapper that adds up SQL time for one request."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - t0
+            self.queries += 1
+
+
+class TelemetryMiddleware:
+    """Request count, wall time and DB time per request, labelled by URL route (inference/telemetry.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._pid = None
+
+    def __call__(self, request):
+        if self._pid != os.getpid() and getattr(settings, "INFER_TELEMETRY_DIR", ""):
+            # per worker, after fork: spool this process's samples from the event flusher thread
+            enable_spool()
+            self._pid = os.getpid()
+
+        timer = _QueryTimer()
+        t0 = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - t0
+
+        match = getattr(request, "resolver_match", None)
+        view = match.route if match is not None else "unmatched"
+        HTTP_REQUESTS.inc(view, request.method, str(response.status_code))
+        HTTP_SECONDS.observe(elapsed, view)
+        DB_SECONDS.observe(timer.seconds, view)
+        if timer.queries:
+            DB_QUERIES.inc(view, amount=timer.queries)
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inferenceevent',
+            name='cached',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='inferenceevent',
+            name='confidence',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inferenceevent',
+            name='label',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='inferenceevent',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
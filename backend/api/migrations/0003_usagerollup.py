@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_inferenceevent_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('source', models.CharField(default='web', max_length=32)),
+                ('user_bucket', models.SmallIntegerField(default=-1)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('cached', models.PositiveIntegerField(default=0)),
+                ('latency_ms_sum', models.BigIntegerField(default=0)),
+                ('latency_count', models.PositiveIntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('confidence_count', models.PositiveIntegerField(default=0)),
+                ('model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.mlmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket_start'], name='api_usagero_period_1dcb48_idx')],
+            },
+        ),
+    ]
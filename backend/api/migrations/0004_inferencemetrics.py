@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_usagerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InferenceMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('data', models.JSONField(default=dict)),
+                ('model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.mlmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'bucket_start'], name='api_inferen_model_i_94002f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_inferencemetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='cascade_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='cascade_threshold',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
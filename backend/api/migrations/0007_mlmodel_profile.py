@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_modelupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile_load_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile_p95_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile_peak_rss_mb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ok', 'OK'), ('failed', 'Failed')], default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profiled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_mlmodel_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='shadow_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ShadowMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('data', models.JSONField(default=dict)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_metrics', to='api.mlmodel')),
+                ('served_model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.mlmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'bucket_start'], name='api_shadowm_model_i_a832c4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_shadow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlmodel',
+            name='profile_heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_profile_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inferenceevent',
+            name='cascade_stage',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
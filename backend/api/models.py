@@ -1,3 +1,5 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -19,6 +21,25 @@ class MLModel(models.Model):
     enabled = models.BooleanField(default=True)
     is_active = models.BooleanField(default=False)
 
+    # early-exit cascade (inference/predictor.py): enabled models cheaper than the
+    # active one classify first; their answer is final when top-1 >= threshold
+    cascade_enabled = models.BooleanField(default=False)
+    cascade_threshold = models.FloatField(null=True, blank=True)  # None: INFER_CASCADE_DEFAULT_THRESHOLD
+
+    # shadow candidate (inference/shadow.py): also runs, off the request path, on sampled live frames
+    shadow_enabled = models.BooleanField(default=False)
+
+    # performance profile from `manage.py profile_model` (run in the background on upload)
+    PROFILE_PENDING, PROFILE_OK, PROFILE_FAILED = "pending", "ok", "failed"
+    PROFILE_CHOICES = [(PROFILE_PENDING, "Pending"), (PROFILE_OK, "OK"), (PROFILE_FAILED, "Failed")]
+    profile_status = models.CharField(max_length=16, choices=PROFILE_CHOICES, blank=True, default="")
+    profile = models.JSONField(default=dict, blank=True)  # full sweep, or {"error": ...}
+    profile_p95_ms = models.FloatField(null=True, blank=True)  # batch 1, first thread count
+    profile_load_ms = models.FloatField(null=True, blank=True)
+    profile_peak_rss_mb = models.FloatField(null=True, blank=True)
+    profiled_at = models.DateTimeField(null=True, blank=True)
+    profile_heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed while a run is pending
+
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
     )
@@ -45,11 +66,112 @@ class InferenceEvent(models.Model):
     )
     model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True)
 
-    source = models.CharField(max_length=32, default="web")  # web/local/api
+    source = models.CharField(max_length=32, default="web")  # web/ws/local/api
     created_at = models.DateTimeField(default=timezone.now)
 
+    # filled by the async event buffer (inference/events.py)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    label = models.CharField(max_length=16, blank=True, default="")
+    confidence = models.FloatField(null=True, blank=True)
+    cached = models.BooleanField(default=False)
+    # position in the cascade of the stage that answered (the active model is last);
+    # null without a cascade and for cache hits
+    cascade_stage = models.PositiveSmallIntegerField(null=True, blank=True)
+
     class Meta:
         indexes = [
             models.Index(fields=["created_at"]),
         ]
 
+
+class UsageRollup(models.Model):
+    """
+    InferenceEvent counts pre-aggregated per hour/day (UTC), model, source and
+    user bucket (user id % INFER_ROLLUP_USER_BUCKETS, -1 = anonymous).
+    Flushes increment one row per key; a race between flushers can leave a
+    second row until `compact_usage` merges them, so always Sum() when
+    reading (see api/rollups.py).
+    """
+    HOUR = "hour"
+    DAY = "day"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True)
+    source = models.CharField(max_length=32, default="web")
+    user_bucket = models.SmallIntegerField(default=-1)
+
+    events = models.PositiveIntegerField(default=0)
+    cached = models.PositiveIntegerField(default=0)
+    latency_ms_sum = models.BigIntegerField(default=0)
+    latency_count = models.PositiveIntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+    confidence_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["period", "bucket_start"]),
+        ]
+
+
+class InferenceMetrics(models.Model):
+    """
+    Serving histograms for one model and hour, as merged from one process
+    flush (inference/metrics.py). Several rows per (model, hour) are normal;
+    readers merge them and `compact_usage` folds them together.
+    """
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, null=True, blank=True)
+    bucket_start = models.DateTimeField()
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "bucket_start"]),
+        ]
+
+
+class ModelUpload(models.Model):
+    """
+    A chunked .pth upload in progress (api/uploads.py). Bytes are written
+    straight to `path` in the models/ storage; `received` is the resume
+    offset. On completion the MLModel points at the same file.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=120)
+    arch = models.CharField(max_length=32, choices=MLModel.ARCH_CHOICES)
+    version = models.CharField(max_length=40, default="v1")
+    description = models.TextField(blank=True, default="")
+
+    path = models.CharField(max_length=255)  # storage name, e.g. models/foo.pth
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default="")  # set on completion
+    model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def complete(self) -> bool:
+        return self.model_id is not None
+
+
+class ShadowMetrics(models.Model):
+    """
+    Shadow evaluation of a candidate model against the model that served the
+    frames, for one hour, as flushed by one process (inference/shadow.py).
+    Several rows per key are normal; readers merge them.
+    """
+    model = models.ForeignKey(MLModel, on_delete=models.CASCADE, related_name="shadow_metrics")
+    served_model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    bucket_start = models.DateTimeField()
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "bucket_start"]),
+        ]
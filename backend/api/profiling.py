@@ -0,0 +1,147 @@
+"""
+Background profiling of uploaded models and the activation gate built on it.
+
+Each upload starts `manage.py profile_model <id>` (inference/profiling.py) as
+a separate process, so a broken or huge checkpoint never runs inside a web
+worker. At most INFER_PROFILE_CONCURRENCY run at once per worker; a run that
+dies without reporting (OOM kill, timeout) marks the model as failed.
+
+The thread watching a run lives in the web worker that scheduled it and
+refreshes `profile_heartbeat_at` every HEARTBEAT_SECONDS. If that worker is
+recycled or killed, the heartbeat stops and `expire_stale` marks the model
+failed, so it can be profiled again.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MLModel
+
+
+MANAGE_PY = Path(__file__).resolve().parent.parent / "manage.py"
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = 3 * HEARTBEAT_SECONDS
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(max(1, getattr(settings, "INFER_PROFILE_CONCURRENCY", 1)))
+    return _slots
+
+
+def _fail(model_id, error: str):
+    MLModel.objects.filter(id=model_id, profile_status=MLModel.PROFILE_PENDING).update(
+        profile_status=MLModel.PROFILE_FAILED, profile={"error": error}, profiled_at=timezone.now(),
+    )
+
+
+def _beat(model_id):
+    MLModel.objects.filter(id=model_id, profile_status=MLModel.PROFILE_PENDING).update(
+        profile_heartbeat_at=timezone.now(),
+    )
+
+
+def _profile(model_id):
+    timeout = getattr(settings, "INFER_PROFILE_TIMEOUT_SECONDS", 600)
+    slots = _get_slots()
+    while not slots.acquire(timeout=HEARTBEAT_SECONDS):
+        _beat(model_id)  # still queued behind other runs
+    try:
+        _beat(model_id)
+        proc = subprocess.Popen(
+            [sys.executable, str(MANAGE_PY), "profile_model", str(model_id)],
+            cwd=MANAGE_PY.parent, env=os.environ.copy(),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _, err = proc.communicate(timeout=max(0.0, min(HEARTBEAT_SECONDS, deadline - time.monotonic())))
+                break
+            except subprocess.TimeoutExpired:
+                if time.monotonic() >= deadline:
+                    proc.kill()
+                    proc.communicate()
+                    _fail(model_id, f"profiling timed out after {timeout}s")
+                    return
+                _beat(model_id)
+    finally:
+        slots.release()
+    if proc.returncode != 0:
+        # the command records load/run errors itself; this covers crashes and kills
+        tail = err.decode(errors="replace").strip().splitlines()[-1:] or [f"exit status {proc.returncode}"]
+        _fail(model_id, tail[0])
+
+
+def _run(model_id):
+    try:
+        _profile(model_id)
+    finally:
+        connection.close()  # this thread's own connection
+
+
+def expire_stale() -> int:
+    """Mark pending profiles whose watcher stopped beating (worker recycled or killed) as failed."""
+    cutoff = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    return MLModel.objects.filter(profile_status=MLModel.PROFILE_PENDING).filter(
+        Q(profile_heartbeat_at__lt=cutoff) | Q(profile_heartbeat_at__isnull=True)
+    ).update(
+        profile_status=MLModel.PROFILE_FAILED, profiled_at=timezone.now(),
+        profile={"error": "profiling stopped reporting (its web worker was restarted); profile it again"},
+    )
+
+
+def schedule(model: MLModel) -> bool:
+    """Mark `model` as pending and profile it in the background (no-op when INFER_PROFILE_ON_UPLOAD is off)."""
+    if not getattr(settings, "INFER_PROFILE_ON_UPLOAD", True):
+        return False
+    now = timezone.now()
+    MLModel.objects.filter(id=model.id).update(
+        profile_status=MLModel.PROFILE_PENDING, profile={}, profile_heartbeat_at=now,
+    )
+    model.profile_status, model.profile, model.profile_heartbeat_at = MLModel.PROFILE_PENDING, {}, now
+    threading.Thread(target=_run, args=(model.id,), name=f"profile-model-{model.id}", daemon=True).start()
+    return True
+
+
+def activation_blocker(model: MLModel, active, force: bool = False):
+    """
+    Why activating `model` in place of `active` should be refused, or None.
+    A run in progress always blocks; `force` overrides the rest (failed or
+    missing profile, p95 regression). Call expire_stale() first.
+    """
+    if model.profile_status == MLModel.PROFILE_PENDING:
+        return "Model is still being profiled; activate it once the profile is in"
+    if force:
+        return None
+    if model.profile_status == MLModel.PROFILE_FAILED:
+        return f"Model failed profiling: {model.profile.get('error', 'unknown error')}"
+    if model.profile_status != MLModel.PROFILE_OK:
+        return "Model has not been profiled; profile it first or activate with force"
+
+    limit = getattr(settings, "INFER_PROFILE_MAX_P95_REGRESSION", 0.25)
+    if not limit or active is None or active.id == model.id:
+        return None
+    if model.profile_p95_ms is None or active.profile_p95_ms is None:
+        return None
+    if model.profile_p95_ms > active.profile_p95_ms * (1 + limit):
+        return (
+            f"p95 latency {model.profile_p95_ms:.1f} ms is more than {limit:.0%} above "
+            f"the active model's {active.profile_p95_ms:.1f} ms"
+        )
+    return None
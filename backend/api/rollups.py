@@ -0,0 +1,242 @@
+"""
+Incremental usage rollups for InferenceEvent.
+
+Every flush of the event buffer adds its counts to the one row per (period,
+bucket, model, source, user bucket) it touched, with F() increments in the
+same transaction as the raw events, so the table grows with keys, not with
+traffic. Two flushers creating the same new key at once can still leave two
+rows for it; readers always Sum() over the keys, and `manage.py compact_usage`
+merges such rows and prunes raw events past retention.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from .models import InferenceEvent, InferenceMetrics, ShadowMetrics, UsageRollup
+
+
+SUM_FIELDS = ("events", "cached", "latency_ms_sum", "latency_count", "confidence_sum", "confidence_count")
+KEY_FIELDS = ("period", "bucket_start", "model_id", "source", "user_bucket")
+
+
+def user_bucket(user_id) -> int:
+    if user_id is None:
+        return -1
+    return int(user_id) % max(1, getattr(settings, "INFER_ROLLUP_USER_BUCKETS", 16))
+
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    """Start of the UTC hour/day containing `ts`."""
+    ts = ts.astimezone(dt_timezone.utc)
+    if period == UsageRollup.HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _empty():
+    return dict.fromkeys(SUM_FIELDS, 0)
+
+
+def rollup_rows(events):
+    """Aggregate event dicts (InferenceEvent field values) into UsageRollup deltas."""
+    acc = defaultdict(_empty)
+    for e in events:
+        for period in (UsageRollup.HOUR, UsageRollup.DAY):
+            key = (period, bucket_start(e["created_at"], period), e.get("model_id"),
+                   e.get("source", "web"), user_bucket(e.get("user_id")))
+            row = acc[key]
+            row["events"] += 1
+            row["cached"] += int(bool(e.get("cached")))
+            if e.get("latency_ms") is not None:
+                row["latency_ms_sum"] += int(e["latency_ms"])
+                row["latency_count"] += 1
+            if e.get("confidence") is not None:
+                row["confidence_sum"] += float(e["confidence"])
+                row["confidence_count"] += 1
+    return [UsageRollup(**dict(zip(KEY_FIELDS, key)), **sums) for key, sums in acc.items()]
+
+
+def _key_order(row):
+    return tuple((v is None, v if v is not None else 0) for v in (getattr(row, f) for f in KEY_FIELDS))
+
+
+def add_events(events):
+    """Add rollups for freshly written events to their rows (call inside their transaction)."""
+    rows = sorted(rollup_rows(events), key=_key_order)  # one lock order for concurrent flushers
+    new = []
+    for row in rows:
+        # increment one row per key (the oldest, if a race ever left two)
+        first = UsageRollup.objects.filter(**{f: getattr(row, f) for f in KEY_FIELDS}).order_by("id").values("id")[:1]
+        updated = UsageRollup.objects.filter(id=Subquery(first)).update(
+            **{f: F(f) + getattr(row, f) for f in SUM_FIELDS}
+        )
+        if not updated:
+            new.append(row)
+    if new:
+        UsageRollup.objects.bulk_create(new)
+    return len(rows)
+
+
+def compact(since=None) -> int:
+    """Merge duplicate rows of a key into one. Returns rows removed."""
+    qs = UsageRollup.objects.all()
+    if since is not None:
+        qs = qs.filter(bucket_start__gte=since)
+    dupes = qs.values(*KEY_FIELDS).annotate(n=Count("id")).filter(n__gt=1)
+
+    removed = 0
+    for key in list(dupes):
+        key.pop("n")
+        with transaction.atomic():
+            # lock and merge exactly the rows we saw; deltas appended meanwhile stay separate
+            rows = list(UsageRollup.objects.select_for_update().filter(**key))
+            if len(rows) < 2:
+                continue
+            keep = rows[0]
+            for r in rows[1:]:
+                for f in SUM_FIELDS:
+                    setattr(keep, f, getattr(keep, f) + getattr(r, f))
+            keep.save(update_fields=list(SUM_FIELDS))
+            UsageRollup.objects.filter(id__in=[r.id for r in rows[1:]]).delete()
+            removed += len(rows) - 1
+    return removed
+
+
+def _fold_json_rows(model, key_fields, stats_cls, since=None) -> int:
+    """Merge rows of `model` sharing `key_fields` into one via stats_cls.merge_json/to_json."""
+    qs = model.objects.all()
+    if since is not None:
+        qs = qs.filter(bucket_start__gte=since)
+    dupes = qs.values(*key_fields).annotate(n=Count("id")).filter(n__gt=1)
+
+    removed = 0
+    for key in list(dupes):
+        key.pop("n")
+        with transaction.atomic():
+            rows = list(model.objects.select_for_update().filter(**key))
+            if len(rows) < 2:
+                continue
+            merged = stats_cls()
+            for r in rows:
+                merged.merge_json(r.data)
+            rows[0].data = merged.to_json()
+            rows[0].save(update_fields=["data"])
+            model.objects.filter(id__in=[r.id for r in rows[1:]]).delete()
+            removed += len(rows) - 1
+    return removed
+
+
+def compact_metrics(since=None) -> int:
+    """Fold InferenceMetrics rows of the same (model, hour) into one. Returns rows removed."""
+    from inference.metrics import ModelStats
+
+    return _fold_json_rows(InferenceMetrics, ("model_id", "bucket_start"), ModelStats, since)
+
+
+def compact_shadow(since=None) -> int:
+    """Fold ShadowMetrics rows of the same (candidate, served model, hour) into one. Returns rows removed."""
+    from inference.shadow import ShadowStats
+
+    return _fold_json_rows(ShadowMetrics, ("model_id", "served_model_id", "bucket_start"), ShadowStats, since)
+
+
+def rebuild(start: datetime, end: datetime) -> int:
+    """
+    Recompute rollups for whole UTC days in [start, end) from raw events
+    (backfill / repair). Events flushed while this runs may be counted twice,
+    so run it on closed days.
+    """
+    start, end = bucket_start(start, UsageRollup.DAY), bucket_start(end, UsageRollup.DAY)
+    if end <= start:
+        end = start + timedelta(days=1)
+    raw = InferenceEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    rows = []
+    for period, trunc in ((UsageRollup.HOUR, TruncHour), (UsageRollup.DAY, TruncDay)):
+        grouped = (
+            raw.annotate(bucket=trunc("created_at", tzinfo=dt_timezone.utc))
+            .values("bucket", "model_id", "source", "user_id")
+            .annotate(
+                events=Count("id"),
+                cached=Count("id", filter=Q(cached=True)),
+                latency_ms_sum=Sum("latency_ms"),
+                latency_count=Count("latency_ms"),
+                confidence_sum=Sum("confidence"),
+                confidence_count=Count("confidence"),
+            )
+        )
+        acc = defaultdict(_empty)
+        for g in grouped.iterator():
+            row = acc[(period, g["bucket"], g["model_id"], g["source"], user_bucket(g["user_id"]))]
+            for f in SUM_FIELDS:
+                row[f] += g[f] or 0
+        rows += [UsageRollup(**dict(zip(KEY_FIELDS, key)), **sums) for key, sums in acc.items()]
+
+    with transaction.atomic():
+        UsageRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+        UsageRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def prune_events(older_than: datetime, chunk: int = 10000) -> int:
+    """Delete raw events before `older_than` in id chunks (short locks). Returns rows deleted."""
+    deleted = 0
+    while True:
+        ids = list(
+            InferenceEvent.objects.filter(created_at__lt=older_than).order_by("id").values_list("id", flat=True)[:chunk]
+        )
+        if not ids:
+            return deleted
+        deleted += InferenceEvent.objects.filter(id__in=ids).delete()[0]
+
+
+# ---- readers ----
+def totals(qs):
+    """Sum SUM_FIELDS of a UsageRollup queryset (already grouped via .values())."""
+    return qs.annotate(**{f"{f}_total": Sum(f) for f in SUM_FIELDS})
+
+
+def summarize(row: dict) -> dict:
+    events = row["events_total"] or 0
+    return {
+        "count": events,
+        "cache_hit_rate": round(row["cached_total"] / events, 4) if events else None,
+        "avg_latency_ms": (
+            round(row["latency_ms_sum_total"] / row["latency_count_total"], 1) if row["latency_count_total"] else None
+        ),
+        "avg_confidence": (
+            round(row["confidence_sum_total"] / row["confidence_count_total"], 4) if row["confidence_count_total"] else None
+        ),
+    }
+
+
+def daily_counts(since: datetime):
+    qs = UsageRollup.objects.filter(period=UsageRollup.DAY, bucket_start__gte=bucket_start(since, UsageRollup.DAY))
+    return [
+        {"day": r["bucket_start"].date().isoformat(), "count": r["count"]}
+        for r in qs.values("bucket_start").annotate(count=Sum("events")).order_by("bucket_start")
+    ]
+
+
+def per_model(since: datetime, period: str = UsageRollup.DAY, model_id=None):
+    qs = UsageRollup.objects.filter(period=period, bucket_start__gte=bucket_start(since, period))
+    if model_id is not None:
+        qs = qs.filter(model_id=model_id)
+    return [
+        {"model_id": r["model_id"], **summarize(r)}
+        for r in totals(qs.values("model_id")).order_by("model_id")
+    ]
+
+
+def hourly(since: datetime, model_id=None):
+    qs = UsageRollup.objects.filter(period=UsageRollup.HOUR, bucket_start__gte=bucket_start(since, UsageRollup.HOUR))
+    if model_id is not None:
+        qs = qs.filter(model_id=model_id)
+    return [
+        {"hour": r["bucket_start"].isoformat(), **summarize(r)}
+        for r in totals(qs.values("bucket_start")).order_by("bucket_start")
+    ]
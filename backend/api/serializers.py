@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import MLModel
+from .models import MLModel, ModelUpload
 
 
 class MLModelSerializer(serializers.ModelSerializer):
@@ -14,14 +15,45 @@ class MLModelSerializer(serializers.ModelSerializer):
             "file",
             "enabled",
             "is_active",
+            "cascade_enabled",
+            "cascade_threshold",
+            "shadow_enabled",
+            "profile_status",
+            "profile",
+            "profile_p95_ms",
+            "profile_load_ms",
+            "profile_peak_rss_mb",
+            "profiled_at",
             "created_by",
             "created_at",
         ]
-        read_only_fields = ["id", "created_by", "created_at", "is_active"]
+        read_only_fields = ["id", "created_by", "created_at", "is_active", "profile_status", "profile",
+                            "profile_p95_ms", "profile_load_ms", "profile_peak_rss_mb", "profiled_at"]
 
 
 class MLModelListSerializer(serializers.ModelSerializer):
     class Meta:
         model = MLModel
-        fields = ["id", "name", "arch", "version", "enabled", "is_active", "created_at"]
+        fields = ["id", "name", "arch", "version", "enabled", "is_active", "cascade_enabled", "cascade_threshold",
+                  "shadow_enabled", "profile_status", "profile_p95_ms", "profile_load_ms", "profile_peak_rss_mb",
+                  "profile", "profiled_at", "created_at"]
         read_only_fields = fields
+
+
+class ModelUploadSerializer(serializers.ModelSerializer):
+    """Starts a chunked upload (api/uploads.py); `offset` is where the next chunk goes."""
+    filename = serializers.CharField(write_only=True, max_length=200)
+    offset = serializers.IntegerField(source="received", read_only=True)
+    complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ModelUpload
+        fields = ["id", "name", "arch", "version", "description", "filename", "size", "offset", "complete",
+                  "sha256", "model", "created_at", "updated_at"]
+        read_only_fields = ["id", "sha256", "model", "created_at", "updated_at"]
+
+    def validate_size(self, value):
+        limit = getattr(settings, "MODEL_UPLOAD_MAX_BYTES", 2 * 1024 ** 3)
+        if value <= 0 or value > limit:
+            raise serializers.ValidationError(f"size must be between 1 and {limit} bytes")
+        return value
@@ -0,0 +1,12 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, **kwargs):
+    # deactivation / password change must not wait for the inference auth cache TTL
+    user_cache.invalidate(instance.pk)
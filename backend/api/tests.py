@@ -1,3 +1,599 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import torch
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import profiling, rollups, uploads
+from api.authentication import InferenceJWTAuthentication, user_cache
+from api.models import InferenceEvent, InferenceMetrics, MLModel, ModelUpload, ShadowMetrics, UsageRollup
+from inference import hands, metrics, shadow, telemetry, tuning
+from inference.backends import BACKENDS, artifact_path
+from inference.batcher import MicroBatcher
+from inference.cache import PredictionCache
+from inference.events import EventBuffer
+from inference.preprocess import InvalidImage, load_rgb, open_image
+from inference.ratelimit import LocalBuckets, SharedBuckets
+from inference.renderers import BINARY_MEDIA_TYPE, compact, is_compact, pack_binary, unpack_binary
+from inference.stream import StreamSessions, StreamState
+from inference.views import InferView
+
+
+class MicroBatcherTakeTests(SimpleTestCase):
+    def setUp(self):
+        self.batcher = MicroBatcher(lambda x: (x, None), max_batch_size=4)
+        self.patcher = mock.patch.object(self.batcher, "_ensure_worker")  # no batching thread
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def submit(self, owner, n):
+        return [self.batcher.submit(torch.tensor([float(i)]), owner=owner) for i in range(n)]
+
+    def owners(self, batch):
+        return [self.queued[fut] for (_, fut, _) in batch]
+
+    def test_round_robin_across_owners(self):
+        futures = {"a": self.submit("a", 5), "b": self.submit("b", 2), "c": self.submit("c", 1)}
+        self.queued = {fut: owner for owner, futs in futures.items() for fut in futs}
+
+        self.assertEqual(self.owners(self.batcher._take(4)), ["a", "b", "c", "a"])
+        self.assertEqual(self.owners(self.batcher._take(4)), ["b", "a", "a", "a"])
+        self.assertEqual(self.batcher.qsize(), 0)
+        self.assertEqual(self.batcher._take(4), [])
+
+    def test_fifo_within_an_owner(self):
+        futures = self.submit("a", 3)
+        batch = self.batcher._take(4)
+        self.assertEqual([fut for (_, fut, _) in batch], futures)
+        self.assertEqual([float(x) for (x, _, _) in batch], [0.0, 1.0, 2.0])
+
+    def test_late_owner_is_served_next_round(self):
+        futures = {"a": self.submit("a", 3)}
+        first = self.batcher._take(1)
+        futures["b"] = self.submit("b", 1)
+        self.queued = {fut: owner for owner, futs in futures.items() for fut in futs}
+
+        self.assertEqual(self.owners(first), ["a"])
+        self.assertEqual(self.owners(self.batcher._take(4)), ["a", "b", "a"])
+
+
+class MicroBatcherRunTests(SimpleTestCase):
+    def test_failure_fails_the_batch_and_keeps_serving(self):
+        batcher = MicroBatcher(lambda x: (x * 2, "m"), max_batch_size=2, max_wait_ms=1)
+        with mock.patch("inference.batcher.BATCH_SIZE.observe", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                batcher.submit(torch.tensor([1.0])).result(timeout=5)
+        out = batcher.submit(torch.tensor([2.0])).result(timeout=5)
+        self.assertEqual(float(out["probs"][0]), 4.0)
+        self.assertEqual(out["tag"], "m")
+
+
+class LocalBucketsTests(SimpleTestCase):
+    def acquire(self, buckets, now, key="user:1", cost=1.0):
+        with mock.patch("inference.ratelimit.time.monotonic", return_value=now):
+            return buckets.acquire(key, cost)
+
+    def test_burst_then_refill(self):
+        buckets = LocalBuckets(rate=2, burst=3)
+        for _ in range(3):
+            self.assertEqual(self.acquire(buckets, 100.0), (True, 0.0))
+        allowed, wait = self.acquire(buckets, 100.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+        self.assertEqual(self.acquire(buckets, 100.5), (True, 0.0))  # 0.5 s at 2/s = 1 token
+        self.assertFalse(self.acquire(buckets, 100.5)[0])
+
+    def test_refill_is_capped_at_burst(self):
+        buckets = LocalBuckets(rate=10, burst=2)
+        self.acquire(buckets, 0.0, cost=2)
+        self.assertEqual(self.acquire(buckets, 3600.0, cost=2), (True, 0.0))
+        self.assertFalse(self.acquire(buckets, 3600.0)[0])
+
+    def test_cost_and_keys_are_independent(self):
+        buckets = LocalBuckets(rate=1, burst=4)
+        self.assertTrue(self.acquire(buckets, 0.0, cost=3)[0])
+        allowed, wait = self.acquire(buckets, 0.0, cost=2)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+        self.assertTrue(self.acquire(buckets, 0.0, key="user:2", cost=4)[0])
+
+    def test_cost_above_burst_leaves_debt(self):
+        buckets = LocalBuckets(rate=2, burst=4)
+        self.assertTrue(self.acquire(buckets, 0.0, cost=10)[0])  # full bucket: admitted, 6 tokens owed
+        allowed, wait = self.acquire(buckets, 0.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 3.5)
+        self.assertTrue(self.acquire(buckets, 3.5)[0])
+
+    def test_lru_evicts_oldest_key(self):
+        buckets = LocalBuckets(rate=1, burst=1, max_keys=2)
+        self.acquire(buckets, 0.0, key="a")
+        self.acquire(buckets, 0.0, key="b")
+        self.acquire(buckets, 0.0, key="c")
+        self.assertEqual(list(buckets._buckets), ["b", "c"])
+        self.assertTrue(self.acquire(buckets, 0.0, key="a")[0])  # evicted -> fresh bucket
+
+
+
+class SharedBucketsTests(SimpleTestCase):
+    def test_processes_on_one_file_share_a_bucket(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        a = SharedBuckets(f"{tmp.name}/buckets", rate=1, burst=2)
+        b = SharedBuckets(f"{tmp.name}/buckets", rate=1, burst=2)  # another worker's view
+        with mock.patch("inference.ratelimit.time.monotonic", return_value=50.0):
+            self.assertTrue(a.acquire("user:1")[0])
+            self.assertTrue(b.acquire("user:1")[0])
+            allowed, wait = a.acquire("user:1")
+            self.assertTrue(b.acquire("user:2")[0])
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+
+class PredictionCacheTests(SimpleTestCase):
+    def at(self, now):
+        return mock.patch("inference.cache.time.monotonic", return_value=now)
+
+    def test_exact_hit_until_ttl(self):
+        cache = PredictionCache(ttl_seconds=5)
+        with self.at(0.0):
+            cache.put("v1", b"a", None, {"label": "x"})
+        with self.at(4.9):
+            self.assertEqual(cache.get("v1", b"a"), {"label": "x"})
+            self.assertIsNone(cache.get("v2", b"a"))  # another model version
+        with self.at(5.0):
+            self.assertIsNone(cache.get("v1", b"a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_similar_hit_within_distance_and_luminance(self):
+        cache = PredictionCache(max_distance=2, max_mean_delta=8.0)
+        with self.at(0.0):
+            cache.put("v1", b"a", (0b1111, 100.0), "x")
+            self.assertEqual(cache.get_similar("v1", (0b1100, 105.0)), "x")
+            self.assertIsNone(cache.get_similar("v1", (0b1000, 100.0)))  # 3 bits apart
+            self.assertIsNone(cache.get_similar("v1", (0b1111, 120.0)))  # brighter
+        self.assertEqual(cache.stats()["hits_similar"], 1)
+
+    def test_near_match_is_opt_in(self):
+        cache = PredictionCache()
+        self.assertFalse(cache.perceptual)
+        with self.at(0.0):
+            cache.put("v1", b"a", (0b1111, 100.0), "x")
+            self.assertIsNone(cache.get_similar("v1", (0b1111, 100.0)))
+
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_entries=2)
+        with self.at(0.0):
+            cache.put("v1", b"a", None, 1)
+            cache.put("v1", b"b", None, 2)
+            cache.get("v1", b"a")  # a is now the most recent
+            cache.put("v1", b"c", None, 3)
+            self.assertIsNone(cache.get("v1", b"b"))
+            self.assertEqual(cache.get("v1", b"a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+
+class InvalidImageTests(SimpleTestCase):
+    def test_undecodable_uploads_are_invalid_input(self):
+        with self.assertRaises(InvalidImage):
+            open_image(io.BytesIO(b"not an image"))
+
+        buf = io.BytesIO()
+        Image.new("RGB", (64, 64), (10, 20, 30)).save(buf, "JPEG")
+        with self.assertRaises(InvalidImage):  # the header parses; the pixels are cut off
+            load_rgb(open_image(io.BytesIO(buf.getvalue()[:300])))
+
+
+class RollupTests(TestCase):
+    now = datetime(2026, 10, 18, 12, 30, tzinfo=dt_timezone.utc)
+
+    def events(self, n, **fields):
+        return [{"created_at": self.now, "source": "web", "latency_ms": 10, "confidence": 0.5, **fields}
+                for _ in range(n)]
+
+    def test_flushes_increment_one_row_per_key(self):
+        rollups.add_events(self.events(3, user_id=1))
+        rollups.add_events(self.events(2, user_id=1, cached=True) + self.events(1))
+        rows = UsageRollup.objects.filter(period=UsageRollup.HOUR).order_by("user_bucket")
+        self.assertEqual([(r.user_bucket, r.events, r.cached, r.latency_ms_sum) for r in rows],
+                         [(-1, 1, 0, 10), (1, 5, 2, 50)])
+        self.assertEqual(UsageRollup.objects.count(), 4)  # hour + day per user bucket
+
+    def test_compact_merges_duplicate_rows(self):
+        UsageRollup.objects.bulk_create(rollups.rollup_rows(self.events(2)) + rollups.rollup_rows(self.events(3)))
+        self.assertEqual(rollups.compact(), 2)
+        self.assertEqual(sorted(UsageRollup.objects.values_list("events", flat=True)), [5, 5])
+
+
+
+class DeletedModelFlushTests(TestCase):
+    def setUp(self):
+        self.kept = MLModel.objects.create(name="kept", arch="effnet_b0", file="models/kept.pth")
+        self.gone = MLModel.objects.create(name="gone", arch="effnet_b0", file="models/gone.pth")
+
+    def test_events_of_a_deleted_model_keep_the_batch(self):
+        batch = [{"model_id": m.pk, "user_id": None, "source": "web", "created_at": timezone.now()}
+                 for m in (self.kept, self.gone)]
+        self.gone.delete()
+        buffer = EventBuffer()
+        buffer._write(batch)
+
+        self.assertEqual((buffer.written, buffer.failed), (2, 0))
+        self.assertEqual(sorted(InferenceEvent.objects.values_list("model_id", flat=True), key=str),
+                         [self.kept.pk, None])
+        self.assertEqual(UsageRollup.objects.filter(model=self.kept, period=UsageRollup.HOUR).get().events, 1)
+
+    def test_metrics_of_a_deleted_model_are_dropped(self):
+        gone = self.gone.pk
+        self.gone.delete()
+        metrics.write({self.kept.pk: metrics.ModelStats(), gone: metrics.ModelStats(), None: metrics.ModelStats()})
+        shadow.write({(self.kept.pk, gone): shadow.ShadowStats(), (gone, self.kept.pk): shadow.ShadowStats()})
+
+        self.assertEqual(sorted(InferenceMetrics.objects.values_list("model_id", flat=True), key=str),
+                         [self.kept.pk, None])
+        self.assertEqual(list(ShadowMetrics.objects.values_list("model_id", "served_model_id")), [(self.kept.pk, None)])
+
+
+
+class AdminCascadeTests(TestCase):
+    def setUp(self):
+        self.cheap = MLModel.objects.create(name="cheap", arch="mlp", file="models/cheap.pth",
+                                            cascade_enabled=True, cascade_threshold=0.8)
+        self.active = MLModel.objects.create(name="active", arch="effnet_b0", file="models/active.pth", is_active=True)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("admin", is_staff=True))
+
+    def events(self, n, model, **fields):
+        InferenceEvent.objects.bulk_create([InferenceEvent(model=model, **fields) for _ in range(n)])
+
+    def test_escalation_counts_only_frames_answered_by_the_chain(self):
+        self.events(3, self.cheap, cascade_stage=0)
+        self.events(1, self.active, cascade_stage=1)
+        self.events(2, self.cheap, cached=True)  # cache hits: no stage ran
+        self.events(4, self.active, cascade_stage=0)  # served before the cheap stage was added
+        self.events(5, self.active)  # no cascade at all
+
+        body = self.client.get("/api/admin/cascade/").json()
+        self.assertEqual(body["frames"], 4)
+        self.assertEqual([(st["model_id"], st["reached"], st["answered"], st["escalation_rate"]) for st in body["stages"]],
+                         [(self.cheap.pk, 4, 3, 0.25), (self.active.pk, 1, 1, None)])
+        self.assertEqual(body["escalated_to_final"], 0.25)
+
+
+class UploadFinishTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_second_complete_returns_the_same_model(self):
+        upload = uploads.start(None, {"name": "m", "arch": "effnet_b0"}, "m.pth", 4)
+        uploads.write_chunk(upload, 0, io.BytesIO(b"abcd"), 4)
+        stale = ModelUpload.objects.get(pk=upload.pk)  # loaded before the first /complete finished
+
+        model = uploads.finish(upload)
+        self.assertEqual(uploads.finish(stale), model)
+        self.assertEqual(MLModel.objects.count(), 1)
+
+
+
+class ModelDeleteTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("admin", is_staff=True))
+
+    @mock.patch("api.admin_views.request_model_refresh")
+    def test_delete_removes_converted_artifacts_and_refreshes(self, refresh):
+        m = MLModel.objects.create(name="m", arch="effnet_b0", file="models/m.pth")
+        os.makedirs(os.path.dirname(m.file.path))
+        paths = [artifact_path(m.file.path, backend) for backend in BACKENDS]  # eager: the .pth itself
+        for path in paths:
+            path.write_bytes(b"x")
+
+        self.assertEqual(self.client.delete(f"/api/admin/models/{m.pk}/delete/").status_code, 204)
+        self.assertEqual([p.name for p in paths if p.exists()], [])
+        refresh.assert_called_once()
+
+
+class ProfilingGateTests(TestCase):
+    def model(self, status="", **fields):
+        return MLModel.objects.create(name="m", arch="effnet_b0", file="models/m.pth", profile_status=status, **fields)
+
+    def test_stale_pending_profile_expires(self):
+        now = timezone.now()
+        stale = self.model(MLModel.PROFILE_PENDING, profile_heartbeat_at=now - timedelta(seconds=profiling.STALE_SECONDS + 1))
+        live = self.model(MLModel.PROFILE_PENDING, profile_heartbeat_at=now)
+
+        self.assertEqual(profiling.expire_stale(), 1)
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(stale.profile_status, MLModel.PROFILE_FAILED)
+        self.assertEqual(live.profile_status, MLModel.PROFILE_PENDING)
+
+    def test_pending_blocks_even_with_force(self):
+        m = self.model(MLModel.PROFILE_PENDING, profile_heartbeat_at=timezone.now())
+        self.assertIsNotNone(profiling.activation_blocker(m, None, force=True))
+
+    def test_unprofiled_needs_force(self):
+        m = self.model()
+        self.assertIsNotNone(profiling.activation_blocker(m, None))
+        self.assertIsNone(profiling.activation_blocker(m, None, force=True))
+
+    @override_settings(INFER_PROFILE_MAX_P95_REGRESSION=0.25)
+    def test_p95_regression_blocks(self):
+        active = self.model(MLModel.PROFILE_OK, profile_p95_ms=10.0)
+        self.assertIsNone(profiling.activation_blocker(self.model(MLModel.PROFILE_OK, profile_p95_ms=12.0), active))
+        self.assertIsNotNone(profiling.activation_blocker(self.model(MLModel.PROFILE_OK, profile_p95_ms=13.0), active))
+
+
+class SharedStreamTableTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = f"{tmp.name}/streams"
+
+    def sessions(self, slots):
+        # a second StreamSessions on the same file stands in for another worker
+        return StreamSessions(lambda: StreamState(alpha=1.0, stable_frames=3), shm=self.path, slots=slots)
+
+    def frame(self, sessions, key, idx):
+        probs = torch.zeros(4)
+        probs[idx] = 1.0
+        state = sessions.get(key)
+        with state.session():
+            return state.update(probs, str)
+
+    def test_colliding_sessions_both_commit(self):
+        workers = [self.sessions(slots=2), self.sessions(slots=2)]  # every key shares one window
+        for i in range(3):
+            self.frame(workers[i % 2], ("user", "a"), 1)
+            self.frame(workers[(i + 1) % 2], ("user", "b"), 2)
+        self.assertEqual(self.frame(workers[0], ("user", "a"), 1)["text"], "1")
+        self.assertEqual(self.frame(workers[1], ("user", "b"), 2)["text"], "2")
+
+    def test_full_window_falls_back_to_process_state(self):
+        workers = [self.sessions(slots=2), self.sessions(slots=2)]
+        self.frame(workers[0], "a", 0)
+        self.frame(workers[0], "b", 0)
+        for _ in range(3):  # no free slot: "c" keeps going in this worker without evicting a or b
+            out = self.frame(workers[0], "c", 3)
+        self.assertEqual(out["text"], "3")
+        self.assertEqual(self.frame(workers[1], "a", 0)["stable_frames"], 2)
+
+
+class TelemetrySpoolTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        override = override_settings(INFER_TELEMETRY_DIR=self.dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def dead_file(self, pid, count):
+        rows = [("bsl_throttled_total", {}, count)]
+        with open(f"{self.dir}/{telemetry._HOST}-{pid}.json", "w", encoding="utf-8") as f:
+            json.dump([("bsl_throttled_total", "counter", "", rows)], f)
+
+    def throttled(self):
+        own = telemetry.THROTTLED._merged().get((), 0)
+        line = next(l for l in telemetry.render().splitlines() if l.startswith("bsl_throttled_total "))
+        return float(line.split()[1]) - own
+
+    @mock.patch.object(telemetry, "_pid_alive", return_value=False)
+    def test_dead_processes_are_folded_once(self, _):
+        self.dead_file(101, 3)
+        self.dead_file(102, 4)
+        self.assertEqual(self.throttled(), 7)
+        self.assertEqual(self.throttled(), 7)
+        self.dead_file(103, 1)
+        self.assertEqual(self.throttled(), 8)
+        self.assertEqual([n for n in os.listdir(self.dir) if n.endswith(".json")], ["_folded.json"])
+
+
+@override_settings(METRICS_TOKEN="")
+class MetricsAccessTests(SimpleTestCase):
+    def test_without_a_token_only_internal_addresses_scrape(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="93.184.216.34").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="127.0.0.1",
+                                         HTTP_X_FORWARDED_FOR="93.184.216.34").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret",
+                                         REMOTE_ADDR="93.184.216.34").status_code, 200)
+
+
+class InferenceAuthCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = get_user_model().objects.create_user("signer", password="old-pass")
+        self.auth = InferenceJWTAuthentication()
+
+    def resolve(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def test_cached_user_skips_the_query(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.resolve(token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve(token), self.user)
+
+    def test_deactivation_evicts_the_cached_user(self):
+        token = AccessToken.for_user(self.user)
+        self.resolve(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.resolve(token)
+
+    def test_password_change_revokes_tokens_with_a_cached_user(self):
+        with mock.patch.object(jwt_settings, "CHECK_REVOKE_TOKEN", True):
+            token = AccessToken.for_user(self.user)
+            self.resolve(token)
+            self.user.set_password("new-pass")
+            self.user.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.resolve(token)
+
+
+class CompactRendererTests(SimpleTestCase):
+    def test_binary_round_trip(self):
+        probs = torch.tensor([0.1, 0.6, 0.05, 0.25])
+        out = {"model_id": None, "latency_ms": 12, "cached": True,
+               "stream": {"index": 1, "confidence": 0.5, "stable_frames": 3, "committed": None}}
+        data = unpack_binary(pack_binary(compact(out, probs, k=2, full=True, labels_etag="0123456789abcdef")))
+
+        self.assertEqual((data["model_id"], data["latency_ms"], data["cached"], data["labels_etag"]),
+                         (None, 12, True, "0123456789abcdef"))
+        self.assertEqual(data["indices"], [1, 3])
+        self.assertEqual(data["probs"], [0.60009765625, 0.25])  # float16
+        self.assertEqual(len(data["full"]), 4)
+        self.assertEqual(data["stream"], {"index": 1, "confidence": 0.5, "stable_frames": 3, "committed": False})
+
+    def negotiated(self, accept):
+        request = Request(APIRequestFactory().post("/api/infer", HTTP_ACCEPT=accept))
+        renderers = [r() for r in InferView.renderer_classes]
+        return DefaultContentNegotiation().select_renderer(request, renderers)[0]
+
+    def test_json_requests_get_the_full_payload(self):
+        # DRF's JSONRenderer has a `compact` attribute of its own: detection must go by type
+        self.assertFalse(is_compact(self.negotiated("application/json")))
+        self.assertTrue(is_compact(self.negotiated(BINARY_MEDIA_TYPE)))
+
+
+@override_settings(INFER_ROI_DETECTOR="skin", INFER_ROI_SIZE=128, INFER_ROI_DETECT_WIDTH=160)
+class HandRoiTests(SimpleTestCase):
+    SKIN, BACKGROUND = (220, 170, 140), (20, 40, 120)
+
+    def frame(self, x):
+        img = Image.new("RGB", (320, 240), self.BACKGROUND)
+        img.paste(self.SKIN, (x, 60, x + 60, 140))
+        return img
+
+    def test_detects_then_tracks_the_hand(self):
+        track = hands.Track()
+        roi, how = hands.extract(self.frame(200), track)
+        self.assertEqual(how, "detected")
+        self.assertEqual(roi.size, (128, 128))
+        self.assertEqual(roi.getpixel((64, 64)), self.SKIN)
+        for got, want in zip(track.box, (200 / 320, 60 / 240, 260 / 320, 140 / 240)):
+            self.assertAlmostEqual(got, want, delta=1 / 15)  # within one detector grid cell
+
+        roi, how = hands.extract(self.frame(208), track)  # the hand moved a little
+        self.assertEqual(how, "tracked")
+        self.assertEqual(roi.getpixel((64, 64)), self.SKIN)
+
+    def test_no_hand_no_roi(self):
+        self.assertEqual(hands.extract(Image.new("RGB", (320, 240), self.BACKGROUND), hands.Track()), (None, "none"))
+
+
+class ShadowAgreementTests(SimpleTestCase):
+    def test_agreement_is_counted_per_candidate_and_served_model(self):
+        runner = shadow.ShadowRunner(lambda: [], num_classes=4)
+        runner._candidates = {"k": (SimpleNamespace(model_id=7), torch.nn.Identity())}  # "logits" are the frames
+        frames = [
+            ([4.0, 3.0, 2.0, 1.0], 0, 1),  # top-1 agrees
+            ([4.0, 3.0, 2.0, 1.0], 2, 1),  # served answer is the candidate's 3rd choice
+            ([4.0, 3.0, 2.0, 1.0], 3, 1),  # not even top-3
+            ([1.0, 4.0, 2.0, 3.0], 1, None),  # agrees, with the bundled weights serving
+        ]
+        runner._evaluate([(torch.tensor(x), served, served_model) for x, served, served_model in frames])
+
+        stats = runner.drain()
+        self.assertEqual(sorted(stats, key=str), [(7, 1), (7, None)])
+        self.assertEqual((stats[(7, 1)].frames, stats[(7, 1)].agree, stats[(7, 1)].agree_top3), (3, 1, 2))
+        self.assertEqual((stats[(7, None)].frames, stats[(7, None)].agree, stats[(7, None)].agree_top3), (1, 1, 1))
+        self.assertEqual(stats[(7, 1)].summary()["agreement"], 0.3333)
+        self.assertEqual(runner.drain(), {})
+
+
+class TuningFileTests(SimpleTestCase):
+    def write(self, cpus):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return tuning.save({"host": {"cpus": cpus}, "config": {"batch_size": 16}}, path=f"{tmp.name}/tuning.json")
+
+    def test_file_for_this_host_is_used(self):
+        self.assertEqual(tuning.load(self.write(tuning.available_cpus())), {"batch_size": 16})
+
+    def test_file_for_other_cpus_is_ignored(self):
+        path = self.write(tuning.available_cpus() + [4096])
+        with self.assertLogs("inference.tuning", "WARNING"):
+            self.assertEqual(tuning.load(path), {})
+
+    @mock.patch.object(tuning, "_topology_key", side_effect=lambda cpu: (0, cpu, cpu))
+    def test_cpu_sets_wrap_around(self, _):
+        self.assertEqual(tuning.cpu_sets([3, 2, 1, 0], workers=2, threads=2), [[0, 1], [2, 3]])
+        self.assertEqual(tuning.cpu_sets([0, 1], workers=3, threads=1), [[0], [1], [0]])
+
+
+class _ColourModel(torch.nn.Module):
+    """Predicts class 0 / 1 / 2 for a red / green / blue image."""
+
+    def __init__(self, num_classes):
+        super().__init__()
+        self.num_classes = num_classes
+
+    def forward(self, x):
+        logits = torch.zeros((x.shape[0], self.num_classes))
+        logits[torch.arange(x.shape[0]), x.mean(dim=(2, 3)).argmax(dim=1)] = 1.0
+        return logits
+
+
+class EvaluateModelTests(SimpleTestCase):
+    RED, GREEN, BLUE = (255, 0, 0), (0, 255, 0), (0, 0, 255)
+
+    def test_confusion_matrix_on_a_tiny_folder(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        images = {"0": [self.RED, self.RED, self.BLUE], "1": [self.GREEN, self.GREEN], "2": [self.BLUE],
+                  "no-such-class": [self.RED]}
+        for cls, colours in images.items():
+            os.makedirs(f"{tmp.name}/set/{cls}")
+            for i, colour in enumerate(colours):
+                Image.new("RGB", (32, 32), colour).save(f"{tmp.name}/set/{cls}/{i}.png")
+        with open(f"{tmp.name}/set/0/broken.jpg", "wb") as f:
+            f.write(b"not an image")
+
+        with mock.patch("api.management.commands.evaluate_model.load_model",
+                        lambda arch, path, num_classes: _ColourModel(num_classes)):
+            call_command("evaluate_model", "--path", "unused.pth", "--data", f"{tmp.name}/set", "--workers", "0",
+                         "--threads", str(torch.get_num_threads()), "--json", f"{tmp.name}/report.json",
+                         stdout=io.StringIO())
+        with open(f"{tmp.name}/report.json", encoding="utf-8") as f:
+            report = json.load(f)
+
+        confusion = torch.tensor(report["confusion"])
+        self.assertEqual({(t, p): int(confusion[t, p]) for t, p in confusion.nonzero().tolist()},
+                         {(0, 0): 2, (0, 2): 1, (1, 1): 2, (2, 2): 1})
+        self.assertEqual((report["images"], report["accuracy"]), (6, 0.8333))
+        self.assertEqual((report["skipped_unknown_class"], report["failed_to_decode"]), (1, 1))
+        self.assertEqual([(c["index"], c["recall"], c["precision"]) for c in report["per_class"][:3]],
+                         [(0, 0.6667, 1.0), (1, 1.0, 1.0), (2, 1.0, 0.5)])
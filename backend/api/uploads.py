@@ -0,0 +1,188 @@
+"""
+Resumable chunked uploads for model artifacts (admin models API).
+
+    POST   /api/admin/models/uploads/                 {name, arch, version?, description?, filename, size}
+    GET    /api/admin/models/uploads/<id>/            -> {offset, size, ...}: where to resume
+    PUT    /api/admin/models/uploads/<id>/            raw bytes, Upload-Offset: <offset>
+    POST   /api/admin/models/uploads/<id>/complete/   {sha256?} -> the new MLModel
+    DELETE /api/admin/models/uploads/<id>/            abort
+
+Chunks are streamed from the request body straight into the final file under
+models/ in MODEL_UPLOAD_READ_BYTES blocks, so a worker's memory does not grow
+with the artifact (or the chunk). A chunk must start at the current offset
+(else 409 with the offset to resume from); a chunk cut short by a dropped
+connection still counts for the bytes that arrived.
+
+The SHA-256 is computed as the bytes arrive. hashlib state cannot be stored,
+so each process keeps its own running hash per upload and, when chunks went
+to other workers, first catches up by reading only the bytes it has not seen
+from the file: every worker reads each byte at most once.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import MLModel, ModelUpload
+
+
+class UploadConflict(Exception):
+    """The chunk does not start at the current offset, or another chunk is being written."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"upload is at offset {offset}")
+        self.offset = offset
+
+
+def _read_bytes() -> int:
+    return getattr(settings, "MODEL_UPLOAD_READ_BYTES", 1024 * 1024)
+
+
+# ---- running hashes (per process) ----
+_hashes = OrderedDict()  # upload id -> [hasher, offset]
+_hashes_lock = threading.Lock()
+_MAX_HASHES = 64
+
+
+def _running_hash(upload: ModelUpload, f, offset: int):
+    """The SHA-256 of the file's first `offset` bytes, reusing this process's running hash."""
+    with _hashes_lock:
+        entry = _hashes.get(upload.pk)
+        if entry is None or entry[1] > offset:
+            entry = _hashes[upload.pk] = [hashlib.sha256(), 0]
+        _hashes.move_to_end(upload.pk)
+        while len(_hashes) > _MAX_HASHES:
+            _hashes.popitem(last=False)
+
+    h, pos = entry
+    f.seek(pos)
+    block = _read_bytes()
+    while pos < offset:
+        data = f.read(min(block, offset - pos))
+        if not data:
+            raise ValueError(f"upload file is shorter than its offset ({pos} < {offset})")
+        h.update(data)
+        pos += len(data)
+    entry[1] = pos
+    return entry
+
+
+def _forget(upload_id):
+    with _hashes_lock:
+        _hashes.pop(upload_id, None)
+
+
+class _locked:
+    """Open the upload's file for writing with an exclusive, non-blocking lock (409 when busy)."""
+
+    def __init__(self, upload: ModelUpload):
+        self.upload = upload
+
+    def __enter__(self):
+        self.f = open(default_storage.path(self.upload.path), "r+b")
+        try:
+            fcntl.flock(self.f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.f.close()
+            raise UploadConflict(self.upload.received)
+        self.upload.refresh_from_db()
+        return self.f
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+
+
+# ---- protocol ----
+def start(user, meta: dict, filename: str, size: int) -> ModelUpload:
+    """Reserve models/<filename> (made unique), create it empty and record the upload."""
+    prune_stale()
+    name = get_valid_filename(os.path.basename(filename or "")) or "model.pth"
+    path = default_storage.get_available_name(f"{MLModel._meta.get_field('file').upload_to}{name}")
+    full = default_storage.path(path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    open(full, "xb").close()
+    return ModelUpload.objects.create(path=path, size=size, created_by=user, **meta)
+
+
+def write_chunk(upload: ModelUpload, offset: int, stream, length: int) -> int:
+    """Copy `length` bytes from `stream` into the file at `offset`; returns the new offset."""
+    if upload.complete:
+        raise UploadConflict(upload.received)
+    if offset + length > upload.size:
+        raise ValueError(f"chunk ends at {offset + length}, past the declared size {upload.size}")
+
+    with _locked(upload) as f:
+        if upload.complete or offset != upload.received:
+            raise UploadConflict(upload.received)
+        entry = _running_hash(upload, f, offset)
+        h = entry[0]
+
+        f.seek(offset)
+        block, written = _read_bytes(), 0
+        try:
+            while written < length:
+                data = stream.read(min(block, length - written))
+                if not data:
+                    break
+                f.write(data)
+                h.update(data)
+                written += len(data)
+        finally:
+            # keep whatever arrived, even from a dropped connection, so the client can resume
+            f.flush()
+            os.fsync(f.fileno())
+            entry[1] = offset + written
+            upload.received = offset + written
+            ModelUpload.objects.filter(pk=upload.pk).update(received=upload.received, updated_at=timezone.now())
+    return upload.received
+
+
+def finish(upload: ModelUpload, sha256: str = "") -> MLModel:
+    """Verify size (and the client's checksum, if given) and register the MLModel."""
+    if upload.complete:
+        return upload.model
+
+    with _locked(upload) as f:
+        if upload.complete:  # a concurrent /complete registered it while we waited for the lock
+            return upload.model
+        if upload.received != upload.size:
+            raise UploadConflict(upload.received)
+        f.truncate(upload.size)
+        digest = _running_hash(upload, f, upload.size)[0].hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise ValueError(f"checksum mismatch: received bytes hash to {digest}")
+
+        with transaction.atomic():
+            m = MLModel(name=upload.name, arch=upload.arch, version=upload.version,
+                        description=upload.description, created_by=upload.created_by)
+            m.file.name = upload.path
+            m.save()
+            upload.model, upload.sha256 = m, digest
+            upload.save(update_fields=["model", "sha256", "updated_at"])
+    _forget(upload.pk)
+    return m
+
+
+def abort(upload: ModelUpload):
+    """Drop an unfinished upload and its partial file (a completed one keeps its file)."""
+    if not upload.complete:
+        default_storage.delete(upload.path)
+    _forget(upload.pk)
+    upload.delete()
+
+
+def prune_stale():
+    """Abort uploads untouched for MODEL_UPLOAD_EXPIRE_HOURS."""
+    hours = getattr(settings, "MODEL_UPLOAD_EXPIRE_HOURS", 24)
+    cutoff = timezone.now() - timedelta(hours=hours)
+    for upload in ModelUpload.objects.filter(model__isnull=True, updated_at__lt=cutoff):
+        abort(upload)
@@ -1,5 +1,5 @@
 from django.urls import path
-from inference.views import InferView
+from inference.views import InferBatchView, InferView, LabelsView
 from .views import health
 from .auth_views import login, refresh, logout, me
 from . import admin_auth_views
@@ -29,14 +29,26 @@ urlpatterns = [
     path("admin/overview/", admin_views.admin_overview),
     path("admin/models/", admin_views.admin_models_list),
     path("admin/models/upload/", admin_views.admin_models_upload),
+    path("admin/models/uploads/", admin_views.admin_models_upload_start),
+    path("admin/models/uploads/<uuid:upload_id>/", admin_views.admin_models_upload_chunk),
+    path("admin/models/uploads/<uuid:upload_id>/complete/", admin_views.admin_models_upload_complete),
     path("admin/models/<int:model_id>/toggle/", admin_views.admin_models_toggle),
     path("admin/models/<int:model_id>/activate/", admin_views.admin_models_set_active),
     path("admin/models/<int:model_id>/delete/", admin_views.admin_models_delete),
+    path("admin/models/<int:model_id>/usage/", admin_views.admin_model_usage),
+    path("admin/models/<int:model_id>/metrics/", admin_views.admin_model_metrics),
+    path("admin/models/<int:model_id>/cascade/", admin_views.admin_models_cascade),
+    path("admin/models/<int:model_id>/profile/", admin_views.admin_models_profile),
+    path("admin/models/<int:model_id>/shadow/", admin_views.admin_models_shadow),
+    path("admin/cascade/", admin_views.admin_cascade),
+    path("admin/shadow/", admin_views.admin_shadow),
 
 
     #ML API
 
     path("infer", InferView.as_view()),
+    path("infer/batch", InferBatchView.as_view()),
+    path("infer/labels", LabelsView.as_view()),
 
 
 ] 
@@ -1,9 +1,54 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from inference.events import get_event_buffer
+from inference.pool import PoolError
+from inference.predictor import get_pool_client
+from inference import telemetry
+
 @api_view(["GET"])
 def health(request):
-    return Response({"status": "ok", "service": "project-tango-backend"})
+    body = {"status": "ok", "service": "project-tango-backend"}
+
+    client = get_pool_client()
+    if client is not None:
+        try:
+            body["inference"] = client.health()
+        except PoolError as e:
+            body["status"] = "degraded"
+            body["inference"] = {"error": str(e)}
+
+    body["events"] = get_event_buffer().stats()
+    return Response(body)
+
+
+
+def _internal(request) -> bool:
+    """A direct request from a loopback / private address (not relayed by a proxy)."""
+    if "X-Forwarded-For" in request.headers:
+        return False
+    try:
+        addr = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return addr.is_loopback or addr.is_private
+
 
+def metrics(request):
+    """
+    Prometheus scrape endpoint (plain Django view: no DRF auth on the scrape path).
+    Requires METRICS_TOKEN when set; without one, only internal addresses may scrape.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        if request.headers.get("Authorization", "") != f"Bearer {token}":
+            return HttpResponse(status=401)
+    elif not _internal(request):
+        return HttpResponse(status=403)
+    return HttpResponse(telemetry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
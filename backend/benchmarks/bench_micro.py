@@ -0,0 +1,131 @@
+"""
+Isolated micro-benchmarks for the per-frame hot path:
+
+  transform  predictor.transform on a decoded 128x128 ROI (reference pipeline)
+  preprocess inference.preprocess on the same ROI (what requests use)
+  forward    random EfficientNet-B0 forward pass at batch 1 and --batch-size
+  auth       CookieJWTAuthentication.authenticate on a cookie request (dev DB)
+
+Run from backend/:
+    python -m benchmarks.bench_micro --json micro.json
+    python -m benchmarks.bench_micro --only forward --threads 4
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+
+import torch
+from PIL import Image
+
+from benchmarks.bench_preprocess import make_jpeg
+
+
+def timeit(fn, runs: int, warmup: int = 3) -> dict:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    median = statistics.median(times)
+    return {
+        "runs": runs,
+        "median_us": round(median * 1e6, 1),
+        "p95_us": round(times[min(len(times) - 1, int(0.95 * len(times)))] * 1e6, 1),
+        "per_s": round(1.0 / median, 1) if median > 0 else None,
+    }
+
+
+def bench_transform(runs: int, size: int):
+    from inference import preprocess
+    from inference.predictor import transform
+
+    img = Image.open(io.BytesIO(make_jpeg(size, size))).convert("RGB")
+    img.load()
+    return {
+        "transform": timeit(lambda: transform(img), runs),
+        "preprocess": timeit(lambda: preprocess.preprocess(img), runs),
+    }
+
+
+def bench_forward(runs: int, batch_size: int):
+    from inference.model_manager import ARCH_BUILDERS
+    from inference.predictor import BUNDLED_LABELS_PATH
+
+    with open(BUNDLED_LABELS_PATH, "r", encoding="utf-8") as f:
+        num_classes = len(json.load(f))
+    torch.manual_seed(0)
+    model = ARCH_BUILDERS["effnet_b0"](num_classes).eval()
+    out = {}
+    with torch.inference_mode():
+        for b in sorted({1, batch_size}):
+            x = torch.randn(b, 3, 224, 224)
+            r = timeit(lambda: model(x), max(3, runs // b))
+            r["images_per_s"] = round(r["per_s"] * b, 1) if r["per_s"] else None
+            out[f"forward_b{b}"] = r
+    return out
+
+
+def bench_auth(runs: int):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.dev")
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from api.authentication import CookieJWTAuthentication
+
+    call_command("migrate", verbosity=0)
+    user, _ = get_user_model().objects.get_or_create(username="bench", defaults={"email": "bench@localhost"})
+    raw = str(AccessToken.for_user(user))
+
+    django_request = RequestFactory().post("/api/infer")
+    django_request.COOKIES[settings.JWT_AUTH_COOKIE] = raw
+    request = Request(django_request)
+    auth = CookieJWTAuthentication()
+    return {"auth": timeit(lambda: auth.authenticate(request), runs)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--size", type=int, default=128, help="ROI edge for transform/preprocess")
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    ap.add_argument("--only", help="comma-separated subset of transform,forward,auth")
+    ap.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = ap.parse_args()
+
+    torch.set_num_threads(args.threads)
+    wanted = set((args.only or "transform,forward,auth").split(","))
+
+    results = {"torch_threads": args.threads}
+    if "transform" in wanted:
+        results.update(bench_transform(args.runs, args.size))
+    if "forward" in wanted:
+        results.update(bench_forward(args.runs, args.batch_size))
+    if "auth" in wanted:
+        results.update(bench_auth(args.runs))
+
+    for name, r in results.items():
+        if isinstance(r, dict):
+            extra = f"  {r['images_per_s']:>8.1f} img/s" if "images_per_s" in r else ""
+            print(f"{name:<12} median {r['median_us']:>10.1f} us  p95 {r['p95_us']:>10.1f} us  {r['per_s']:>9.1f}/s{extra}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: predictor.transform (PIL Resize -> ToTensor -> Normalize)
+vs inference.preprocess (direct decode, draft JPEG, fused normalize).
+
+Run from backend/:
+    python -m benchmarks.bench_preprocess --n 500
+"""
+import argparse
+import io
+import json
+import time
+
+import torch
+from PIL import Image
+
+from inference import preprocess
+from inference.predictor import transform
+
+
+def make_jpeg(w: int, h: int, seed: int = 0, quality: int = 75) -> bytes:
+    g = torch.Generator().manual_seed(seed)
+    noise = torch.randint(0, 64, (h, w, 3), generator=g, dtype=torch.uint8)
+    ramp = (torch.arange(w, dtype=torch.int32) * 191 // max(1, w - 1)).to(torch.uint8)
+    pixels = noise + ramp.view(1, w, 1)
+    img = Image.frombytes("RGB", (w, h), pixels.numpy().tobytes())
+
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def baseline(data: bytes) -> torch.Tensor:
+    img = Image.open(io.BytesIO(bytes(data)))  # mirrors the old f.read() copy
+    return transform(img.convert("RGB"))
+
+
+def fast(data: bytes, draft: bool = True) -> torch.Tensor:
+    img = preprocess.open_image(io.BytesIO(data))
+    return preprocess.to_tensor(preprocess.load_rgb(img, draft=draft))
+
+
+def fast_batch(frames, out: torch.Tensor) -> torch.Tensor:
+    imgs = [preprocess.open_image(io.BytesIO(d)) for d in frames]
+    return preprocess.preprocess_batch(imgs, out=out)
+
+
+def rate(fn, frames, repeat: int) -> float:
+    fn(frames[0])  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for d in frames:
+            fn(d)
+    return repeat * len(frames) / (time.perf_counter() - t0)
+
+
+def run(n: int, sizes, batch_size: int, repeat: int):
+    results = []
+    for (w, h) in sizes:
+        frames = [make_jpeg(w, h, seed=i) for i in range(n)]
+
+        # numerical equivalence (draft off: identical decode + resize path)
+        max_diff = max(float((baseline(d) - fast(d, draft=False)).abs().max()) for d in frames[:32])
+        draft_diff = max(float((baseline(d) - fast(d)).abs().max()) for d in frames[:32])
+
+        base_ips = rate(baseline, frames, repeat)
+        fast_ips = rate(fast, frames, repeat)
+
+        out = preprocess.alloc_batch(batch_size)
+        chunks = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for c in chunks:
+                fast_batch(c, out)
+        batch_ips = repeat * len(frames) / (time.perf_counter() - t0)
+
+        results.append({
+            "input": f"{w}x{h}",
+            "max_abs_diff": max_diff,
+            "max_abs_diff_draft": draft_diff,
+            "baseline_img_per_s": round(base_ips, 1),
+            "fast_img_per_s": round(fast_ips, 1),
+            "fast_batch_img_per_s": round(batch_ips, 1),
+            "speedup": round(fast_ips / base_ips, 2),
+        })
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=200, help="distinct frames per input size")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--sizes", default="128x128,224x224,640x480", help="comma-separated WxH")
+    ap.add_argument("--tolerance", type=float, default=1e-5)
+    ap.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = ap.parse_args()
+
+    torch.set_num_threads(1)
+    sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes.split(",")]
+    results = run(args.n, sizes, args.batch_size, args.repeat)
+
+    for r in results:
+        ok = "OK" if r["max_abs_diff"] <= args.tolerance else "MISMATCH"
+        print(
+            f"{r['input']:>9}  baseline {r['baseline_img_per_s']:>8.1f} img/s  "
+            f"fast {r['fast_img_per_s']:>8.1f} img/s  batch {r['fast_batch_img_per_s']:>8.1f} img/s  "
+            f"x{r['speedup']:<5}  diff {r['max_abs_diff']:.2e} [{ok}]  draft diff {r['max_abs_diff_draft']:.2e}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if any(r["max_abs_diff"] > args.tolerance for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
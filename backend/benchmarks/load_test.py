@@ -0,0 +1,329 @@
+"""
+Load test for POST /api/infer: concurrent clients, each sending 128x128 JPEG
+ROIs at a fixed frame rate (open loop: a slow server does not slow the
+clients down, it shows up as latency and schedule lag).
+
+Against a running server (access token from /api/login or the tango_access cookie):
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --token <JWT> --clients 16 --fps 10
+
+Or let it start gunicorn with a random EfficientNet-B0 (INFER_RANDOM_WEIGHTS=1,
+dev settings DB, a "bench" user is created):
+    python -m benchmarks.load_test --serve --workers 2 --clients 16 --fps 10 --json run.json
+
+Compare against an earlier run (exit 1 if p95 regressed more than --max-regression):
+    python -m benchmarks.load_test --serve --compare run.json
+
+Server CPU and RSS come from the /metrics endpoint (process_cpu_seconds_total,
+process_resident_memory_bytes); they are summed over all workers only when
+the server has INFER_TELEMETRY_DIR set (--serve does this).
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmarks.bench_preprocess import make_jpeg
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BOUNDARY = "bsl-load-test-boundary"
+
+
+def multipart(jpeg: bytes) -> bytes:
+    head = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="roi.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    return head + jpeg + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+# ---- server side numbers ----
+def scrape(metrics_url: str, token: str = ""):
+    """{"cpu_seconds", "rss_bytes"} summed over the series /metrics exposes, or None."""
+    req = urllib.request.Request(metrics_url)
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            text = resp.read().decode()
+    except OSError:
+        return None
+
+    out = {"cpu_seconds": 0.0, "rss_bytes": 0.0}
+    for line in text.splitlines():
+        if line.startswith("process_cpu_seconds_total"):
+            out["cpu_seconds"] += float(line.rsplit(" ", 1)[1])
+        elif line.startswith("process_resident_memory_bytes"):
+            out["rss_bytes"] += float(line.rsplit(" ", 1)[1])
+    return out
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, metrics_url, token, interval=1.0):
+        super().__init__(daemon=True)
+        self.metrics_url, self.token, self.interval = metrics_url, token, interval
+        self.peak = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            s = scrape(self.metrics_url, self.token)
+            if s is not None:
+                self.peak = max(self.peak or 0.0, s["rss_bytes"])
+
+
+# ---- clients ----
+def client(idx, url, headers, bodies, fps, t_start, t_measure, t_end, out):
+    """Post frames on a fixed schedule; append (latency_s, status, lag_s) for requests sent after t_measure."""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    period = 1.0 / fps if fps > 0 else 0.0
+    offset = (idx % 16) * period / 16  # spread clients inside one frame period
+
+    k = 0
+    while True:
+        due = t_start + offset + k * period
+        if due >= t_end:
+            break
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+
+        body = bodies[(idx * 7919 + k) % len(bodies)]
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", parts.path or "/api/infer", body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        elapsed = time.perf_counter() - t0
+
+        if t0 >= t_measure:
+            out.append((elapsed, status, max(0.0, t0 - due)))
+        k += 1
+    conn.close()
+
+
+def run(args, base_url, token):
+    bodies = [multipart(make_jpeg(args.size, args.size, seed=i)) for i in range(args.frames)]
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "Authorization": f"Bearer {token}",
+        "Connection": "keep-alive",
+    }
+    metrics_url = args.metrics_url or base_url + "/metrics"
+
+    t_start = time.perf_counter() + 0.5
+    t_measure = t_start + args.warmup
+    t_end = t_measure + args.duration
+
+    samples = [[] for _ in range(args.clients)]
+    threads = [
+        threading.Thread(target=client, args=(i, base_url + "/api/infer", headers, bodies, args.fps,
+                                              t_start, t_measure, t_end, samples[i]), daemon=True)
+        for i in range(args.clients)
+    ]
+    for t in threads:
+        t.start()
+
+    time.sleep(max(0.0, t_measure - time.perf_counter()))
+    before = scrape(metrics_url, args.metrics_token)
+    sampler = RssSampler(metrics_url, args.metrics_token)
+    sampler.start()
+    w0 = time.perf_counter()
+
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - w0
+    sampler.stopped.set()
+    after = scrape(metrics_url, args.metrics_token)
+
+    rows = [r for per_client in samples for r in per_client]
+    ok = sorted(lat for (lat, status, _) in rows if status == 200)
+    lags = sorted(lag for (_, _, lag) in rows)
+    errors = {}
+    for (_, status, _) in rows:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    def ms(v):
+        return None if v is None else round(v * 1000, 2)
+
+    server = {"cpu_cores_used": None, "cpu_seconds": None, "rss_mb_peak": None}
+    if before and after:
+        cpu = after["cpu_seconds"] - before["cpu_seconds"]
+        server["cpu_seconds"] = round(cpu, 2)
+        server["cpu_cores_used"] = round(cpu / wall, 2) if wall > 0 else None
+        peak = max(sampler.peak or 0.0, after["rss_bytes"])
+        server["rss_mb_peak"] = round(peak / 2 ** 20, 1)
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "url": base_url, "clients": args.clients, "fps": args.fps, "duration_s": args.duration,
+            "warmup_s": args.warmup, "size": args.size, "frames": args.frames,
+            "workers": args.workers if args.serve else None, "threads": args.threads if args.serve else None,
+        },
+        "requests": len(rows),
+        "ok": len(ok),
+        "errors": errors,
+        "offered_rps": round(args.clients * args.fps, 1),
+        "throughput_rps": round(len(ok) / wall, 1) if wall > 0 else None,
+        "latency_ms": {
+            "p50": ms(percentile(ok, 0.50)),
+            "p95": ms(percentile(ok, 0.95)),
+            "p99": ms(percentile(ok, 0.99)),
+            "max": ms(ok[-1] if ok else None),
+            "mean": ms(sum(ok) / len(ok) if ok else None),
+        },
+        "schedule_lag_ms_p95": ms(percentile(lags, 0.95)),
+        "server": server,
+    }
+
+
+# ---- local server (--serve) ----
+def bench_token() -> str:
+    """Access token for a "bench" user in the configured (dev) database."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.dev")
+    import django
+
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    call_command("migrate", verbosity=0)
+    user, _ = get_user_model().objects.get_or_create(username="bench", defaults={"email": "bench@localhost"})
+    return str(AccessToken.for_user(user))
+
+
+def serve(args, port: int):
+    telemetry_dir = tempfile.mkdtemp(prefix="bsl-telemetry-")
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings.dev"),
+        "INFER_RANDOM_WEIGHTS": "1",
+        "INFER_CACHE_ENABLED": "1" if args.cache else "0",
+        "INFER_TELEMETRY_DIR": telemetry_dir,
+        "INFER_RATE_LIMIT_PER_SEC": "0",  # every client is the same "bench" user
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_THREADS": str(args.threads),
+    }
+    env.pop("INFER_POOL_SOCKET", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "config/gunicorn.conf.py", "config.wsgi:application",
+         "--bind", f"127.0.0.1:{port}", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/", timeout=2):
+                return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("server did not become healthy in time")
+
+
+def compare(report: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    ok = True
+    for key in ("p50", "p95", "p99"):
+        old, new = base["latency_ms"].get(key), report["latency_ms"].get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        flag = ""
+        if key == "p95" and change > max_regression:
+            flag, ok = "  REGRESSION", False
+        print(f"  {key}: {old:.1f} -> {new:.1f} ms ({change:+.1%}){flag}")
+    old_tp, new_tp = base.get("throughput_rps"), report.get("throughput_rps")
+    if old_tp and new_tp is not None:
+        print(f"  throughput: {old_tp:.1f} -> {new_tp:.1f} req/s ({(new_tp - old_tp) / old_tp:+.1%})")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL (ignored with --serve)")
+    ap.add_argument("--token", default=os.getenv("BENCH_TOKEN", ""), help="JWT access token (or BENCH_TOKEN)")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--fps", type=float, default=10.0, help="frames per second per client")
+    ap.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    ap.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before that")
+    ap.add_argument("--size", type=int, default=128, help="ROI edge in pixels")
+    ap.add_argument("--frames", type=int, default=256, help="distinct JPEGs to cycle through")
+    ap.add_argument("--metrics-url", help="default: <url>/metrics")
+    ap.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN", ""))
+    ap.add_argument("--serve", action="store_true", help="start gunicorn with random weights for the run")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--cache", action="store_true", help="keep the prediction cache on (--serve)")
+    ap.add_argument("--json", dest="json_path", help="also write the report to this file")
+    ap.add_argument("--compare", help="earlier --json report to compare with")
+    ap.add_argument("--max-regression", type=float, default=0.10, help="allowed p95 increase for --compare")
+    args = ap.parse_args()
+
+    proc = None
+    base_url, token = args.url.rstrip("/"), args.token
+    if args.serve:
+        token = bench_token()
+        proc = serve(args, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    elif not token:
+        ap.error("--token (or BENCH_TOKEN) is required without --serve")
+
+    try:
+        report = run(args, base_url, token)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    lat = report["latency_ms"]
+    srv = report["server"]
+    print(
+        f"{report['requests']} requests, {report['ok']} ok, errors {report['errors'] or '-'}\n"
+        f"throughput {report['throughput_rps']} req/s (offered {report['offered_rps']})\n"
+        f"latency ms p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}\n"
+        f"client schedule lag p95 {report['schedule_lag_ms_p95']} ms\n"
+        f"server cpu {srv['cpu_cores_used']} cores, rss peak {srv['rss_mb_peak']} MB"
+    )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare and not compare(report, args.compare, args.max_regression):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
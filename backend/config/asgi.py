@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; the webcam inference WebSocket (inference.ws) is routed
+here directly since nothing else in the project speaks WebSocket.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# needs Django apps loaded, so import after get_asgi_application()
+from inference.telemetry import enable_spool  # noqa: E402
+from inference.ws import WS_PATH, infer_socket  # noqa: E402
+
+enable_spool()  # WebSocket frames never pass TelemetryMiddleware, which starts it for HTTP
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        if scope["path"].rstrip("/") == WS_PATH:
+            return await infer_socket(scope, receive, send)
+        await receive()  # websocket.connect
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    return await django_application(scope, receive, send)
@@ -0,0 +1,97 @@
+"""
+Gunicorn config for the backend.
+
+With INFER_PRELOAD=1 (default) the active model is loaded once in the master
+before fork: its weights sit in shared memory, every worker maps the same
+pages, and a fresh worker never pays the cold load on its first request.
+Torch intra-op threads are split across workers so they don't oversubscribe
+the CPU (override with INFER_TORCH_THREADS).
+
+With a tuning file from `manage.py autotune` (inference/tuning.py), the
+worker count and torch threads come from it unless set in the env, and each
+worker is pinned to its own CPU set (INFER_CPU_AFFINITY=0 to disable).
+With INFER_POOL_SOCKET the tuning belongs to the inference pool: web workers
+keep the default count, one torch thread and no pinning, so they don't
+compete with the pool workers for the same CPU sets.
+"""
+import gc
+import itertools
+import os
+import sys
+from pathlib import Path
+
+# the tuning helpers are needed before gunicorn's --chdir / the app import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference import tuning  # noqa: E402
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, "") or default)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# with a separate inference service the web workers never hold a model
+remote_inference = bool(os.getenv("INFER_POOL_SOCKET", ""))
+tuned = {} if remote_inference else tuning.load()
+workers = _env_int("GUNICORN_WORKERS", tuned.get("workers", 2))
+threads = _env_int("GUNICORN_THREADS", 8)
+preload_app = os.getenv("INFER_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    # master, after the app is imported and before any worker is forked
+    if not preload_app or remote_inference:
+        return
+
+    import torch
+    from django.db import connections
+
+    # keep the master's OpenMP pool tiny; workers size their own after fork
+    torch.set_num_threads(1)
+
+    from inference.predictor import preload
+
+    try:
+        entry = preload()
+        server.log.info("preloaded model %s [%s] in %.0f ms", entry.model_id, entry.backend, entry.load_ms)
+    except Exception:
+        server.log.exception("model preload failed; workers will load lazily")
+    finally:
+        connections.close_all()  # never share DB sockets across fork
+
+    # move everything allocated so far out of the GC's reach so collections
+    # in the workers don't write to (and un-share) those pages
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # master: give the new worker the lowest CPU set no live worker holds (a respawn takes over its slot)
+    used = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(i for i in itertools.count() if i not in used)
+
+
+def post_fork(server, worker):
+    import torch
+
+    if remote_inference:
+        cpus, n = None, _env_int("INFER_TORCH_THREADS", 1)
+    else:
+        cpus = tuning.pin(worker.cpu_slot)
+        n = _env_int("INFER_TORCH_THREADS", 0) or tuned.get("torch_threads") or max(1, _cpu_count() // max(1, workers))
+    torch.set_num_threads(n)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed for this process
+
+    if preload_app and not remote_inference:
+        from inference.predictor import warm
+
+        warm()
+    server.log.info("worker %s: torch threads=%s cpus=%s", worker.pid, n, cpus if cpus is not None else "any")
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.TelemetryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -141,6 +142,7 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
+    # refresh tokens only, and only with rest_framework_simplejwt.token_blacklist installed
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
@@ -153,3 +155,168 @@ CSRF_TRUSTED_ORIGINS = [
     "http://127.0.0.1:8080",
     "http://localhost:8080",
 ]
+
+# ---- inference ----
+# Micro-batching: concurrent /api/infer requests share one forward pass.
+# Only helps when a worker serves requests concurrently (gunicorn --threads).
+# INFER_BATCH_MAX_SIZE 0: the tuned batch size (see INFER_TUNING_FILE below), else 8.
+INFER_BATCHING = os.getenv("INFER_BATCHING", "1") == "1"
+INFER_BATCH_MAX_SIZE = int(os.getenv("INFER_BATCH_MAX_SIZE", "0"))
+INFER_BATCH_MAX_WAIT_MS = float(os.getenv("INFER_BATCH_MAX_WAIT_MS", "5"))
+# a request still waiting for its batch after this long gets a 503
+INFER_BATCH_RESULT_TIMEOUT_MS = float(os.getenv("INFER_BATCH_RESULT_TIMEOUT_MS", "10000"))
+
+# Model registry: the active MLModel is re-read every INFER_MODEL_POLL_SECONDS and
+# hot-swapped after a background load; up to INFER_MODEL_CACHE_SIZE models stay loaded.
+INFER_MODEL_POLL_SECONDS = float(os.getenv("INFER_MODEL_POLL_SECONDS", "2"))
+INFER_MODEL_CACHE_SIZE = int(os.getenv("INFER_MODEL_CACHE_SIZE", "2"))
+
+# /api/infer/batch: max images per request, max uncompressed archive (.zip/.npz)
+# contents, and images per forward pass
+INFER_BATCH_REQUEST_MAX = int(os.getenv("INFER_BATCH_REQUEST_MAX", "256"))
+INFER_BATCH_ARCHIVE_MAX_BYTES = int(os.getenv("INFER_BATCH_ARCHIVE_MAX_BYTES", str(256 * 1024 * 1024)))
+INFER_BATCH_CHUNK_SIZE = int(os.getenv("INFER_BATCH_CHUNK_SIZE", "32"))
+
+# Temporal smoothing for continuous signing (per session / WebSocket connection)
+INFER_STREAM_ALPHA = float(os.getenv("INFER_STREAM_ALPHA", "0.5"))
+INFER_STREAM_STABLE_FRAMES = int(os.getenv("INFER_STREAM_STABLE_FRAMES", "4"))
+INFER_STREAM_MIN_CONFIDENCE = float(os.getenv("INFER_STREAM_MIN_CONFIDENCE", "0.5"))
+INFER_STREAM_TTL_SECONDS = float(os.getenv("INFER_STREAM_TTL_SECONDS", "120"))
+INFER_STREAM_MAX_SESSIONS = int(os.getenv("INFER_STREAM_MAX_SESSIONS", "10000"))
+# HTTP sessions are per worker process unless INFER_STREAM_SHM names a file (on tmpfs,
+# e.g. /dev/shm/bsl-streams) that every worker on the host maps and shares (4096 slots;
+# a session that finds no free slot near its key stays in its own worker)
+INFER_STREAM_SHM = os.getenv("INFER_STREAM_SHM", "")
+
+# Prediction cache for repeated webcam frames (scoped to the served model and its
+# cascade stages). Exact-bytes matching only by default; INFER_CACHE_PHASH_DISTANCE
+# >= 0 opts into "near-identical" hits within that Hamming distance between 64-bit
+# average hashes (can return a neighbouring frame's answer for a different sign).
+INFER_CACHE_ENABLED = os.getenv("INFER_CACHE_ENABLED", "1") == "1"
+INFER_CACHE_MAX_ENTRIES = int(os.getenv("INFER_CACHE_MAX_ENTRIES", "2048"))
+INFER_CACHE_TTL_SECONDS = float(os.getenv("INFER_CACHE_TTL_SECONDS", "5"))
+INFER_CACHE_PHASH_DISTANCE = int(os.getenv("INFER_CACHE_PHASH_DISTANCE", "-1"))
+
+# Inference backend: eager | torchscript | int8 | int8_static | onnx.
+# Non-eager backends serve the artifact written by `manage.py convert_model`
+# next to the .pth and fall back to eager FP32 when it is missing.
+INFER_BACKEND = os.getenv("INFER_BACKEND", "eager")
+
+# Out-of-process inference service (manage.py run_inference_pool). When set, web
+# workers send frames and /api/infer/batch uploads over this Unix socket instead of
+# running the model.
+INFER_POOL_SOCKET = os.getenv("INFER_POOL_SOCKET", "")
+INFER_POOL_TIMEOUT_MS = int(os.getenv("INFER_POOL_TIMEOUT_MS", "2000"))
+# Workers / torch threads 0: from the tuning file, else 2 workers x 1 thread.
+INFER_POOL_WORKERS = int(os.getenv("INFER_POOL_WORKERS", "0"))
+INFER_POOL_QUEUE_DEPTH = int(os.getenv("INFER_POOL_QUEUE_DEPTH", "64"))
+INFER_POOL_TORCH_THREADS = int(os.getenv("INFER_POOL_TORCH_THREADS", "0"))
+# Requests in flight per pool worker; they share forward passes through the worker's
+# micro-batcher (0: the micro-batch size, or 1 with INFER_BATCHING off).
+INFER_POOL_WORKER_THREADS = int(os.getenv("INFER_POOL_WORKER_THREADS", "0"))
+INFER_POOL_BATCH_TIMEOUT_MS = int(os.getenv("INFER_POOL_BATCH_TIMEOUT_MS", "30000"))
+
+# InferenceEvent logging: buffered in-process and bulk-inserted by a background
+# thread every INFER_EVENTS_FLUSH_SIZE events or INFER_EVENTS_FLUSH_MS. Events
+# beyond INFER_EVENTS_MAX_QUEUE are dropped (and counted) instead of blocking.
+INFER_EVENTS_ENABLED = os.getenv("INFER_EVENTS_ENABLED", "1") == "1"
+INFER_EVENTS_FLUSH_SIZE = int(os.getenv("INFER_EVENTS_FLUSH_SIZE", "200"))
+INFER_EVENTS_FLUSH_MS = float(os.getenv("INFER_EVENTS_FLUSH_MS", "1000"))
+INFER_EVENTS_MAX_QUEUE = int(os.getenv("INFER_EVENTS_MAX_QUEUE", "10000"))
+
+# Usage rollups (api/rollups.py): hourly/daily counts per model, source and
+# user bucket (user id % INFER_ROLLUP_USER_BUCKETS). `manage.py compact_usage`
+# (the compose `maintenance` service) folds per-flush metrics rows and deletes raw
+# InferenceEvents older than the retention.
+INFER_ROLLUP_USER_BUCKETS = int(os.getenv("INFER_ROLLUP_USER_BUCKETS", "16"))
+INFER_EVENTS_RETENTION_DAYS = int(os.getenv("INFER_EVENTS_RETENTION_DAYS", "30"))
+
+# Per-model latency/confidence histograms (inference/metrics.py), merged into
+# InferenceMetrics rows by the event flusher every INFER_METRICS_FLUSH_SECONDS.
+INFER_METRICS_ENABLED = os.getenv("INFER_METRICS_ENABLED", "1") == "1"
+INFER_METRICS_FLUSH_SECONDS = float(os.getenv("INFER_METRICS_FLUSH_SECONDS", "60"))
+
+# Prometheus /metrics (inference/telemetry.py). Not routed by nginx: scrape
+# backend:8000/metrics from inside the network. INFER_TELEMETRY_DIR (a dir shared
+# by the gunicorn workers, the WebSocket server and the inference pool; a shared
+# volume across containers) merges all of them into every scrape; METRICS_TOKEN,
+# if set, is required as "Authorization: Bearer <token>", else only direct requests
+# from loopback / private addresses (not relayed with X-Forwarded-For) are answered.
+INFER_TELEMETRY_DIR = os.getenv("INFER_TELEMETRY_DIR", "")
+INFER_TELEMETRY_SPOOL_SECONDS = float(os.getenv("INFER_TELEMETRY_SPOOL_SECONDS", "5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Serve a seeded, randomly initialised EfficientNet-B0 instead of the registry /
+# WEIGHTS_PATH (load tests and benchmarks without real weights; predictions are noise).
+INFER_RANDOM_WEIGHTS = os.getenv("INFER_RANDOM_WEIGHTS", "0") == "1"
+
+# /api/infer auth (api.authentication.InferenceJWTAuthentication): the access token is
+# verified per request, the User row is cached per process for this long.
+INFER_AUTH_USER_CACHE_SECONDS = float(os.getenv("INFER_AUTH_USER_CACHE_SECONDS", "30"))
+INFER_AUTH_USER_CACHE_SIZE = int(os.getenv("INFER_AUTH_USER_CACHE_SIZE", "10000"))
+
+# /api/infer rate limit (inference.ratelimit.InferenceRateThrottle): a token bucket
+# per user, refilled at INFER_RATE_LIMIT_PER_SEC frames/s up to INFER_RATE_LIMIT_BURST
+# (0 disables). Buckets are per process unless INFER_RATE_LIMIT_SHM names a file
+# (preferably on tmpfs) that all workers on the host share.
+INFER_RATE_LIMIT_PER_SEC = float(os.getenv("INFER_RATE_LIMIT_PER_SEC", "10"))
+INFER_RATE_LIMIT_BURST = float(os.getenv("INFER_RATE_LIMIT_BURST", "20"))
+INFER_RATE_LIMIT_SHM = os.getenv("INFER_RATE_LIMIT_SHM", "")
+
+# Server-side hand ROI for clients sending full frames (roi=1, inference/hands.py):
+# "skin" (numpy skin-colour blobs + motion), "mediapipe" (needs the mediapipe
+# package) or "" to disable. The box is padded like the browser demo, resized to
+# INFER_ROI_SIZE, and reused per session for up to INFER_ROI_REDETECT_FRAMES frames.
+INFER_ROI_DETECTOR = os.getenv("INFER_ROI_DETECTOR", "skin")
+INFER_ROI_PAD = float(os.getenv("INFER_ROI_PAD", "0.35"))
+INFER_ROI_SIZE = int(os.getenv("INFER_ROI_SIZE", "128"))
+INFER_ROI_DETECT_WIDTH = int(os.getenv("INFER_ROI_DETECT_WIDTH", "160"))
+INFER_ROI_REDETECT_FRAMES = int(os.getenv("INFER_ROI_REDETECT_FRAMES", "10"))
+
+# Early-exit cascade: enabled MLModels with cascade_enabled and a cheaper arch than
+# the active model (mlp < resnet18 < effnet_b0) classify first; a frame escalates to
+# the next stage unless top-1 >= the model's cascade_threshold (default below).
+INFER_CASCADE_ENABLED = os.getenv("INFER_CASCADE_ENABLED", "1") == "1"
+INFER_CASCADE_DEFAULT_THRESHOLD = float(os.getenv("INFER_CASCADE_DEFAULT_THRESHOLD", "0.9"))
+
+# Chunked model uploads (api/uploads.py): clients PUT chunks of about
+# MODEL_UPLOAD_CHUNK_BYTES (at most MODEL_UPLOAD_CHUNK_MAX_BYTES, keep nginx's
+# client_max_body_size in step) that are streamed to disk in
+# MODEL_UPLOAD_READ_BYTES blocks. Unfinished uploads expire after
+# MODEL_UPLOAD_EXPIRE_HOURS without a chunk.
+MODEL_UPLOAD_MAX_BYTES = int(os.getenv("MODEL_UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+MODEL_UPLOAD_CHUNK_BYTES = int(os.getenv("MODEL_UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+MODEL_UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("MODEL_UPLOAD_CHUNK_MAX_BYTES", str(64 * 1024 * 1024)))
+MODEL_UPLOAD_READ_BYTES = int(os.getenv("MODEL_UPLOAD_READ_BYTES", str(1024 * 1024)))
+MODEL_UPLOAD_EXPIRE_HOURS = float(os.getenv("MODEL_UPLOAD_EXPIRE_HOURS", "24"))
+
+# Performance profile of every uploaded model (api/profiling.py, `manage.py profile_model`):
+# run in a separate process per upload, sweeping the batch sizes and torch thread counts
+# below. Activation is refused (409, unless forced) when the model failed to load, or
+# its batch-1 p95 is more than INFER_PROFILE_MAX_P95_REGRESSION above the active model's
+# (0 disables the latency gate).
+INFER_PROFILE_ON_UPLOAD = os.getenv("INFER_PROFILE_ON_UPLOAD", "1") == "1"
+INFER_PROFILE_BATCH_SIZES = os.getenv("INFER_PROFILE_BATCH_SIZES", "1,4,16")
+INFER_PROFILE_THREADS = os.getenv("INFER_PROFILE_THREADS", "1,2,4")
+INFER_PROFILE_RUNS = int(os.getenv("INFER_PROFILE_RUNS", "30"))
+INFER_PROFILE_CONCURRENCY = int(os.getenv("INFER_PROFILE_CONCURRENCY", "1"))
+INFER_PROFILE_TIMEOUT_SECONDS = int(os.getenv("INFER_PROFILE_TIMEOUT_SECONDS", "600"))
+INFER_PROFILE_MAX_P95_REGRESSION = float(os.getenv("INFER_PROFILE_MAX_P95_REGRESSION", "0.25"))
+
+# Shadow evaluation (inference/shadow.py): this fraction of live frames is also run,
+# batched on a low-priority thread, through every enabled MLModel with shadow_enabled
+# to record agreement and latency (0 disables). Frames are dropped rather than queued
+# beyond INFER_SHADOW_QUEUE_MAX. It runs in whichever processes do the forward pass
+# (the inference pool workers when INFER_POOL_SOCKET is set), one candidate copy each.
+INFER_SHADOW_SAMPLE_RATE = float(os.getenv("INFER_SHADOW_SAMPLE_RATE", "0.05"))
+INFER_SHADOW_BATCH_SIZE = int(os.getenv("INFER_SHADOW_BATCH_SIZE", "16"))
+INFER_SHADOW_MAX_WAIT_MS = float(os.getenv("INFER_SHADOW_MAX_WAIT_MS", "50"))
+INFER_SHADOW_QUEUE_MAX = int(os.getenv("INFER_SHADOW_QUEUE_MAX", "32"))
+INFER_SHADOW_POLL_SECONDS = float(os.getenv("INFER_SHADOW_POLL_SECONDS", "10"))
+
+# Host tuning (`manage.py autotune`, inference/tuning.py): the measured best worker
+# count, torch threads per worker, micro-batch size and per-worker CPU sets are
+# written to INFER_TUNING_FILE (env only, gunicorn.conf.py reads it before Django;
+# default backend/tuning.json) and used wherever the env leaves them unset.
+# INFER_CPU_AFFINITY=0 turns the pinning off.
+INFER_TUNING_FILE = os.getenv("INFER_TUNING_FILE", "")
@@ -22,9 +22,12 @@ from django.urls import path
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views import metrics
+
 urlpatterns = [
     path("django-admin/", admin.site.urls),
     path("api/", include("api.urls")),
+    path("metrics", metrics),
 
 
 ]
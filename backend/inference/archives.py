@@ -0,0 +1,105 @@
+"""
+Image archives accepted by /api/infer/batch: a .zip of image files, or an .npz
+of uint8 frames shaped [N, H, W, 3] (key "frames", else the first array).
+
+Entry counts and uncompressed sizes are checked from the zip directory / .npy
+header before anything is decompressed. Used by the web view (counting, for
+the rate limit) and by whichever process decodes the batch (the web worker, or
+the inference pool with INFER_POOL_SOCKET).
+"""
+import zipfile
+
+from PIL import Image
+
+from .preprocess import open_image
+
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class TooManyImages(ValueError):
+    def __init__(self, count: int, limit: int):
+        super().__init__(f"Too many images ({count}); max {limit} per request.")
+
+
+def _npz_header(npz, key):
+    """(shape, dtype) of one .npz member from its .npy header, without reading the array."""
+    import numpy as np
+
+    with npz.zip.open(f"{key}.npy") as fp:
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(fp)
+    return shape, dtype
+
+
+def _zip_images(zf):
+    return [info for info in zf.infolist() if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTS)]
+
+
+def archive_count(f, name: str) -> int:
+    """How many images an archive holds, from its directory / array header only (0 if unreadable)."""
+    try:
+        f.seek(0)
+        if name.lower().endswith(".npz"):
+            import numpy as np
+
+            with np.load(f, allow_pickle=False) as npz:
+                key = "frames" if "frames" in npz.files else npz.files[0]
+                shape, _ = _npz_header(npz, key)
+            return int(shape[0]) if shape else 0
+        if zipfile.is_zipfile(f):
+            return len(_zip_images(zipfile.ZipFile(f)))
+    except Exception:
+        pass
+    finally:
+        f.seek(0)
+    return 0
+
+
+def images_from_archive(f, name: str, max_images: int, max_bytes: int):
+    """[(entry name, lazily opened image or None if unreadable)]; ValueError for an unusable archive."""
+    f.seek(0)
+
+    if name.lower().endswith(".npz"):
+        import numpy as np
+
+        try:
+            npz = np.load(f, allow_pickle=False)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"not a valid .npz archive: {e}")
+        with npz:
+            if not npz.files:
+                raise ValueError("npz archive is empty")
+            key = "frames" if "frames" in npz.files else npz.files[0]
+            shape, dtype = _npz_header(npz, key)
+            if dtype != np.uint8 or len(shape) != 4 or shape[-1] != 3:
+                raise ValueError("npz frames must be uint8 with shape [N, H, W, 3]")
+            if shape[0] > max_images:
+                raise TooManyImages(shape[0], max_images)
+            if int(np.prod(shape)) > max_bytes:
+                raise ValueError(f"npz frames are larger than {max_bytes} bytes")
+            frames = npz[key]
+        return [(f"{key}[{i}]", Image.fromarray(frame)) for i, frame in enumerate(frames)]
+
+    if zipfile.is_zipfile(f):
+        try:
+            zf = zipfile.ZipFile(f)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"not a valid .zip archive: {e}")
+        infos = _zip_images(zf)
+        if len(infos) > max_images:
+            raise TooManyImages(len(infos), max_images)
+        if sum(info.file_size for info in infos) > max_bytes:
+            raise ValueError(f"zip contents are larger than {max_bytes} bytes")
+        items = []
+        for info in infos:
+            try:
+                items.append((info.filename, open_image(zf.open(info))))
+            except Exception:
+                items.append((info.filename, None))
+        return items
+
+    raise ValueError("archive must be a .zip of images or an .npz of frames")
@@ -0,0 +1,127 @@
+import copy
+from pathlib import Path
+
+import torch
+
+from .preprocess import INPUT_SIZE
+
+
+# ---- backends ----
+# eager        float32 nn.Module straight from the .pth (default)
+# torchscript  traced + frozen float32 graph
+# int8         dynamic INT8 (Linear layers), traced + frozen
+# int8_static  FX static INT8 (conv + linear) calibrated on sample images, traced + frozen
+# onnx         ONNX graph run by onnxruntime (only if it is installed)
+BACKENDS = ("eager", "torchscript", "int8", "int8_static", "onnx")
+
+ARTIFACT_SUFFIX = {
+    "torchscript": ".ts",
+    "int8": ".int8.ts",
+    "int8_static": ".int8s.ts",
+    "onnx": ".onnx",
+}
+
+
+def artifact_path(weights_path, backend: str) -> Path:
+    """Where `backend`'s artifact for a given .pth lives (next to it)."""
+    weights_path = Path(weights_path)
+    if backend == "eager":
+        return weights_path
+    return weights_path.with_name(weights_path.stem + ARTIFACT_SUFFIX[backend])
+
+
+def onnxruntime_available() -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_backends():
+    return [b for b in BACKENDS if b != "onnx" or onnxruntime_available()]
+
+
+# ---- conversion (offline) ----
+def _example(batch_size: int = 1):
+    return torch.zeros(batch_size, 3, INPUT_SIZE, INPUT_SIZE)
+
+
+def _trace_freeze(model):
+    with torch.inference_mode(False), torch.no_grad():
+        traced = torch.jit.trace(model.eval(), _example(), check_trace=False)
+    return torch.jit.freeze(traced.eval())
+
+
+def convert(model, backend: str, out_path, calibration=None):
+    """
+    Produce `backend`'s artifact for an eager float32 model at `out_path`.
+    `calibration` is an iterable of [B, 3, H, W] batches (int8_static only).
+    """
+    model = copy.deepcopy(model).eval()
+    out_path = Path(out_path)
+
+    if backend == "torchscript":
+        torch.jit.save(_trace_freeze(model), str(out_path))
+
+    elif backend == "int8":
+        qmodel = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        torch.jit.save(_trace_freeze(qmodel), str(out_path))
+
+    elif backend == "int8_static":
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        prepared = prepare_fx(model, get_default_qconfig_mapping("x86"), example_inputs=(_example(),))
+        with torch.no_grad():
+            for x in (calibration or [_example()]):
+                prepared(x)
+        torch.jit.save(_trace_freeze(convert_fx(prepared)), str(out_path))
+
+    elif backend == "onnx":
+        kwargs = dict(
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+        with torch.no_grad():
+            try:
+                torch.onnx.export(model, (_example(),), str(out_path), dynamo=False, **kwargs)
+            except TypeError:  # torch without the dynamo switch
+                torch.onnx.export(model, (_example(),), str(out_path), **kwargs)
+
+    else:
+        raise ValueError(f"Unknown backend '{backend}' (choose from {', '.join(BACKENDS)})")
+
+    return out_path
+
+
+# ---- loading (serving) ----
+class OnnxModel:
+    """Callable like an nn.Module: float32 [B, 3, H, W] tensor -> logits tensor."""
+
+    def __init__(self, path, num_threads: int = None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = num_threads or torch.get_num_threads()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        (logits,) = self.session.run(None, {self.input_name: x.contiguous().numpy()})
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def load_artifact(backend: str, path):
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Missing {backend} artifact: {path}")
+    if backend == "onnx":
+        return OnnxModel(path)
+    return torch.jit.load(str(path), map_location="cpu").eval()
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import torch
+
+from .telemetry import BATCH_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherTimeout(Exception):
+    """A queued request got no result in time (the batcher is backed up or stuck)."""
+
+
+def round_robin(queues: OrderedDict, n: int) -> list:
+    """
+    Take up to `n` items from `queues` (key -> deque, in serving order), one
+    per key per round; a served key moves to the back, an emptied one is dropped.
+    """
+    batch = []
+    while len(batch) < n and queues:
+        key, q = queues.popitem(last=False)
+        batch.append(q.popleft())
+        if q:
+            queues[key] = q
+    return batch
+
+
+class MicroBatcher:
+    """
+    Collect concurrent single-image requests into one forward pass.
+
+    A batch is closed when it reaches `max_batch_size` or when the oldest
+    request in it has waited `max_wait_ms`, whichever comes first.
+    `forward` takes a stacked [B, 3, H, W] tensor and returns (probs [B, C], tag);
+    `tag` (e.g. which model ran) is handed back to every caller in the batch,
+    or, when it is a list, tag[i] to the i-th caller.
+
+    Requests are queued per `owner` (e.g. user id) and batches are filled
+    round-robin across owners, so under overload every active owner gets an
+    equal share of forward-pass slots instead of first-come-first-served.
+    """
+
+    def __init__(self, forward, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.forward = forward
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queues = OrderedDict()  # owner -> deque of (x, future, enqueued); order = next to serve
+        self._size = 0
+        self._cond = threading.Condition()
+        self._buf = None  # preallocated [max_batch_size, ...] input tensor
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # threads do not survive fork(): start one lazily per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queues, self._size, self._cond = OrderedDict(), 0, threading.Condition()
+                self._buf = None  # a pinned buffer does not survive fork either
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="infer-batcher", daemon=True)
+            self._thread.start()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def submit(self, x: torch.Tensor, owner=None) -> Future:
+        """
+        Queue one preprocessed image [3, H, W] on behalf of `owner`. The future resolves to a dict:
+        {"probs": Tensor[C], "tag": ..., "queue_ms": float, "compute_ms": float, "batch_size": int}
+        """
+        self._ensure_worker()
+        fut = Future()
+        with self._cond:
+            q = self._queues.get(owner)
+            if q is None:
+                q = self._queues[owner] = deque()
+            q.append((x, fut, time.perf_counter()))
+            self._size += 1
+            self._cond.notify()
+        return fut
+
+    def _take(self, n: int):
+        batch = round_robin(self._queues, n)
+        self._size -= len(batch)
+        return batch
+
+    def _collect(self):
+        with self._cond:
+            while not self._size:
+                self._cond.wait()
+            deadline = min(q[0][2] for q in self._queues.values()) + self.max_wait
+
+            while self._size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._take(self.max_batch_size)
+
+    def _stack(self, xs):
+        # The buffer is reused by the next batch as soon as forward() returns, so forward() must
+        # not hand back views of its input: callers keep probs[i] after the next batch is stacked.
+        shape = (self.max_batch_size,) + tuple(xs[0].shape)
+        if self._buf is None or tuple(self._buf.shape) != shape:
+            self._buf = torch.empty(shape, dtype=xs[0].dtype)
+            if torch.cuda.is_available():
+                self._buf = self._buf.pin_memory()
+        return torch.stack(xs, out=self._buf[:len(xs)])
+
+    def _run(self):
+        while True:
+            batch = []
+            # nothing may escape: a dead thread would leave every later submit() waiting
+            try:
+                batch = self._collect()
+                t_start = time.perf_counter()
+                BATCH_SIZE.observe(len(batch))
+                probs, tag = self.forward(self._stack([x for (x, _, _) in batch]))
+
+                compute_ms = (time.perf_counter() - t_start) * 1000
+                for i, (_, fut, enqueued) in enumerate(batch):
+                    fut.set_result({
+                        "probs": probs[i],
+                        "tag": tag[i] if isinstance(tag, list) else tag,
+                        "queue_ms": (t_start - enqueued) * 1000,
+                        "compute_ms": compute_ms,
+                        "batch_size": len(batch),
+                    })
+            except Exception as e:
+                if not batch:
+                    logger.exception("micro-batcher failed outside a forward pass")
+                for (_, fut, _) in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def content_digest(f) -> bytes:
+    """blake2b of an upload/file-like, read in chunks (no full copy); rewinds `f`."""
+    h = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    if hasattr(f, "chunks"):
+        for chunk in f.chunks():
+            h.update(chunk)
+    else:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    f.seek(0)
+    return h.digest()
+
+
+def average_hash(f, size: int = 8):
+    """
+    (64-bit average hash, mean luminance): grayscale, downscale to
+    size x size, 1 bit per pixel above the mean. The mean is kept because the
+    bits alone are brightness-invariant. JPEGs are draft-decoded at 1/8
+    scale, so this costs a fraction of a full decode. Rewinds `f`.
+    """
+    f.seek(0)
+    img = Image.open(f)
+    img.draft("L", (size * 2, size * 2))
+    small = img.convert("L").resize((size, size), Image.BOX)
+    f.seek(0)
+
+    pixels = list(small.getdata())
+    mean = sum(pixels) / len(pixels)
+    bits = 0
+    for p in pixels:
+        bits = (bits << 1) | (p > mean)
+    return bits, mean
+
+
+class PredictionCache:
+    """
+    Bounded LRU of predictions with TTL, scoped to a model version.
+
+    Lookups are by exact content digest first, then (opt-in, `max_distance`
+    >= 0) by average hash within `max_distance` Hamming bits and `max_mean_delta` mean
+    luminance among the `scan_limit` most recent entries of the same scope.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 5.0, max_distance: int = -1,
+                 max_mean_delta: float = 8.0, scan_limit: int = 256):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.max_distance = int(max_distance)
+        self.max_mean_delta = float(max_mean_delta)
+        self.scan_limit = int(scan_limit)
+
+        self._entries = OrderedDict()  # (scope, digest) -> (expires_at, ahash, value)
+        self._lock = threading.Lock()
+
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def perceptual(self) -> bool:
+        return self.max_distance >= 0
+
+    def get(self, scope, digest):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get((scope, digest))
+            if item is not None:
+                if item[0] > now:
+                    self._entries.move_to_end((scope, digest))
+                    self.hits_exact += 1
+                    return item[2]
+                del self._entries[(scope, digest)]
+            return None
+
+    def get_similar(self, scope, ahash):
+        bits, mean = ahash
+        now = time.monotonic()
+        with self._lock:
+            for n, (key, (expires_at, other, value)) in enumerate(reversed(self._entries.items())):
+                if n >= self.scan_limit:
+                    break
+                if key[0] != scope or expires_at <= now or other is None:
+                    continue
+                if abs(mean - other[1]) <= self.max_mean_delta and (bits ^ other[0]).bit_count() <= self.max_distance:
+                    self.hits_similar += 1
+                    return value
+            return None
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, scope, digest, ahash, value):
+        with self._lock:
+            self._entries[(scope, digest)] = (time.monotonic() + self.ttl, ahash, value)
+            self._entries.move_to_end((scope, digest))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits_exact + self.hits_similar
+            total = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits_exact": self.hits_exact,
+                "hits_similar": self.hits_similar,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / total, 4) if total else None,
+            }
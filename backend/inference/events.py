@@ -0,0 +1,214 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    """
+    Bounded in-process queue of InferenceEvent rows, written by a background
+    thread with one bulk_create per `flush_size` events or `flush_ms`,
+    whichever comes first, together with their usage rollup deltas. The
+    request path never touches the database.
+
+    When the queue is full the new event is dropped and counted in `dropped`
+    (logging must never add latency or memory pressure to inference). A
+    failed write drops that batch and counts it in `failed`.
+
+    Other periodic writers (e.g. inference/metrics.py) can piggyback on the
+    same thread with `add_hook`; hooks run after every flush and at least
+    once per `flush_ms` while idle.
+    """
+
+    def __init__(self, flush_size: int = 200, flush_ms: float = 1000.0, max_queue: int = 10000):
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(1.0, float(flush_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._exit_hooked = False
+        self._hooks = []
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def _ensure_worker(self):
+        # after a fork the thread is gone and the queue may hold the parent's events
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="inference-events", daemon=True)
+            self._thread.start()
+            if not self._exit_hooked:
+                atexit.register(self.flush)
+                self._exit_hooked = True
+
+    def add_hook(self, fn):
+        """Run `fn(force)` on the flusher thread after each flush; force=True from flush()/exit."""
+        if fn not in self._hooks:
+            self._hooks.append(fn)
+        self._ensure_worker()
+
+    def _run_hooks(self, force: bool = False):
+        for fn in list(self._hooks):
+            try:
+                fn(force)
+            except Exception:
+                logger.exception("event buffer hook %r failed", fn)
+
+    def record(self, **fields) -> bool:
+        """Queue one event (InferenceEvent field values). Never blocks; False if dropped."""
+        self._ensure_worker()
+        fields.setdefault("created_at", timezone.now())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.flush_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # wait for the first event, then fill the batch until size or deadline
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self._run_hooks()
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            self._run_hooks()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        from django.contrib.auth import get_user_model
+
+        from api.models import InferenceEvent, MLModel
+        from api.rollups import add_events
+
+        with self._flush_lock:
+            close_old_connections()
+            try:
+                # a model or user deleted while its events were queued would fail the FK
+                # check at commit and take the whole batch down with it
+                models = existing_ids(MLModel, {row.get("model_id") for row in batch})
+                users = existing_ids(get_user_model(), {row.get("user_id") for row in batch})
+                batch = [
+                    {**row, "model_id": row.get("model_id") if row.get("model_id") in models else None,
+                     "user_id": row.get("user_id") if row.get("user_id") in users else None}
+                    for row in batch
+                ]
+                with transaction.atomic():
+                    InferenceEvent.objects.bulk_create([InferenceEvent(**row) for row in batch], batch_size=self.flush_size)
+                    add_events(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("dropping %d inference events: write failed", len(batch))
+            else:
+                self.written += len(batch)
+                self.flushes += 1
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything queued now (shutdown, tests)."""
+        if self._pid != os.getpid():
+            return
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._write(batch)
+        self._run_hooks(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self.max_queue,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+
+def existing_ids(model, ids) -> set:
+    """The subset of `ids` (None ignored) that still has a `model` row."""
+    ids = {i for i in ids if i is not None}
+    return set(model.objects.filter(pk__in=ids).values_list("pk", flat=True)) if ids else set()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer() -> EventBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = EventBuffer(
+                    flush_size=getattr(settings, "INFER_EVENTS_FLUSH_SIZE", 200),
+                    flush_ms=getattr(settings, "INFER_EVENTS_FLUSH_MS", 1000),
+                    max_queue=getattr(settings, "INFER_EVENTS_MAX_QUEUE", 10000),
+                )
+    return _buffer
+
+
+def record_inference(user, out: dict, source: str = "web") -> bool:
+    """Log one /api/infer (or WebSocket) prediction without waiting on the database."""
+    if not getattr(settings, "INFER_EVENTS_ENABLED", True):
+        return False
+    latency = out.get("latency_ms")
+    cached = bool(out.get("cached", False))
+    return get_event_buffer().record(
+        user_id=getattr(user, "pk", None),
+        model_id=out.get("model_id"),
+        source=source,
+        latency_ms=None if latency is None else int(round(latency)),
+        label=str(out.get("label") or "")[:16],
+        confidence=out.get("confidence"),
+        cached=cached,
+        cascade_stage=None if cached else out.get("cascade_stage"),
+    )
@@ -0,0 +1,226 @@
+"""
+Server-side hand ROI extraction for clients that send full frames
+(POST /api/infer with roi=1, or the WebSocket with ?roi=1).
+
+The browser demo crops the hand itself (MediaPipe landmarks, bbox padded by
+35%, resized to 128x128); this does the same on the server, as a cascade
+from cheapest to most expensive:
+
+  1. tracked: a session's previous box is re-centred on the skin pixels
+     around it (one mean-shift step on a ~160px wide copy of the frame) and
+     reused while it still looks like a hand
+  2. detected: otherwise, and every INFER_ROI_REDETECT_FRAMES frames, the
+     detector runs on the whole frame: "skin" (default, numpy only: skin
+     colour blobs scored by size, motion against the previous frame and
+     overlap with the previous box) or "mediapipe" (landmarks, as in the
+     browser; needs the optional mediapipe package)
+  3. none: no hand, the caller skips classification
+
+Boxes are normalised (x1, y1, x2, y2) in [0, 1], unpadded.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .preprocess import decode
+
+
+# ---- per-session tracking state ----
+class Track:
+    """Last hand box of one stream session (kept on StreamState.hand_track)."""
+
+    __slots__ = ("box", "age", "prev")
+
+    def __init__(self):
+        self.box = None  # normalised, unpadded
+        self.age = 0  # frames since the detector last ran
+        self.prev = None  # previous small grayscale frame, for motion
+
+
+def _small(img: Image.Image, width: int) -> np.ndarray:
+    """About `width` px wide copy (integer box-filter reduction: far cheaper than a resize)."""
+    factor = max(1, img.size[0] // width)
+    return np.asarray(img.reduce(factor) if factor > 1 else img, dtype=np.int16)
+
+
+def skin_mask(rgb: np.ndarray) -> np.ndarray:
+    """Boolean skin mask of an [H, W, 3] array (fixed Cr/Cb ranges, ITU-R BT.601)."""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cr = 128 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    cb = 128 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    return (cr >= 133) & (cr <= 173) & (cb >= 77) & (cb <= 127)
+
+
+def _overlap(a, b) -> float:
+    if a is None or b is None:
+        return 0.0
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    return (w * h) / max(1e-9, (a[2] - a[0]) * (a[3] - a[1]))
+
+
+# ---- detectors ----
+class SkinDetector:
+    """
+    Skin-colour blobs on a coarse grid (cells of `cell` px); each 4-connected
+    blob is scored by size, plus a bonus for moving cells and for overlap with
+    the previous box, so a still face loses to a signing hand.
+    """
+
+    def __init__(self, cell: int = 8, min_fill: float = 0.4, min_cells: int = 3, verify_fill: float = 0.15):
+        self.cell = cell
+        self.min_fill = min_fill
+        self.min_cells = min_cells
+        self.verify_fill = verify_fill
+
+    def _grid(self, arr: np.ndarray) -> np.ndarray:
+        c = self.cell
+        gh, gw = arr.shape[0] // c, arr.shape[1] // c
+        return arr[:gh * c, :gw * c].reshape(gh, c, gw, c).mean(axis=(1, 3))
+
+    def detect(self, small: np.ndarray, track: Track = None):
+        skin = self._grid(skin_mask(small).astype(np.float32)) >= self.min_fill
+        gh, gw = skin.shape
+        if not skin.any():
+            return None
+
+        moving = None
+        gray = small.mean(axis=2)
+        if track is not None and track.prev is not None and track.prev.shape == gray.shape:
+            moving = self._grid((np.abs(gray - track.prev) > 25).astype(np.float32)) >= 0.2
+
+        seen = np.zeros_like(skin)
+        best, best_score = None, 0.0
+        for y0, x0 in zip(*np.nonzero(skin)):
+            if seen[y0, x0]:
+                continue
+            seen[y0, x0] = True
+            cells, queue = [], deque([(y0, x0)])
+            while queue:
+                y, x = queue.popleft()
+                cells.append((y, x))
+                for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                    if 0 <= ny < gh and 0 <= nx < gw and skin[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        queue.append((ny, nx))
+            if len(cells) < self.min_cells:
+                continue
+
+            ys, xs = zip(*cells)
+            box = (int(min(xs)) / gw, int(min(ys)) / gh, (int(max(xs)) + 1) / gw, (int(max(ys)) + 1) / gh)
+            score = float(len(cells))
+            if moving is not None:
+                score += 4.0 * sum(1 for (y, x) in cells if moving[y, x])
+            score *= 1.0 + 2.0 * _overlap(track.box if track is not None else None, box)
+            if score > best_score:
+                best, best_score = box, score
+        return best
+
+    def follow(self, small: np.ndarray, box, pad: float):
+        """Re-centre `box` on the skin pixels within its padded surroundings, or None if they are gone."""
+        h, w = small.shape[:2]
+        bw, bh = box[2] - box[0], box[3] - box[1]
+        x1, y1 = max(0, int((box[0] - bw * pad) * w)), max(0, int((box[1] - bh * pad) * h))
+        x2, y2 = min(w, int((box[2] + bw * pad) * w) + 1), min(h, int((box[3] + bh * pad) * h) + 1)
+        mask = skin_mask(small[y1:y2, x1:x2])
+        if mask.size == 0 or mask.mean() < self.verify_fill:
+            return None
+
+        ys, xs = np.nonzero(mask)
+        cx, cy = (x1 + float(xs.mean())) / w, (y1 + float(ys.mean())) / h
+        return (
+            min(max(cx - bw / 2, 0.0), 1.0 - bw), min(max(cy - bh / 2, 0.0), 1.0 - bh),
+            min(max(cx + bw / 2, bw), 1.0), min(max(cy + bh / 2, bh), 1.0),
+        )
+
+
+class MediaPipeDetector:
+    """MediaPipe Hands landmarks -> bbox (what the browser demo does)."""
+
+    def __init__(self):
+        import mediapipe as mp
+
+        self._hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=1, model_complexity=0)
+        self._lock = threading.Lock()  # one graph per process, not thread-safe
+        self._skin = SkinDetector()
+
+    def detect(self, small: np.ndarray, track: Track = None):
+        with self._lock:
+            res = self._hands.process(small.astype(np.uint8))
+        if not res.multi_hand_landmarks:
+            return None
+        lms = res.multi_hand_landmarks[0].landmark
+        xs, ys = [lm.x for lm in lms], [lm.y for lm in lms]
+        return (max(0.0, min(xs)), max(0.0, min(ys)), min(1.0, max(xs)), min(1.0, max(ys)))
+
+    def follow(self, small: np.ndarray, box, pad: float):
+        return self._skin.follow(small, box, pad)
+
+
+DETECTORS = {"skin": SkinDetector, "mediapipe": MediaPipeDetector}
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """Process-wide detector from INFER_ROI_DETECTOR, or None when server-side ROI is off."""
+    global _detector
+    name = getattr(settings, "INFER_ROI_DETECTOR", "skin")
+    if not name:
+        return None
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = DETECTORS[name]()
+    return _detector
+
+
+# ---- extraction ----
+def crop(img: Image.Image, box, pad: float, size: int) -> Image.Image:
+    """Pad `box` by `pad` of its size on every side, clamp to the frame, resize to (size, size)."""
+    w, h = img.size
+    bw, bh = (box[2] - box[0]) * w, (box[3] - box[1]) * h
+    x1, y1 = max(0, int(box[0] * w - bw * pad)), max(0, int(box[1] * h - bh * pad))
+    x2, y2 = min(w, int(box[2] * w + bw * pad + 0.999)), min(h, int(box[3] * h + bh * pad + 0.999))
+    return img.resize((size, size), Image.BILINEAR, box=(x1, y1, max(x2, x1 + 1), max(y2, y1 + 1)))
+
+
+def extract(img: Image.Image, track: Track = None):
+    """
+    Full frame -> (ROI image or None, how): how is "tracked", "detected" or "none".
+    `track` (per session) is updated in place; without it the detector runs every frame.
+    """
+    detector = get_detector()
+    pad = getattr(settings, "INFER_ROI_PAD", 0.35)
+    size = getattr(settings, "INFER_ROI_SIZE", 128)
+    width = getattr(settings, "INFER_ROI_DETECT_WIDTH", 160)
+    redetect = getattr(settings, "INFER_ROI_REDETECT_FRAMES", 10)
+
+    if img.format == "JPEG":
+        img.draft("RGB", (4 * size, 4 * size))  # decode big frames at a reduced DCT scale
+    decode(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    small = _small(img, width)
+
+    box, how = None, "none"
+    if track is not None and track.box is not None and track.age < redetect:
+        box = detector.follow(small, track.box, pad)
+        how = "tracked" if box is not None else how
+    if box is None:
+        box = detector.detect(small, track)
+        how = "detected" if box is not None else "none"
+
+    if track is not None:
+        track.box = box
+        track.age = track.age + 1 if how == "tracked" else 0
+        track.prev = small.mean(axis=2)
+    if box is None:
+        return None, how
+    return crop(img, box, pad, size), how
@@ -0,0 +1,216 @@
+"""
+Per-model serving metrics with constant memory.
+
+Stage timings go into fixed log-scale histograms (4 buckets per doubling,
+~19% wide, 10 us .. ~45 min), confidences into 20 linear buckets, plus
+per-class prediction counts. Each process accumulates in memory and the
+event flusher thread (inference/events.py) merges the delta into one
+InferenceMetrics row per model and hour every INFER_METRICS_FLUSH_SECONDS.
+Percentiles are read back as bucket upper bounds.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+
+STAGES = ("decode", "preprocess", "queue", "forward", "postprocess", "total")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Counts over fixed bucket upper bounds (`bounds[i]` closes bucket i; the last is open)."""
+
+    __slots__ = ("bounds", "counts", "n", "total")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.n += 1
+        self.total += value
+
+    def quantile(self, q: float):
+        if not self.n:
+            return None
+        rank = max(1, math.ceil(q * self.n))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def to_json(self) -> dict:
+        return {"n": self.n, "sum": self.total, "b": {str(i): c for i, c in enumerate(self.counts) if c}}
+
+    def merge_json(self, data: dict):
+        self.n += data.get("n", 0)
+        self.total += data.get("sum", 0.0)
+        for i, c in data.get("b", {}).items():
+            i = int(i)
+            if 0 <= i < len(self.counts):
+                self.counts[i] += c
+
+
+# 10 us .. ~2.7e6 ms, 4 buckets per doubling
+LATENCY_BOUNDS = [round(0.01 * 2 ** (i / 4), 4) for i in range(113)]
+CONFIDENCE_BOUNDS = [round((i + 1) / 20, 2) for i in range(20)]
+
+
+class ModelStats:
+    def __init__(self):
+        self.stages = {s: Histogram(LATENCY_BOUNDS) for s in STAGES}
+        self.confidence = Histogram(CONFIDENCE_BOUNDS)
+        self.classes = {}
+        self.count = 0
+        self.cached = 0
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "cached": self.cached,
+            "stages": {s: h.to_json() for s, h in self.stages.items() if h.n},
+            "confidence": self.confidence.to_json(),
+            "classes": dict(self.classes),
+        }
+
+    def merge_json(self, data: dict):
+        self.count += data.get("count", 0)
+        self.cached += data.get("cached", 0)
+        for s, h in data.get("stages", {}).items():
+            if s in self.stages:
+                self.stages[s].merge_json(h)
+        self.confidence.merge_json(data.get("confidence", {}))
+        for label, n in data.get("classes", {}).items():
+            self.classes[label] = self.classes.get(label, 0) + n
+
+    def summary(self) -> dict:
+        def pcts(h):
+            out = {f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}
+            out["mean"] = round(h.total / h.n, 3) if h.n else None
+            out["count"] = h.n
+            return out
+
+        return {
+            "count": self.count,
+            "cached": self.cached,
+            "latency_ms": {s: pcts(h) for s, h in self.stages.items() if h.n},
+            "confidence": {
+                **pcts(self.confidence),
+                "histogram": [
+                    {"le": b, "count": c} for b, c in zip(CONFIDENCE_BOUNDS, self.confidence.counts)
+                ],
+            },
+            "classes": dict(sorted(self.classes.items(), key=lambda kv: -kv[1])),
+        }
+
+
+class MetricsCollector:
+    """In-process ModelStats per model id; `flush` hands the delta to the database."""
+
+    def __init__(self, flush_seconds: float = 60.0):
+        self.flush_seconds = float(flush_seconds)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def observe(self, model_id, timings: dict, label: str = None, confidence: float = None, cached: bool = False,
+                served: bool = True):
+        """
+        `timings` maps STAGES names to milliseconds (missing stages are skipped).
+        served=False records the timings of a model that ran on the frame without
+        answering it (an earlier cascade stage), so it doesn't count a prediction.
+        """
+        with self._lock:
+            st = self._stats.get(model_id)
+            if st is None:
+                st = self._stats[model_id] = ModelStats()
+            st.count += int(served)
+            st.cached += int(cached)
+            for stage, ms in timings.items():
+                if ms is not None and stage in st.stages:
+                    st.stages[stage].add(ms)
+            if confidence is not None:
+                st.confidence.add(confidence)
+            if label is not None:
+                st.classes[label] = st.classes.get(label, 0) + 1
+
+    def drain(self) -> dict:
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            self._last_flush = time.monotonic()
+        return stats
+
+    def flush(self, force: bool = False):
+        if not force and time.monotonic() - self._last_flush < self.flush_seconds:
+            return
+        stats = self.drain()
+        if stats:
+            write(stats)
+
+
+def write(stats: dict):
+    """Append one InferenceMetrics row per model for the current hour (deleted models are dropped)."""
+    from api.models import InferenceMetrics, MLModel
+
+    from .events import existing_ids
+
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    close_old_connections()
+    try:
+        live = existing_ids(MLModel, stats)
+        InferenceMetrics.objects.bulk_create([
+            InferenceMetrics(model_id=model_id, bucket_start=hour, data=st.to_json())
+            for model_id, st in stats.items() if model_id is None or model_id in live
+        ])
+    finally:
+        close_old_connections()
+
+
+def read(model_id, since) -> ModelStats:
+    """Merge all InferenceMetrics rows of `model_id` since `since` into one ModelStats."""
+    from api.models import InferenceMetrics
+
+    merged = ModelStats()
+    for data in InferenceMetrics.objects.filter(model_id=model_id, bucket_start__gte=since).values_list("data", flat=True):
+        merged.merge_json(data)
+    return merged
+
+
+_collector = None
+_collector_pid = None
+_collector_lock = threading.Lock()
+
+
+def get_collector() -> MetricsCollector:
+    """Process-wide collector; (re)created per process so a fork never flushes the parent's counts."""
+    global _collector, _collector_pid
+    if _collector is None or _collector_pid != os.getpid():
+        with _collector_lock:
+            if _collector is None or _collector_pid != os.getpid():
+                from .events import get_event_buffer
+
+                _collector = MetricsCollector(flush_seconds=getattr(settings, "INFER_METRICS_FLUSH_SECONDS", 60))
+                _collector_pid = os.getpid()
+                get_event_buffer().add_hook(_flush_hook)
+    return _collector
+
+
+def _flush_hook(force: bool = False):
+    if _collector is not None and _collector_pid == os.getpid():
+        _collector.flush(force)
+
+
+def observe(model_id, timings: dict, label=None, confidence=None, cached: bool = False, served: bool = True):
+    if getattr(settings, "INFER_METRICS_ENABLED", True):
+        get_collector().observe(model_id, timings, label=label, confidence=confidence, cached=cached, served=served)
@@ -0,0 +1,315 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+from torchvision.models import efficientnet_b0, resnet18
+
+from .preprocess import INPUT_SIZE
+from .telemetry import MODEL_LOAD_SECONDS, MODEL_LOADS, MODEL_SWAPS
+
+
+logger = logging.getLogger(__name__)
+
+
+# ---- architectures (MLModel.arch -> nn.Module) ----
+def _build_effnet_b0(num_classes: int):
+    model = efficientnet_b0(weights=None)
+    model.classifier[1] = torch.nn.Linear(model.classifier[1].in_features, num_classes)
+    return model
+
+
+def _build_resnet18(num_classes: int):
+    model = resnet18(weights=None)
+    model.fc = torch.nn.Linear(model.fc.in_features, num_classes)
+    return model
+
+
+ARCH_BUILDERS = {
+    "effnet_b0": _build_effnet_b0,
+    "resnet18": _build_resnet18,
+    # "mlp" has no fixed layout: its checkpoint must be a whole pickled nn.Module
+}
+
+# relative CPU cost per frame: cascade stages run cheapest first
+ARCH_COST = {"mlp": 0, "resnet18": 1, "effnet_b0": 2}
+
+
+def load_model(arch: str, path, num_classes: int):
+    """
+    Build `arch` and load weights from `path`.
+    Accepts a state_dict, {"state_dict": ...}, or a whole pickled nn.Module.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Missing model weights: {path}")
+
+    builder = ARCH_BUILDERS.get(arch)
+    ckpt = torch.load(str(path), map_location="cpu", weights_only=builder is not None)
+
+    if isinstance(ckpt, torch.nn.Module):
+        model = ckpt
+    else:
+        if builder is None:
+            raise ValueError(f"Checkpoint for arch '{arch}' must be a whole nn.Module, not a state_dict")
+        model = builder(num_classes)
+        state = ckpt["state_dict"] if isinstance(ckpt, dict) and "state_dict" in ckpt else ckpt
+        model.load_state_dict(state, strict=True)
+
+    return model.to("cpu").eval()
+
+
+def share_weights(model):
+    """
+    Move parameters/buffers into shared memory so forked workers map the same
+    pages instead of each faulting in a private copy (no-op for ONNX).
+    """
+    if isinstance(model, (torch.nn.Module, torch.jit.ScriptModule)):
+        for t in model.state_dict().values():
+            t.share_memory_()
+    return model
+
+
+def warm_up(model, batch_size: int = 1):
+    with torch.inference_mode():
+        model(torch.zeros(batch_size, 3, INPUT_SIZE, INPUT_SIZE))
+
+
+# ---- checksum (cached by path + mtime + size so polling stays cheap) ----
+_checksums = {}
+
+
+def file_checksum(path) -> str:
+    st = os.stat(path)
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    digest = _checksums.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _checksums[key] = digest
+    return digest
+
+
+class ModelSpec:
+    """
+    What should be served: an MLModel row (or the fallback file) + its checksum,
+    and, for a non-eager `backend`, the checksum of the converted artifact next
+    to it (None until convert_model has written one), so re-converting swaps too.
+    """
+
+    def __init__(self, model_id, arch: str, path, version: str = "", backend: str = "eager"):
+        from .backends import artifact_path
+
+        self.model_id = model_id
+        self.arch = arch
+        self.path = Path(path)
+        self.version = version
+        self.checksum = file_checksum(self.path)
+        self.artifact_checksum = None
+        if backend != "eager":
+            try:
+                self.artifact_checksum = file_checksum(artifact_path(self.path, backend))
+            except OSError:
+                pass
+
+    @property
+    def key(self):
+        return (self.model_id, self.checksum, self.artifact_checksum)
+
+
+class LoadedModel:
+    def __init__(self, spec: ModelSpec, model, load_ms: float, backend: str = "eager"):
+        self.spec = spec
+        self.model = model
+        self.load_ms = load_ms
+        self.backend = backend
+
+    @property
+    def key(self):
+        return self.spec.key
+
+    @property
+    def model_id(self):
+        return self.spec.model_id
+
+
+class ModelManager:
+    """
+    Serve the active MLModel, hot-swapping when the registry changes.
+
+    - `current()` never blocks on a load once something is being served.
+    - A watcher thread polls the registry every `poll_seconds`; a new active
+      model is loaded and warmed in the background, then swapped in with a
+      single reference assignment.
+    - Loaded models are kept in a bounded LRU keyed by (model id, checksums),
+      so switching back to a recent model is instant.
+    - With a non-eager `backend`, the converted artifact next to the .pth is
+      served when it exists (see convert_model); otherwise eager FP32.
+    - With `resolve_stages` (-> [(ModelSpec, threshold)]), the cascade stages
+      that run before the active model are kept loaded too, see `stages()`.
+    """
+
+    def __init__(self, resolve_spec, num_classes: int, capacity: int = 2, poll_seconds: float = 2.0,
+                 backend: str = "eager", resolve_stages=None):
+        self.resolve_spec = resolve_spec
+        self.resolve_stages = resolve_stages
+        self.num_classes = num_classes
+        self.backend = backend
+        self.capacity = max(1, int(capacity))
+        self.poll_seconds = float(poll_seconds)
+
+        self._cache = OrderedDict()  # key -> LoadedModel
+        self._current = None
+        self._stages = ()  # ((LoadedModel, threshold), ...)
+        self._stages_key = ()
+        self._failed = set()
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # ---- request path ----
+    def current(self) -> LoadedModel:
+        self._ensure_watcher()
+        cur = self._current
+        if cur is not None:
+            return cur
+
+        # cold start: nothing to serve yet, so load synchronously once
+        with self._lock:
+            if self._current is None:
+                self._activate(self._load(self.resolve_spec()))
+        return self._current
+
+    def stages(self):
+        """Cascade stages to try before current(), cheapest first: ((LoadedModel, threshold), ...)."""
+        self._ensure_watcher()
+        return self._stages
+
+    def preload(self) -> LoadedModel:
+        """Load the active model (and cascade stages) now without starting the watcher (gunicorn master, pre-fork)."""
+        with self._lock:
+            if self._current is None:
+                self._activate(self._load(self.resolve_spec()))
+        self.refresh_stages()
+        return self._current
+
+    def get(self, key):
+        """Return a loaded model by key without touching what is served, or None."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def request_refresh(self):
+        """Ask the watcher to re-read the registry now (e.g. after set-active)."""
+        self._wake.set()
+
+    # ---- internals ----
+    def _ensure_watcher(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("model registry refresh failed")
+
+    def refresh(self):
+        self.refresh_stages()
+        spec = self.resolve_spec()
+        cur = self._current
+        if cur is not None and cur.key == spec.key:
+            return
+        if spec.key in self._failed:
+            return
+
+        with self._lock:
+            cached = self._cache.get(spec.key)
+        if cached is not None:
+            self._activate(cached)
+            return
+
+        try:
+            entry = self._load(spec)
+        except Exception:
+            self._failed.add(spec.key)
+            logger.exception("failed to load model %s (%s)", spec.model_id, spec.path)
+            return
+        self._activate(entry)
+
+    def refresh_stages(self):
+        if self.resolve_stages is None:
+            return
+        specs = [(spec, t) for (spec, t) in self.resolve_stages() if spec.key not in self._failed]
+        key = tuple((spec.key, t) for (spec, t) in specs)
+        if key == self._stages_key:
+            return
+
+        loaded = {entry.key: entry for (entry, _) in self._stages}
+        stages = []
+        for spec, threshold in specs:
+            entry = loaded.get(spec.key) or self.get(spec.key)
+            if entry is None:
+                try:
+                    entry = self._load(spec)
+                except Exception:
+                    self._failed.add(spec.key)
+                    logger.exception("failed to load cascade stage %s (%s)", spec.model_id, spec.path)
+                    continue
+            stages.append((entry, threshold))
+        self._stages, self._stages_key = tuple(stages), key
+
+    def _load(self, spec: ModelSpec) -> LoadedModel:
+        from .backends import artifact_path, load_artifact
+
+        t0 = time.perf_counter()
+        model, backend = None, "eager"
+        try:
+            if self.backend != "eager":
+                path = artifact_path(spec.path, self.backend)
+                if path.exists():
+                    model, backend = load_artifact(self.backend, path), self.backend
+                else:
+                    logger.warning("no %s artifact for model %s (%s); serving eager", self.backend, spec.model_id, path)
+            if model is None:
+                model = load_model(spec.arch, spec.path, self.num_classes)
+            warm_up(model)
+        except Exception:
+            MODEL_LOADS.inc(self.backend, "failed")
+            raise
+
+        entry = LoadedModel(spec, model, (time.perf_counter() - t0) * 1000, backend=backend)
+        MODEL_LOADS.inc(backend, "ok")
+        MODEL_LOAD_SECONDS.observe(entry.load_ms / 1000)
+        logger.info("loaded model %s [%s/%s] in %.0f ms", spec.model_id, spec.arch, backend, entry.load_ms)
+        return entry
+
+    def _activate(self, entry: LoadedModel):
+        with self._lock:
+            self._cache[entry.key] = entry
+            self._cache.move_to_end(entry.key)
+            # in-flight requests keep their own reference to an evicted model
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+            if self._current is not None and self._current.key != entry.key:
+                MODEL_SWAPS.inc()
+            self._current = entry
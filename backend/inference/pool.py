@@ -0,0 +1,499 @@
+"""
+Local inference service: a pool of model-holding worker processes behind a
+Unix socket, so Django web workers never run a forward pass themselves.
+
+Wire format (both directions): 4-byte big-endian header length, a JSON
+header, then `header["len"]` bytes of payload (the image, for requests).
+
+    request  {"op": "predict", "len": N, "probs": bool, "owner": ...}   + image bytes
+             {"op": "batch", "len": N, "parts": [[name, size], ...], "archive": bool,
+              "k": int, "owner": ...}                                  + the files back to back
+             {"op": "health", "len": 0}
+    response {"ok": true, "result": {...}}
+             {"ok": false, "error": "overloaded" | "timeout" | "invalid" | "failed", "detail": "..."}
+
+Pending requests are queued per owner (user id) and handed to the workers
+round-robin, so one busy client cannot starve the others. Each worker serves
+several requests at once on threads that share its MicroBatcher, so
+concurrent frames still run as one batched forward pass (INFER_BATCHING).
+"""
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .batcher import round_robin
+
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_PAYLOAD = 16 * 1024 * 1024
+MAX_BATCH_PAYLOAD = 256 * 1024 * 1024
+
+
+class PoolError(Exception):
+    pass
+
+
+class PoolOverloaded(PoolError):
+    """Queue is full: shed the request (HTTP 503)."""
+
+
+class PoolTimeout(PoolError):
+    """No result within the deadline (HTTP 504)."""
+
+
+class PoolUnavailable(PoolError):
+    """Socket missing or the service died mid-request (HTTP 503)."""
+
+
+class PoolInvalid(PoolError):
+    """The service rejected the input, e.g. an unusable archive (HTTP 400)."""
+
+
+_ERRORS = {"overloaded": PoolOverloaded, "timeout": PoolTimeout, "invalid": PoolInvalid}
+
+
+# ---- framing ----
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def send_frame(sock, header: dict, chunks=()):
+    raw = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(raw)) + raw)
+    for chunk in chunks:
+        sock.sendall(chunk)
+
+
+def recv_frame(sock):
+    (n,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, n))
+    size = int(header.get("len", 0))
+    if size > (MAX_BATCH_PAYLOAD if header.get("op") == "batch" else MAX_PAYLOAD):
+        raise ValueError(f"payload too large ({size} bytes)")
+    return header, _recv_exact(sock, size) if size else b""
+
+
+# ---- worker processes ----
+def _worker_main(index: int, tasks, results, torch_threads: int, cpus=None, threads: int = 1):
+    import django
+    import torch
+    from django.apps import apps
+    from django.conf import settings
+    from django.db import connections
+
+    if not apps.ready:  # restarted via forkserver / spawn: a fresh interpreter
+        django.setup()
+
+    global _active
+    _active = None  # the parent's pool; its gauges are spooled by the parent
+    connections.close_all()  # inherited sockets belong to the parent
+    # this process *is* the pool: predict locally. INFER_BATCHING stays as configured, so
+    # the `threads` requests in flight here share forward passes through its MicroBatcher.
+    settings.INFER_POOL_SOCKET = ""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(max(1, torch_threads))
+
+    from inference.predictor import get_manager
+
+    get_manager().current()  # load + warm before taking work
+    results.put(("ready", index, None))
+
+    from inference.telemetry import enable_spool
+
+    enable_spool()
+
+    handlers = [threading.Thread(target=_serve, args=(tasks, results), name=f"infer-handler-{i}", daemon=True)
+                for i in range(max(1, threads))]
+    for t in handlers:
+        t.start()
+    for t in handlers:
+        t.join()
+
+
+def _split(data: bytes, parts):
+    view, start, files = memoryview(data), 0, []
+    for name, size in parts:
+        files.append((name, io.BytesIO(view[start:start + size])))
+        start += size
+    return files
+
+
+def _serve(tasks, results):
+    from inference.batcher import BatcherTimeout
+    from inference.predictor import predict_file, predict_uploads
+
+    while True:
+        job = tasks.get()
+        if job is None:
+            return
+        job_id, op, data, deadline, opts = job
+        if time.monotonic() > deadline:
+            # don't burn CPU on an answer nobody is waiting for
+            results.put((job_id, None, ("timeout", "expired in queue")))
+            continue
+        try:
+            if op == "batch":
+                out = predict_uploads(_split(data, opts["parts"]), k=opts.get("k", 3),
+                                      archive=opts.get("archive", False), owner=opts.get("owner"))
+            else:
+                out = predict_file(io.BytesIO(data), with_probs=opts.get("probs", False), owner=opts.get("owner"))
+                if opts.get("probs"):
+                    out["probs"] = out["probs"].tolist()
+            results.put((job_id, out, None))
+        except ValueError as e:
+            results.put((job_id, None, ("invalid", str(e))))
+        except BatcherTimeout as e:
+            results.put((job_id, None, ("overloaded", str(e))))
+        except Exception as e:
+            results.put((job_id, None, ("failed", str(e))))
+
+
+class _FairQueue:
+    """Bounded pending jobs per owner, taken round-robin across owners."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._queues = OrderedDict()  # owner -> deque of jobs; order = next to serve
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def put(self, owner, job):
+        with self._cond:
+            if self._size >= self.capacity:
+                raise queue.Full
+            q = self._queues.get(owner)
+            if q is None:
+                q = self._queues[owner] = deque()
+            q.append(job)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self):
+        with self._cond:
+            while not self._size:
+                self._cond.wait()
+            (job,) = round_robin(self._queues, 1)
+            self._size -= 1
+            return job
+
+    def __len__(self):
+        return self._size
+
+
+_active = None  # the InferencePool running in this process, for inference/telemetry.py
+
+
+class InferencePool:
+    """
+    `workers` model-holding processes, each serving `threads` requests at a
+    time, fed from a bounded per-owner fair queue.
+
+    A full queue rejects immediately (load shedding) instead of letting
+    latency grow without bound. A supervisor thread restarts dead workers.
+
+    Each worker has its own task and result queues: a worker killed while it
+    holds a queue's lock (OOM killer, segfault) takes only its own queues down,
+    and the jobs it held fail right away instead of at their deadline.
+    """
+
+    def __init__(self, workers: int = 2, queue_depth: int = 64, timeout_ms: int = 2000, torch_threads: int = 1,
+                 affinity=None, threads: int = 8, batch_timeout_ms: int = 30000):
+        self.workers = max(1, int(workers))
+        self.threads = max(1, int(threads))
+        self.timeout = max(1, int(timeout_ms)) / 1000.0
+        self.batch_timeout = max(1, int(batch_timeout_ms)) / 1000.0
+        self.torch_threads = int(torch_threads)
+        self.affinity = affinity or None  # [[cpu, ...] per worker], see inference/tuning.py
+
+        # the first workers fork before any thread of ours runs; a restart happens while the
+        # feeder, collector and socket threads do, where fork can copy a lock another thread
+        # holds into the child, so replacements start from a clean interpreter instead
+        self._ctx = multiprocessing.get_context("fork")
+        methods = multiprocessing.get_all_start_methods()
+        self._respawn_ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._pending_jobs = _FairQueue(queue_depth)
+        self._procs = [None] * self.workers
+        self._tasks = [None] * self.workers
+        # jobs handed to each worker and not answered yet: at most `threads`, so the fair
+        # queue (not a worker's backlog) decides the order
+        self._load = [0] * self.workers
+        self._assigned = {}  # job_id -> worker index
+        self._room = threading.Condition()
+        self._ready = set()
+        self._pending = {}  # job_id -> [Event, result, error]
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        self.queue_depth = int(queue_depth)
+        self.restarts = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.completed = 0
+
+    def start(self):
+        global _active
+        for i in range(self.workers):
+            self._spawn(i)
+        _active = self
+        from .telemetry import enable_spool
+
+        enable_spool()
+        threading.Thread(target=self._feed, name="pool-feeder", daemon=True).start()
+        threading.Thread(target=self._supervise, name="pool-supervisor", daemon=True).start()
+
+    def _spawn(self, i: int, respawn: bool = False):
+        ctx = self._respawn_ctx if respawn else self._ctx
+        tasks, results = ctx.Queue(), ctx.Queue()
+        p = ctx.Process(
+            target=_worker_main,
+            args=(i, tasks, results, self.torch_threads,
+                  self.affinity[i % len(self.affinity)] if self.affinity else None, self.threads),
+            name=f"infer-worker-{i}",
+            daemon=True,
+        )
+        p.start()
+        with self._room:
+            self._procs[i], self._tasks[i] = p, tasks
+        threading.Thread(target=self._collect, args=(i, p, results), name=f"pool-results-{i}", daemon=True).start()
+
+    def _supervise(self):
+        while True:
+            time.sleep(1.0)
+            for i, p in enumerate(self._procs):
+                if p is not None and not p.is_alive():
+                    logger.warning("inference worker %s (pid %s) exited with %s; restarting", i, p.pid, p.exitcode)
+                    self.restarts += 1
+                    with self._room:
+                        self._ready.discard(i)
+                        lost = [job_id for job_id, w in self._assigned.items() if w == i]
+                        for job_id in lost:
+                            del self._assigned[job_id]
+                        self._load[i] = 0
+                    for job_id in lost:
+                        self._answer(job_id, None, ("failed", "inference worker exited"))
+                    self._spawn(i, respawn=True)
+
+    def _feed(self):
+        while True:
+            job = self._pending_jobs.get()
+            with self._room:
+                while True:  # wait for a ready worker with a free thread, least loaded first
+                    free = [i for i in self._ready if self._load[i] < self.threads]
+                    if free:
+                        break
+                    self._room.wait(1.0)
+                i = min(free, key=lambda w: self._load[w])
+                self._load[i] += 1
+                self._assigned[job[0]] = i
+                tasks = self._tasks[i]
+            tasks.put(job)
+
+    def _collect(self, i: int, proc, results):
+        while True:
+            try:
+                job_id, out, error = results.get(timeout=1.0)
+            except queue.Empty:
+                if self._procs[i] is not proc:
+                    return  # replaced: its jobs were failed by the supervisor
+                continue
+            with self._room:
+                if job_id == "ready":
+                    self._ready.add(i)
+                elif self._assigned.get(job_id) == i:
+                    del self._assigned[job_id]
+                    self._load[i] -= 1
+                self._room.notify()
+            if job_id != "ready":
+                self._answer(job_id, out, error)
+
+    def _answer(self, job_id, out, error):
+        with self._lock:
+            slot = self._pending.pop(job_id, None)
+        if slot is not None:
+            slot[1], slot[2] = out, error
+            slot[0].set()
+
+    def submit(self, data: bytes, op: str = "predict", opts: dict = None, owner=None) -> dict:
+        opts = dict(opts or {}, owner=owner)
+        timeout = self.batch_timeout if op == "batch" else self.timeout
+        job_id = next(self._ids)
+        slot = [threading.Event(), None, None]
+        with self._lock:
+            self._pending[job_id] = slot
+
+        try:
+            self._pending_jobs.put(owner, (job_id, op, data, time.monotonic() + timeout, opts))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            self.rejected += 1
+            raise PoolOverloaded("inference queue is full")
+
+        if not slot[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(job_id, None)
+            self.timeouts += 1
+            raise PoolTimeout(f"no result within {timeout * 1000:.0f} ms")
+        if slot[2]:
+            kind, detail = slot[2]
+            if kind == "timeout":
+                self.timeouts += 1
+            raise _ERRORS.get(kind, PoolError)(detail)
+
+        self.completed += 1
+        return slot[1]
+
+    def health(self) -> dict:
+        try:
+            depth = len(self._pending_jobs) + sum(q.qsize() for q in self._tasks if q is not None)
+        except NotImplementedError:  # macOS
+            depth = None
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads,
+            "alive": sum(1 for p in self._procs if p is not None and p.is_alive()),
+            "ready": len(self._ready),
+            "queue_depth": depth,
+            "queue_capacity": self.queue_depth,
+            "in_flight": len(self._pending),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+
+# ---- socket server ----
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        pool = self.server.pool
+        while True:
+            try:
+                header, payload = recv_frame(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+
+            op = header.get("op")
+            if op == "health":
+                send_frame(self.request, {"ok": True, "result": pool.health()})
+                continue
+            if op not in ("predict", "batch"):
+                send_frame(self.request, {"ok": False, "error": "failed", "detail": f"unknown op {op!r}"})
+                continue
+
+            opts = {"probs": bool(header.get("probs"))} if op == "predict" else {
+                "parts": header.get("parts", []), "archive": bool(header.get("archive")), "k": header.get("k", 3),
+            }
+            try:
+                out = pool.submit(payload, op=op, opts=opts, owner=header.get("owner"))
+                send_frame(self.request, {"ok": True, "result": out})
+            except PoolError as e:
+                error = next((k for (k, cls) in _ERRORS.items() if isinstance(e, cls)), "failed")
+                send_frame(self.request, {"ok": False, "error": error, "detail": str(e)})
+
+
+class PoolServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # every web thread keeps a connection; they all reconnect after a restart
+
+    def __init__(self, path: str, pool: InferencePool):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.pool = pool
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+
+
+# ---- client (used by Django web workers) ----
+def _payload(f):
+    """(size, chunks) of an upload/file-like, without copying Django uploads into memory."""
+    f.seek(0)
+    if hasattr(f, "chunks"):
+        return f.size, f.chunks()
+    data = f.read()
+    return len(data), (data,)
+
+
+class PoolClient:
+    """One persistent connection per calling thread."""
+
+    def __init__(self, path: str, timeout_ms: int = 2000, batch_timeout_ms: int = 30000):
+        self.path = path
+        # server-side deadlines + slack
+        self.timeout = max(1, int(timeout_ms)) / 1000.0 + 1.0
+        self.batch_timeout = max(1, int(batch_timeout_ms)) / 1000.0 + 1.0
+        self._local = threading.local()
+
+    def _sock(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None or getattr(self._local, "pid", None) != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                sock.close()
+                raise PoolUnavailable(f"inference service unreachable at {self.path}: {e}")
+            self._local.sock, self._local.pid = sock, os.getpid()
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _call(self, header: dict, chunks=(), timeout: float = None):
+        sock = self._sock()
+        try:
+            sock.settimeout(timeout or self.timeout)
+            send_frame(sock, header, chunks)
+            resp, _ = recv_frame(sock)
+        except socket.timeout:
+            self._drop()
+            raise PoolTimeout("inference service did not answer in time")
+        except (ConnectionError, OSError, ValueError) as e:
+            self._drop()
+            raise PoolUnavailable(f"inference service connection failed: {e}")
+
+        if resp.get("ok"):
+            return resp["result"]
+        raise _ERRORS.get(resp.get("error"), PoolError)(resp.get("detail", ""))
+
+    def predict(self, f, want_probs: bool = False, owner=None) -> dict:
+        """Stream an upload/file-like to the pool (chunked, no full copy) and return its result."""
+        size, chunks = _payload(f)
+        return self._call({"op": "predict", "len": size, "probs": want_probs, "owner": owner}, chunks)
+
+    def predict_batch(self, files, k: int = 3, archive: bool = False, owner=None) -> dict:
+        """predictor.predict_uploads in the pool: `files` is [(name, file-like)]."""
+        parts, chunks = [], []
+        for name, f in files:
+            size, c = _payload(f)
+            parts.append([name, size])
+            chunks.append(c)
+        header = {"op": "batch", "len": sum(size for (_, size) in parts), "parts": parts, "archive": archive,
+                  "k": k, "owner": owner}
+        return self._call(header, itertools.chain.from_iterable(chunks), timeout=self.batch_timeout)
+
+    def health(self) -> dict:
+        return self._call({"op": "health", "len": 0})
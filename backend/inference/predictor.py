@@ -1,12 +1,30 @@
+import hashlib
+import io
 import json
+import logging
+import os
+import tempfile
 import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from pathlib import Path
 
 import torch
 import torch.nn.functional as F
 from PIL import Image
 from torchvision import transforms
-from torchvision.models import efficientnet_b0
+from django.conf import settings
+
+from . import archives, hands, metrics, preprocess, shadow, tuning
+from .telemetry import CASCADE_FRAMES, INFERENCES, ROI_FRAMES, STAGE_SECONDS
+from .preprocess import open_image
+from .batcher import BatcherTimeout, MicroBatcher
+from .cache import PredictionCache, average_hash, content_digest
+from .pool import PoolClient
+from .model_manager import ARCH_BUILDERS, ARCH_COST, LoadedModel, ModelManager, ModelSpec, share_weights, warm_up
+from .stream import StreamState
+
+
+logger = logging.getLogger(__name__)
 
 
 # ---- file paths inside the container ----
@@ -14,74 +32,585 @@ from torchvision.models import efficientnet_b0
 MODELS_DIR = Path("/app/models")
 WEIGHTS_PATH = MODELS_DIR / "active.pth"
 LABELS_PATH = MODELS_DIR / "idx_to_bangla.json"
+# label map shipped in the repo (backend/models), used by INFER_RANDOM_WEIGHTS outside the container
+BUNDLED_LABELS_PATH = Path(__file__).resolve().parent.parent / "models" / "idx_to_bangla.json"
 
 # ---- device (keep CPU for now; stable for shipping) ----
 DEVICE = torch.device("cpu")
 
 # ---- transforms (exactly like your notebook) ----
+# Reference pipeline; requests go through preprocess.preprocess, which matches it
+# numerically but skips PIL's ToTensor/Normalize (see benchmarks/bench_preprocess.py).
 transform = transforms.Compose([
     transforms.Resize((224, 224)),
     transforms.ToTensor(),
     transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
 ])
 
-_model = None
 _idx_to_bangla = None
+_labels_etag = None
 _num_classes = None
+_manager = None
+_batcher = None
+_cache = None
+_pool_client = None
+
+
+def _random_weights_path() -> Path:
+    """Seeded, randomly initialised effnet_b0 checkpoint (INFER_RANDOM_WEIGHTS: benchmarks without real weights)."""
+    path = Path(tempfile.gettempdir()) / f"bsl-random-effnet_b0-{_num_classes}.pth"
+    if not path.exists():
+        torch.manual_seed(0)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        torch.save(ARCH_BUILDERS["effnet_b0"](_num_classes).state_dict(), tmp)
+        os.replace(tmp, path)
+    return path
+
+
+def _resolve_spec() -> ModelSpec:
+    """Active + enabled MLModel row, else the bundled WEIGHTS_PATH."""
+    from django.db import close_old_connections
+    from api.models import MLModel
+
+    if getattr(settings, "INFER_RANDOM_WEIGHTS", False):
+        return ModelSpec(None, "effnet_b0", _random_weights_path())
+
+    close_old_connections()
+    m = MLModel.objects.filter(is_active=True, enabled=True).first()
+    backend = getattr(settings, "INFER_BACKEND", "eager")
+    if m is not None and m.file:
+        return ModelSpec(m.id, m.arch, m.file.path, m.version, backend=backend)
+    return ModelSpec(None, "effnet_b0", WEIGHTS_PATH, backend=backend)
+
+
+def cascade_plan():
+    """
+    (stages, active) from the registry: enabled MLModels with cascade_enabled and a
+    cheaper arch than the active one (ARCH_COST), cheapest first, as [(MLModel,
+    threshold)], and the active MLModel (None: bundled weights, treated as effnet_b0).
+    """
+    from api.models import MLModel
+
+    active = MLModel.objects.filter(is_active=True, enabled=True).first()
+    limit = ARCH_COST.get(active.arch if active is not None else "effnet_b0", max(ARCH_COST.values()))
+    default = getattr(settings, "INFER_CASCADE_DEFAULT_THRESHOLD", 0.9)
+
+    rows = MLModel.objects.filter(enabled=True, cascade_enabled=True, is_active=False).exclude(file="")
+    rows = sorted((m for m in rows if ARCH_COST.get(m.arch, limit) < limit), key=lambda m: (ARCH_COST[m.arch], m.id))
+    return [(m, m.cascade_threshold if m.cascade_threshold is not None else default) for m in rows], active
+
+
+def _resolve_stages():
+    """Cascade stages before the active model as [(ModelSpec, threshold)] (see cascade_plan)."""
+    from django.db import close_old_connections
+
+    if not getattr(settings, "INFER_CASCADE_ENABLED", True) or getattr(settings, "INFER_RANDOM_WEIGHTS", False):
+        return []
+
+    close_old_connections()
+    backend = getattr(settings, "INFER_BACKEND", "eager")
+    stages = []
+    for m, threshold in cascade_plan()[0]:
+        try:
+            stages.append((ModelSpec(m.id, m.arch, m.file.path, m.version, backend=backend), threshold))
+        except OSError:
+            logger.warning("cascade stage %s has no weights file, skipping", m.id)
+    return stages
+
+
+def shadow_candidates():
+    """Enabled, non-active MLModels with shadow_enabled: evaluated on sampled live frames (inference/shadow.py)."""
+    from api.models import MLModel
+
+    return list(MLModel.objects.filter(enabled=True, shadow_enabled=True, is_active=False).exclude(file=""))
+
+
+def _resolve_shadow():
+    from django.db import close_old_connections
+
+    if getattr(settings, "INFER_RANDOM_WEIGHTS", False):
+        return []
+
+    close_old_connections()
+    specs = []
+    for m in shadow_candidates():
+        try:
+            specs.append(ModelSpec(m.id, m.arch, m.file.path, m.version))
+        except OSError:
+            logger.warning("shadow candidate %s has no weights file, skipping", m.id)
+    return specs
 
 
 def _load_once():
-    global _model, _idx_to_bangla, _num_classes
+    global _idx_to_bangla, _num_classes, _manager
 
-    if _model is not None and _idx_to_bangla is not None:
+    if _manager is not None and _idx_to_bangla is not None:
         return
 
-    if not WEIGHTS_PATH.exists():
-        raise FileNotFoundError(f"Missing model weights: {WEIGHTS_PATH}")
-    if not LABELS_PATH.exists():
+    labels_path = LABELS_PATH
+    if not labels_path.exists() and getattr(settings, "INFER_RANDOM_WEIGHTS", False):
+        labels_path = BUNDLED_LABELS_PATH
+    if not labels_path.exists():
         raise FileNotFoundError(f"Missing label map: {LABELS_PATH}")
 
-    with open(LABELS_PATH, "r", encoding="utf-8") as f:
+    with open(labels_path, "r", encoding="utf-8") as f:
         _idx_to_bangla = json.load(f)
 
     _num_classes = len(_idx_to_bangla)
 
-    model = efficientnet_b0(weights=None)
-    model.classifier[1] = torch.nn.Linear(model.classifier[1].in_features, _num_classes)
+    _manager = ModelManager(
+        _resolve_spec,
+        num_classes=_num_classes,
+        capacity=getattr(settings, "INFER_MODEL_CACHE_SIZE", 2),
+        poll_seconds=getattr(settings, "INFER_MODEL_POLL_SECONDS", 2.0),
+        backend=getattr(settings, "INFER_BACKEND", "eager"),
+        resolve_stages=_resolve_stages,
+    )
 
-    ckpt = torch.load(str(WEIGHTS_PATH), map_location="cpu")
-    state = ckpt["state_dict"] if isinstance(ckpt, dict) and "state_dict" in ckpt else ckpt
-    model.load_state_dict(state, strict=True)
 
-    model.to(DEVICE).eval()
-    _model = model
+def get_manager() -> ModelManager:
+    _load_once()
+    return _manager
 
 
-def predict_pil(img: Image.Image):
+def preload():
+    """
+    Load + warm the active model in this process and put its weights in
+    shared memory, without starting any threads. Meant for the gunicorn
+    master before fork (config/gunicorn.conf.py); workers inherit the model.
+    """
     _load_once()
+    entry = _manager.preload()
+    share_weights(entry.model)
+    for stage, _ in _manager.stages():
+        share_weights(stage.model)
+    return entry
+
+
+def warm():
+    """One dummy forward pass in this process (e.g. right after fork)."""
+    if _manager is not None and _manager._current is not None:
+        warm_up(_manager._current.model)
 
-    t0 = time.perf_counter()
 
-    x = transform(img.convert("RGB")).unsqueeze(0).to(DEVICE)
+def request_model_refresh():
+    """Re-read the registry now instead of waiting for the next poll (no-op before first use)."""
+    if _manager is not None:
+        _manager.request_refresh()
 
+
+def _forward(x: torch.Tensor, entry: LoadedModel = None, stages=None):
+    """
+    [B, 3, 224, 224] -> (softmax probs [B, C], model id that ran).
+
+    With cascade stages (ModelManager.stages()), rows go through the cheap
+    models first and only rows below a stage's threshold reach the next one;
+    the tag is then a list with one (model id, stage, path) per row, where
+    stage len(stages) is the active model and path is ((model id, forward ms),
+    ...) for every stage the row went through, so each model is charged for
+    its own pass only.
+    """
+    entry = entry or _manager.current()
+    stages = _manager.stages() if stages is None else stages
     with torch.inference_mode():
-        logits = _model(x)
-        probs = F.softmax(logits, dim=1)[0]  # [C]
+        x = x.to(DEVICE)
+        if not stages:
+            return F.softmax(entry.model(x), dim=1), entry.model_id
+
+        out, answered, path = None, [None] * x.shape[0], []
+        pending = torch.arange(x.shape[0])
+        for i, (stage, threshold) in enumerate(stages + ((entry, 0.0),)):
+            t0 = time.perf_counter()
+            probs = F.softmax(stage.model(x if i == 0 else x[pending]), dim=1)
+            path.append((stage.model_id, (time.perf_counter() - t0) * 1000))
+            if out is None:
+                out = torch.empty((x.shape[0], probs.shape[1]), dtype=probs.dtype)
+            done = probs.max(dim=1).values >= threshold
+            for row in pending[done].tolist():
+                answered[row] = i
+            out[pending[done]] = probs[done]
 
-        k = min(3, probs.shape[0])
-        topv, topi = torch.topk(probs, k=k)
+            outcome = "final" if i == len(stages) else "accepted"
+            CASCADE_FRAMES.inc(str(i), outcome, amount=int(done.sum()))
+            if i < len(stages) and not bool(done.all()):
+                CASCADE_FRAMES.inc(str(i), "escalated", amount=int((~done).sum()))
+            pending = pending[~done]
+            if not len(pending):
+                break
+        return out, [(path[i][0], i, tuple(path[:i + 1])) for i in answered]
 
-    top3 = []
+
+def _topk(probs: torch.Tensor, k: int = 3):
+    k = min(k, probs.shape[0])
+    topv, topi = torch.topk(probs, k=k)
+
+    out = []
     for conf, idx in zip(topv.tolist(), topi.tolist()):
-        lab = _idx_to_bangla.get(str(idx), str(idx))
-        top3.append((lab, float(conf)))
+        out.append((label_of(idx), float(conf)))
+    return out
+
+
+def get_batcher():
+    global _batcher
+
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _forward,
+            max_batch_size=getattr(settings, "INFER_BATCH_MAX_SIZE", 0) or tuning.load().get("batch_size", 8),
+            max_wait_ms=getattr(settings, "INFER_BATCH_MAX_WAIT_MS", 5.0),
+        )
+    return _batcher
+
+
+def label_of(idx: int) -> str:
+    return _idx_to_bangla.get(str(idx), str(idx))
+
+
+def label_map():
+    """(idx -> label dict, etag): what compact responses' class indices refer to."""
+    global _labels_etag
+
+    _load_once()
+    if _labels_etag is None:
+        raw = json.dumps(_idx_to_bangla, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        _labels_etag = hashlib.sha256(raw).hexdigest()[:16]
+    return _idx_to_bangla, _labels_etag
+
+
+def predict_pil(img: Image.Image, stream: StreamState = None, owner=None):
+    """
+    Classify one image. With `stream`, also fold the probability vector into
+    that session's smoothing state and report it under "stream". `owner`
+    (e.g. user id) is the micro-batcher's fair-share key.
+    """
+    out, probs = _predict(img, owner)
+    if stream is not None:
+        out["stream"] = stream.update(probs, label_of)
+    return out
+
+
+def _predict(img: Image.Image, owner=None):
+    _load_once()
+
+    t0 = time.perf_counter()
+
+    rgb = preprocess.load_rgb(img)  # decode (+ draft-scale resize)
+    t_dec = time.perf_counter()
+    x = preprocess.to_tensor(rgb)
+    t1 = time.perf_counter()
+
+    if getattr(settings, "INFER_BATCHING", True):
+        timeout = getattr(settings, "INFER_BATCH_RESULT_TIMEOUT_MS", 10000) / 1000
+        try:
+            res = get_batcher().submit(x, owner=owner).result(timeout=timeout)
+        except FutureTimeout:
+            raise BatcherTimeout(f"no result within {timeout * 1000:.0f} ms")
+        probs, model_id = res["probs"], res["tag"]
+        queue_ms, compute_ms, batch_size = res["queue_ms"], res["compute_ms"], res["batch_size"]
+    else:
+        t_fwd = time.perf_counter()
+        probs, model_id = _forward(x.unsqueeze(0))
+        probs = probs[0]  # [C]
+        model_id = model_id[0] if isinstance(model_id, list) else model_id
+        queue_ms, compute_ms, batch_size = 0.0, (time.perf_counter() - t_fwd) * 1000, 1
+    cascade_stage, path = None, ()
+    if isinstance(model_id, tuple):
+        model_id, cascade_stage, path = model_id
+
+    t_post = time.perf_counter()
+    top3 = _topk(probs, k=3)
 
     latency_ms = int((time.perf_counter() - t0) * 1000)
     best_label, best_conf = top3[0]
 
-    return {
+    out = {
         "label": best_label,
         "confidence": float(best_conf),
         "top3": [{"label": l, "confidence": c} for (l, c) in top3],
         "latency_ms": latency_ms,
+        "model_id": model_id,
+        "latency_breakdown": {
+            "decode_ms": round((t_dec - t0) * 1000, 2),
+            "preprocess_ms": round((t1 - t_dec) * 1000, 2),
+            "queue_ms": round(queue_ms, 2),
+            "compute_ms": round(compute_ms, 2),
+            "batch_size": batch_size,
+        },
     }
+    if cascade_stage is not None:
+        out["cascade_stage"] = cascade_stage
+
+    t_end = time.perf_counter()
+    shadow.maybe_offer(_resolve_shadow, _num_classes, x, probs, model_id)
+    STAGE_SECONDS.observe(t_dec - t0, "decode")
+    STAGE_SECONDS.observe(t1 - t_dec, "preprocess")
+    STAGE_SECONDS.observe(queue_ms / 1000, "queue")
+    STAGE_SECONDS.observe(compute_ms / 1000, "forward")
+    STAGE_SECONDS.observe(t_end - t_post, "postprocess")
+    for stage_model_id, stage_ms in path[:-1]:  # cascade stages that passed the frame on
+        metrics.observe(stage_model_id, {"forward": stage_ms}, served=False)
+    metrics.observe(
+        model_id,
+        {
+            "decode": (t_dec - t0) * 1000,
+            "preprocess": (t1 - t_dec) * 1000,
+            "queue": queue_ms,
+            "forward": path[-1][1] if path else compute_ms,
+            "postprocess": (t_end - t_post) * 1000,
+            "total": (t_end - t0) * 1000,
+        },
+        label=best_label,
+        confidence=float(best_conf),
+    )
+    return out, probs
+
+
+def get_cache():
+    """Process-wide PredictionCache, or None when INFER_CACHE_ENABLED is off."""
+    global _cache
+
+    if _cache is None and getattr(settings, "INFER_CACHE_ENABLED", True):
+        _cache = PredictionCache(
+            max_entries=getattr(settings, "INFER_CACHE_MAX_ENTRIES", 2048),
+            ttl_seconds=getattr(settings, "INFER_CACHE_TTL_SECONDS", 5.0),
+            max_distance=getattr(settings, "INFER_CACHE_PHASH_DISTANCE", -1),
+        )
+    return _cache
+
+
+def get_pool_client():
+    """PoolClient for the out-of-process inference service, or None to predict in-process."""
+    global _pool_client
+
+    path = getattr(settings, "INFER_POOL_SOCKET", "")
+    if not path:
+        return None
+    if _pool_client is None or _pool_client.path != path:
+        _pool_client = PoolClient(
+            path,
+            timeout_ms=getattr(settings, "INFER_POOL_TIMEOUT_MS", 2000),
+            batch_timeout_ms=getattr(settings, "INFER_POOL_BATCH_TIMEOUT_MS", 30000),
+        )
+    return _pool_client
+
+
+def predict_file(f, stream: StreamState = None, with_probs: bool = False, owner=None):
+    """
+    Classify an uploaded/file-like image, consulting the prediction cache.
+
+    A hit (exact bytes, or with INFER_CACHE_PHASH_DISTANCE >= 0 a perceptually
+    near-identical frame) skips decode and the forward pass and returns the
+    cached result with "cached": true. Entries are scoped to the model being
+    served and the cascade stages in front of it, so neither a hot-swap nor a
+    cascade change returns an answer computed under the previous setup.
+
+    With INFER_POOL_SOCKET set, the frame is sent to the inference service
+    instead (raises inference.pool.PoolError subclasses on shed/timeout).
+    `with_probs` leaves the probability tensor in the result under "probs".
+    `owner` is the micro-batcher's fair-share key (see MicroBatcher).
+    """
+    client = get_pool_client()
+    if client is not None:
+        out = client.predict(f, want_probs=stream is not None or with_probs, owner=owner)
+        if stream is not None:
+            _load_once()
+            probs = torch.tensor(out["probs"] if with_probs else out.pop("probs"))
+            out["stream"] = stream.update(probs, label_of)
+        return out
+
+    cache = get_cache()
+    if cache is None:
+        INFERENCES.inc("off")
+        out, probs = _predict(open_image(f), owner)
+        if stream is not None:
+            out["stream"] = stream.update(probs, label_of)
+        if with_probs:
+            out["probs"] = probs
+        return out
+
+    t0 = time.perf_counter()
+    manager = get_manager()
+    scope = (manager.current().key, tuple((entry.key, threshold) for entry, threshold in manager.stages()))
+    digest = content_digest(f)
+
+    hit, match, ahash = cache.get(scope, digest), "exact", None
+    if hit is None and cache.perceptual:
+        try:
+            ahash = average_hash(f)
+        except Exception:
+            ahash = None  # let the full decode below report the error
+        if ahash is not None:
+            hit, match = cache.get_similar(scope, ahash), "similar"
+
+    INFERENCES.inc("miss" if hit is None else match)
+    if hit is not None:
+        cached_out, probs = hit
+        out = dict(cached_out)
+        out["cached"] = True
+        out["cache_match"] = match
+        total_ms = (time.perf_counter() - t0) * 1000
+        out["latency_ms"] = int(total_ms)
+        out.pop("latency_breakdown", None)
+        # counted, but kept out of the stage histograms: they describe the model's own cost
+        metrics.observe(out.get("model_id"), {}, label=out.get("label"), confidence=out.get("confidence"), cached=True)
+    else:
+        cache.miss()
+        out, probs = _predict(open_image(f), owner)
+        cache.put(scope, digest, ahash, (dict(out), probs))
+        out["cached"] = False
+
+    if stream is not None:
+        out["stream"] = stream.update(probs, label_of)
+    if with_probs:
+        out["probs"] = probs
+    return out
+
+
+def new_stream() -> StreamState:
+    return StreamState(
+        alpha=getattr(settings, "INFER_STREAM_ALPHA", 0.5),
+        stable_frames=getattr(settings, "INFER_STREAM_STABLE_FRAMES", 4),
+        min_confidence=getattr(settings, "INFER_STREAM_MIN_CONFIDENCE", 0.5),
+    )
+
+
+def predict_batch(images, k: int = 3, chunk_size: int = None):
+    """
+    Classify many images in a few large forward passes (bypasses the micro-batcher).
+
+    `images` is a list of lazily-opened PIL images; an image that is None or
+    fails to decode gets {"error": ...} instead of a prediction. All chunks run on the
+    same model snapshot even if a hot-swap happens mid-request. With cascade stages,
+    each result also says which model answered.
+    """
+    _load_once()
+    chunk_size = chunk_size or getattr(settings, "INFER_BATCH_CHUNK_SIZE", 32)
+
+    t0 = time.perf_counter()
+    entry, stages = _manager.current(), _manager.stages()
+    buf = preprocess.alloc_batch(min(chunk_size, max(1, len(images))))
+
+    results = [None] * len(images)
+    preprocess_ms = forward_ms = 0.0
+    passes = 0
+
+    for start in range(0, len(images), chunk_size):
+        rows = []  # (index in images, row in buf)
+        t_pre = time.perf_counter()
+        for i in range(start, min(start + chunk_size, len(images))):
+            try:
+                if images[i] is None:
+                    raise ValueError("not an image")
+                preprocess.preprocess(images[i], out=buf[len(rows)])
+            except Exception as e:
+                results[i] = {"error": f"Could not decode image: {e}"}
+                continue
+            rows.append(i)
+        t_fwd = time.perf_counter()
+        preprocess_ms += (t_fwd - t_pre) * 1000
+
+        if not rows:
+            continue
+
+        probs, tags = _forward(buf[:len(rows)], entry=entry, stages=stages)
+        forward_ms += (time.perf_counter() - t_fwd) * 1000
+        passes += 1
+
+        for row, i in enumerate(rows):
+            topk = _topk(probs[row], k=k)
+            results[i] = {
+                "label": topk[0][0],
+                "confidence": topk[0][1],
+                "topk": [{"label": l, "confidence": c} for (l, c) in topk],
+            }
+            if isinstance(tags, list):
+                results[i]["model_id"], results[i]["cascade_stage"], _ = tags[row]
+
+    total_ms = (time.perf_counter() - t0) * 1000
+    ok = sum(1 for r in results if "error" not in r)
+
+    return {
+        "model_id": entry.model_id,
+        "count": len(images),
+        "succeeded": ok,
+        "results": results,
+        "timing": {
+            "total_ms": round(total_ms, 2),
+            "preprocess_ms": round(preprocess_ms, 2),
+            "forward_ms": round(forward_ms, 2),
+            "forward_passes": passes,
+            "images_per_s": round(ok / (total_ms / 1000), 1) if total_ms > 0 else None,
+        },
+    }
+
+
+def predict_uploads(files, k: int = 3, archive: bool = False, owner=None):
+    """
+    predict_batch for uploads: `files` is [(name, file-like)] of images, or with
+    `archive` one .zip/.npz (inference.archives). Each result carries its "name".
+    Raises ValueError (archives.TooManyImages included) for unusable input.
+
+    With INFER_POOL_SOCKET set, the raw bytes go to the inference service,
+    which decodes and runs them there (raises inference.pool.PoolError subclasses).
+    """
+    client = get_pool_client()
+    if client is not None:
+        return client.predict_batch(files, k=k, archive=archive, owner=owner)
+
+    limit = getattr(settings, "INFER_BATCH_REQUEST_MAX", 256)
+    if archive:
+        name, f = files[0]
+        items = archives.images_from_archive(
+            f, name, limit, getattr(settings, "INFER_BATCH_ARCHIVE_MAX_BYTES", 256 * 1024 * 1024)
+        )
+    else:
+        if len(files) > limit:
+            raise archives.TooManyImages(len(files), limit)
+        items = []
+        for name, f in files:
+            try:
+                items.append((name, open_image(f)))
+            except Exception:
+                items.append((name, None))
+    if not items:
+        raise ValueError("No images. Send repeated 'images' files or one 'archive' (.zip/.npz).")
+
+    out = predict_batch([img for (_, img) in items], k=k)
+    for (name, _), r in zip(items, out["results"]):
+        r["name"] = name
+    return out
+
+
+def predict_frame(f, stream: StreamState = None, with_probs: bool = False, owner=None):
+    """
+    Classify a full camera frame: crop the hand server-side (inference.hands),
+    then run the ROI through predict_file (cache, pool, smoothing as usual).
+    The stream session, if any, also carries the tracked hand box.
+
+    Without a hand, no forward pass runs and the result has "hand": null and
+    no label; the session's smoothing state is left untouched.
+    """
+    t0 = time.perf_counter()
+    track = None
+    if stream is not None:
+        track = stream.hand_track = stream.hand_track or hands.Track()
+    roi, how = hands.extract(open_image(f), track)
+    roi_ms = (time.perf_counter() - t0) * 1000
+    ROI_FRAMES.inc(how)
+    STAGE_SECONDS.observe(roi_ms / 1000, "roi")
+
+    if roi is None:
+        out = {"hand": None, "label": None, "confidence": 0.0, "top3": [], "latency_ms": int(roi_ms), "model_id": None}
+        if with_probs:
+            out["probs"] = None
+        return out
+
+    buf = io.BytesIO()
+    roi.save(buf, "JPEG", quality=90)  # the same 128px JPEG ROI the browser would send
+    buf.seek(0)
+    out = predict_file(buf, stream=stream, with_probs=with_probs, owner=owner)
+    out["hand"] = how
+    out["latency_ms"] = int(out.get("latency_ms", 0) + roi_ms)
+    if "latency_breakdown" in out:
+        out["latency_breakdown"]["roi_ms"] = round(roi_ms, 2)
+    return out
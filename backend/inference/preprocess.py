@@ -0,0 +1,92 @@
+import torch
+from PIL import Image
+
+
+INPUT_SIZE = 224
+
+# ---- normalization (same constants as predictor.transform) ----
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+# ToTensor + Normalize fused into one multiply-add on the uint8 pixels:
+#   (x / 255 - mean) / std  ==  x * (1 / (255 * std)) + (-mean / std)
+_SCALE = torch.tensor([1.0 / (255.0 * s) for s in STD]).view(3, 1, 1)
+_BIAS = torch.tensor([-m / s for (m, s) in zip(MEAN, STD)]).view(3, 1, 1)
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image PIL can decode (HTTP 400, not a server error)."""
+
+
+def open_image(fileobj) -> Image.Image:
+    """Lazily open an upload (no copy into BytesIO); pixels are decoded later, see `decode`."""
+    try:
+        return Image.open(fileobj)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"could not decode image: {e}") from e
+
+
+def decode(img: Image.Image) -> Image.Image:
+    """Decode the pixels now (after any draft()), reporting a corrupt upload as InvalidImage."""
+    try:
+        img.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"could not decode image: {e}") from e
+    return img
+
+
+def load_rgb(img: Image.Image, size: int = INPUT_SIZE, draft: bool = True) -> Image.Image:
+    """
+    Decode to an RGB image of exactly (size, size).
+
+    Large JPEGs are decoded at a reduced DCT scale (draft mode) first, which is
+    much cheaper than a full decode followed by a resize. Inputs that are
+    already (size, size) skip the resize entirely.
+    """
+    if draft and img.format == "JPEG" and min(img.size) >= 2 * size:
+        img.draft("RGB", (size, size))
+    decode(img)
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.BILINEAR)
+    return img
+
+
+def to_tensor(img: Image.Image, out: torch.Tensor = None) -> torch.Tensor:
+    """RGB (H, W) image -> normalized float32 [3, H, W], written into `out` if given."""
+    w, h = img.size
+    pixels = torch.frombuffer(bytearray(img.tobytes()), dtype=torch.uint8).view(h, w, 3).permute(2, 0, 1)
+    return normalize(pixels, out=out)
+
+
+def normalize(pixels: torch.Tensor, out: torch.Tensor = None) -> torch.Tensor:
+    """uint8 [..., 3, H, W] -> normalized float32 (one fused multiply-add), written into `out` if given."""
+    if out is None:
+        out = torch.empty(pixels.shape, dtype=torch.float32)
+    torch.addcmul(_BIAS, pixels, _SCALE, out=out)
+    return out
+
+
+def preprocess(img: Image.Image, out: torch.Tensor = None, size: int = INPUT_SIZE) -> torch.Tensor:
+    return to_tensor(load_rgb(img, size=size), out=out)
+
+
+def alloc_batch(batch_size: int, size: int = INPUT_SIZE) -> torch.Tensor:
+    """Preallocated [B, 3, size, size] input buffer (page-locked when a GPU is present)."""
+    buf = torch.empty((batch_size, 3, size, size), dtype=torch.float32)
+    if torch.cuda.is_available():
+        buf = buf.pin_memory()
+    return buf
+
+
+def preprocess_batch(images, out: torch.Tensor = None, size: int = INPUT_SIZE) -> torch.Tensor:
+    """Fill rows of `out` (or a fresh buffer) with preprocessed images; returns the [N, ...] view."""
+    n = len(images)
+    if out is None or out.shape[0] < n:
+        out = alloc_batch(n, size=size)
+    for i, img in enumerate(images):
+        preprocess(img, out=out[i], size=size)
+    return out[:n]
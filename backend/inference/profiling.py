@@ -0,0 +1,68 @@
+"""
+Latency / throughput sweep for one checkpoint (manage.py profile_model).
+
+Meant to run in its own process: a checkpoint that crashes or eats memory
+must not take a web worker with it, and peak RSS (ru_maxrss) is only
+meaningful per process.
+"""
+import resource
+import statistics
+import time
+
+import torch
+
+from .model_manager import load_model
+from .preprocess import INPUT_SIZE
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB, peak
+
+
+def percentile(sorted_values, q: float):
+    i = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+def time_batches(model, batch_size: int, runs: int, warmup: int = 3) -> dict:
+    x = torch.randn(batch_size, 3, INPUT_SIZE, INPUT_SIZE, generator=torch.Generator().manual_seed(0))
+    with torch.inference_mode():
+        for _ in range(warmup):
+            model(x)
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            model(x)
+            times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times), 3),
+        "p95_ms": round(percentile(times, 0.95), 3),
+        "images_per_s": round(batch_size * 1000 * len(times) / sum(times), 1),
+    }
+
+
+def sweep(arch: str, path, num_classes: int, batch_sizes=(1, 4, 16), threads=(1, 2, 4), runs: int = 30) -> dict:
+    """
+    Load `path` as `arch`, then time every (threads, batch size) pair.
+    p95_ms (the headline number activation is gated on) is batch 1 at the first thread count.
+    """
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    model = load_model(arch, path, num_classes)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    results = []
+    for n in threads:
+        torch.set_num_threads(max(1, int(n)))
+        for b in batch_sizes:
+            # fewer runs for big batches so a slow model still finishes in bounded time
+            results.append({"threads": int(n), "batch_size": int(b), **time_batches(model, int(b), max(5, runs // b))})
+
+    return {
+        "load_ms": round(load_ms, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "model_rss_mb": round(_rss_mb() - rss_before, 1),
+        "p95_ms": results[0]["p95_ms"],
+        "results": results,
+    }
@@ -0,0 +1,157 @@
+"""
+Per-user token buckets for /api/infer, as a DRF throttle.
+
+Each user (or client IP when anonymous) gets INFER_RATE_LIMIT_PER_SEC frames
+per second with bursts up to INFER_RATE_LIMIT_BURST. Buckets live in this
+process by default. With INFER_RATE_LIMIT_SHM set to a file path (on tmpfs,
+e.g. /dev/shm/bsl-ratelimit), all workers on the host share one table of
+buckets in that mmap'd file instead, so the limit does not scale with the
+number of gunicorn workers.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .telemetry import THROTTLED
+
+
+def refill(tokens: float, last: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - last) * rate)
+
+
+class LocalBuckets:
+    """Token buckets in a bounded in-process LRU."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_keys = max(1, int(max_keys))
+        self._buckets = OrderedDict()  # key -> [tokens, last]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float = 1.0):
+        """
+        (allowed, seconds until the request would be allowed). A cost above the
+        burst is admitted on a full bucket and leaves it in debt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [self.burst, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+
+            b[0], b[1] = refill(b[0], b[1], now, self.rate, self.burst), now
+            need = min(cost, self.burst)
+            if b[0] >= need:
+                b[0] -= cost
+                return True, 0.0
+            return False, (need - b[0]) / self.rate
+
+
+class SharedBuckets:
+    """
+    Token buckets in a fixed table of `slots` entries in an mmap'd file,
+    shared by every process that opens the same path. A slot holds
+    (key hash, tokens, last refill); a key whose slot is held by another key
+    takes it over with a full bucket (rare with enough slots, and lenient).
+    CLOCK_MONOTONIC is system-wide, so timestamps compare across processes.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+
+    def __init__(self, path: str, rate: float, burst: float, slots: int = 8192):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.slots = max(1, int(slots))
+        self.path = path
+        self._pid = None
+        self._local = threading.Lock()
+
+    def _open(self):
+        # one mapping per process (a fork must not share the parent's fd offset/lock state)
+        if self._pid == os.getpid():
+            return
+        size = self.slots * self._SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def acquire(self, key: str, cost: float = 1.0):
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        offset = (h % self.slots) * self._SLOT.size
+        with self._local:
+            self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._SLOT.size, offset)
+            try:
+                now = time.monotonic()
+                owner, tokens, last = self._SLOT.unpack_from(self._map, offset)
+                if owner != h:
+                    tokens, last = self.burst, now
+                tokens = refill(tokens, last, now, self.rate, self.burst)
+                need = min(cost, self.burst)
+                allowed = tokens >= need
+                if allowed:
+                    tokens -= cost
+                self._SLOT.pack_into(self._map, offset, h, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._SLOT.size, offset)
+        return (True, 0.0) if allowed else (False, (need - tokens) / self.rate)
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    """Process-wide buckets, or None when INFER_RATE_LIMIT_PER_SEC is 0 (disabled)."""
+    global _buckets
+    rate = getattr(settings, "INFER_RATE_LIMIT_PER_SEC", 0)
+    if not rate:
+        return None
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                burst = getattr(settings, "INFER_RATE_LIMIT_BURST", 2 * rate)
+                path = getattr(settings, "INFER_RATE_LIMIT_SHM", "")
+                _buckets = SharedBuckets(path, rate, burst) if path else LocalBuckets(rate, burst)
+    return _buckets
+
+
+class InferenceRateThrottle(BaseThrottle):
+    """
+    Token bucket per user (client IP when anonymous); DRF answers 429 + Retry-After from wait().
+    A request costs one token, or view.throttle_cost(request) when the view defines it.
+    """
+
+    def get_key(self, request) -> str:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        buckets = get_buckets()
+        if buckets is None:
+            return True
+        cost = view.throttle_cost(request) if hasattr(view, "throttle_cost") else 1
+        allowed, self._wait = buckets.acquire(self.get_key(request), cost)
+        if not allowed:
+            THROTTLED.inc()
+        return allowed
+
+    def wait(self):
+        return getattr(self, "_wait", None)
@@ -0,0 +1,138 @@
+"""
+Compact /api/infer responses for high-rate clients, negotiated by DRF from
+`?format=bin|msgpack` or the Accept header (JSON stays the default).
+
+Instead of Bangla labels in nested dicts they carry the top-k class indices
+and float16 probabilities (optionally the full vector); clients map indices
+to labels with GET /api/infer/labels, cached by ETag ("labels_etag" below).
+
+Binary layout (little endian):
+    header  magic "BI", version u8, flags u8 (1 cached, 2 full vector, 4 stream),
+            k u8, pad u8, model_id i32 (-1: bundled weights), latency_ms u32,
+            labels_etag 8 bytes (the 16 hex digits)
+    top-k   k x u16 class index, then k x f16 probability   (k = 0: no hand in a roi=1 frame)
+    full    u16 C, then C x f16            (flag 2)
+    stream  u16 index, f16 confidence, u16 stable_frames, u8 committed, pad u8   (flag 4)
+"""
+import struct
+
+import torch
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # optional: without it only ?format=bin is offered
+    msgpack = None
+
+
+BINARY_MEDIA_TYPE = "application/vnd.bsl.infer+binary"
+BINARY_VERSION = 1
+
+_HEADER = struct.Struct("<2sBBBBiI8s")
+_STREAM = struct.Struct("<HeHBx")
+
+FLAG_CACHED, FLAG_FULL, FLAG_STREAM = 1, 2, 4
+
+
+def compact(out: dict, probs, k: int = 3, full: bool = False, labels_etag: str = "") -> dict:
+    """Reduce a predict_file() result (+ its probability vector) to indices and float16 probabilities."""
+    probs = torch.as_tensor(probs if probs is not None else [], dtype=torch.float32)
+    k = min(max(1, int(k)), probs.shape[0])
+    topv, topi = torch.topk(probs, k=k)
+
+    data = {
+        "model_id": out.get("model_id"),
+        "latency_ms": out.get("latency_ms", 0),
+        "cached": bool(out.get("cached")),
+        "labels_etag": labels_etag,
+        "indices": topi.tolist(),
+        "probs": topv.half().numpy().tobytes(),
+    }
+    if full and probs.numel():
+        data["full"] = probs.half().numpy().tobytes()
+    stream = out.get("stream")
+    if stream is not None:
+        data["stream"] = {
+            "index": stream["index"],
+            "confidence": stream["confidence"],
+            "stable_frames": stream["stable_frames"],
+            "committed": stream["committed"] is not None,
+        }
+    return data
+
+
+def pack_binary(data: dict) -> bytes:
+    k = len(data["indices"])
+    flags = (FLAG_CACHED if data["cached"] else 0) | (FLAG_FULL if "full" in data else 0) \
+        | (FLAG_STREAM if "stream" in data else 0)
+    model_id = data["model_id"] if data["model_id"] is not None else -1
+    parts = [
+        _HEADER.pack(b"BI", BINARY_VERSION, flags, k, 0, model_id, int(data["latency_ms"]),
+                     bytes.fromhex(data["labels_etag"] or "0" * 16)),
+        struct.pack(f"<{k}H", *data["indices"]),
+        data["probs"],
+    ]
+    if "full" in data:
+        parts.append(struct.pack("<H", len(data["full"]) // 2))
+        parts.append(data["full"])
+    if "stream" in data:
+        s = data["stream"]
+        parts.append(_STREAM.pack(s["index"], s["confidence"], min(s["stable_frames"], 0xFFFF), s["committed"]))
+    return b"".join(parts)
+
+
+def unpack_binary(raw: bytes) -> dict:
+    """Inverse of pack_binary (reference decoder for clients and tests)."""
+    magic, version, flags, k, _, model_id, latency_ms, etag = _HEADER.unpack_from(raw)
+    if magic != b"BI" or version != BINARY_VERSION:
+        raise ValueError("not a v1 compact inference response")
+    pos = _HEADER.size
+    indices = list(struct.unpack_from(f"<{k}H", raw, pos))
+    pos += 2 * k
+    probs = list(struct.unpack_from(f"<{k}e", raw, pos))
+    pos += 2 * k
+
+    data = {
+        "model_id": None if model_id < 0 else model_id,
+        "latency_ms": latency_ms,
+        "cached": bool(flags & FLAG_CACHED),
+        "labels_etag": etag.hex(),
+        "indices": indices,
+        "probs": probs,
+    }
+    if flags & FLAG_FULL:
+        (n,) = struct.unpack_from("<H", raw, pos)
+        data["full"] = list(struct.unpack_from(f"<{n}e", raw, pos + 2))
+        pos += 2 + 2 * n
+    if flags & FLAG_STREAM:
+        index, conf, stable, committed = _STREAM.unpack_from(raw, pos)
+        data["stream"] = {"index": index, "confidence": conf, "stable_frames": stable, "committed": bool(committed)}
+    return data
+
+
+class CompactBinaryRenderer(BaseRenderer):
+    media_type = BINARY_MEDIA_TYPE
+    format = "bin"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return pack_binary(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """The compact() dict as MessagePack; probabilities stay float16 byte strings."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return msgpack.packb(data, use_bin_type=True)
+
+
+COMPACT_RENDERERS = [CompactBinaryRenderer] + ([MessagePackRenderer] if msgpack is not None else [])
+
+
+def is_compact(renderer) -> bool:
+    return isinstance(renderer, (CompactBinaryRenderer, MessagePackRenderer))
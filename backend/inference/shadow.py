@@ -0,0 +1,307 @@
+"""
+Shadow evaluation of candidate models on live /api/infer traffic.
+
+A sampled fraction (INFER_SHADOW_SAMPLE_RATE) of the frames this process
+classifies is queued, as the preprocessed tensor plus the served top-1 class,
+for every enabled MLModel with shadow_enabled (never the active one). One
+thread per process batches the queue and runs each candidate on it:
+
+  - off the request path: offer() only appends to a bounded queue, and new
+    frames are dropped (not waited for) when the thread falls behind
+  - low priority: the thread renices itself (Linux nice is per thread and
+    inherited by the OpenMP workers it starts), so serving threads win the CPU
+  - batched: up to INFER_SHADOW_BATCH_SIZE frames per forward pass
+
+Per (candidate, served model) it keeps top-1 / top-3 agreement with the served
+answer and latency histograms (inference.metrics.Histogram), which the event
+flusher appends to ShadowMetrics rows per hour. Frames served from the
+prediction cache are not shadowed. Shadowing happens wherever the forward
+pass runs: in each web worker, or, with INFER_POOL_SOCKET, in each inference
+pool worker (the web workers then hold no candidates). Every process that
+shadows holds its own copy of every candidate's weights.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import torch
+import torch.nn.functional as F
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import CONFIDENCE_BOUNDS, LATENCY_BOUNDS, QUANTILES, Histogram
+from .model_manager import load_model, warm_up
+from .telemetry import SHADOW_FRAMES
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowStats:
+    """One candidate against one served model."""
+
+    def __init__(self):
+        self.frames = 0
+        self.agree = 0
+        self.agree_top3 = 0  # served top-1 within the candidate's top 3
+        self.frame_ms = Histogram(LATENCY_BOUNDS)  # batch forward time / frames in the batch
+        self.batch_ms = Histogram(LATENCY_BOUNDS)
+        self.confidence = Histogram(CONFIDENCE_BOUNDS)
+
+    def to_json(self) -> dict:
+        return {
+            "frames": self.frames,
+            "agree": self.agree,
+            "agree_top3": self.agree_top3,
+            "frame_ms": self.frame_ms.to_json(),
+            "batch_ms": self.batch_ms.to_json(),
+            "confidence": self.confidence.to_json(),
+        }
+
+    def merge_json(self, data: dict):
+        self.frames += data.get("frames", 0)
+        self.agree += data.get("agree", 0)
+        self.agree_top3 += data.get("agree_top3", 0)
+        self.frame_ms.merge_json(data.get("frame_ms", {}))
+        self.batch_ms.merge_json(data.get("batch_ms", {}))
+        self.confidence.merge_json(data.get("confidence", {}))
+
+    def summary(self) -> dict:
+        def pcts(h):
+            out = {f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}
+            out["mean"] = round(h.total / h.n, 3) if h.n else None
+            return out
+
+        return {
+            "frames": self.frames,
+            "agreement": round(self.agree / self.frames, 4) if self.frames else None,
+            "agreement_top3": round(self.agree_top3 / self.frames, 4) if self.frames else None,
+            "latency_ms": {"frame": pcts(self.frame_ms), "batch": pcts(self.batch_ms)},
+            "confidence": pcts(self.confidence),
+        }
+
+
+class ShadowRunner:
+    """
+    Queue + low-priority thread that runs the candidates from `resolve()`
+    (-> [ModelSpec], re-read every `poll_seconds`) on sampled frames.
+    """
+
+    def __init__(self, resolve, num_classes: int, batch_size: int = 16, max_wait_ms: float = 50.0,
+                 max_queue: int = 32, poll_seconds: float = 10.0, flush_seconds: float = 60.0, nice: int = 19):
+        self.resolve = resolve
+        self.num_classes = num_classes
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.max_queue = max(1, int(max_queue))
+        self.poll_seconds = float(poll_seconds)
+        self.flush_seconds = float(flush_seconds)
+        self.nice = int(nice)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._candidates = {}  # spec.key -> (spec, model)
+        self._failed = set()
+        self._stats = {}  # (candidate id, served model id) -> ShadowStats
+        self._stats_lock = threading.Lock()
+        self._next_poll = 0.0
+        self._last_flush = time.monotonic()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+        self._thread.start()
+
+    @property
+    def has_candidates(self) -> bool:
+        return bool(self._candidates)
+
+    def offer(self, x: torch.Tensor, served_index: int, served_model_id) -> bool:
+        """Queue one preprocessed frame [3, H, W]; False (dropped) when the queue is full."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                SHADOW_FRAMES.inc("dropped")
+                return False
+            self._queue.append((x, served_index, served_model_id))
+            self._cond.notify()
+        SHADOW_FRAMES.inc("queued")
+        return True
+
+    # ---- shadow thread ----
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError):
+            logger.warning("could not lower the shadow thread's priority")
+
+        while True:
+            try:
+                if time.monotonic() >= self._next_poll:
+                    self._refresh()
+                batch = self._take()
+                if batch:
+                    self._evaluate(batch)
+            except Exception:
+                logger.exception("shadow evaluation failed")
+                time.sleep(1.0)
+
+    def _take(self):
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout=self.poll_seconds)
+            deadline = time.monotonic() + self.max_wait
+            while self._queue and len(self._queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            return [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+    def _refresh(self):
+        self._next_poll = time.monotonic() + self.poll_seconds
+        specs = [s for s in self.resolve() if s.key not in self._failed]
+        loaded = {}
+        for spec in specs:
+            entry = self._candidates.get(spec.key)
+            if entry is None:
+                try:
+                    model = load_model(spec.arch, spec.path, self.num_classes)
+                    warm_up(model)
+                except Exception:
+                    self._failed.add(spec.key)
+                    logger.exception("failed to load shadow candidate %s (%s)", spec.model_id, spec.path)
+                    continue
+                entry = (spec, model)
+                logger.info("shadowing model %s [%s]", spec.model_id, spec.arch)
+            loaded[spec.key] = entry
+        self._candidates = loaded
+        if not loaded:
+            with self._cond:
+                self._queue.clear()
+
+    def _evaluate(self, batch):
+        x = torch.stack([item[0] for item in batch])
+        served = torch.tensor([item[1] for item in batch])
+        for spec, model in list(self._candidates.values()):
+            t0 = time.perf_counter()
+            with torch.inference_mode():
+                probs = F.softmax(model(x), dim=1)
+            batch_ms = (time.perf_counter() - t0) * 1000
+
+            conf, top1 = probs.max(dim=1)
+            top3 = torch.topk(probs, k=min(3, probs.shape[1]), dim=1).indices
+            agree = (top1 == served).tolist()
+            agree3 = (top3 == served.unsqueeze(1)).any(dim=1).tolist()
+
+            with self._stats_lock:
+                for row, (_, _, served_model_id) in enumerate(batch):
+                    st = self._stats.get((spec.model_id, served_model_id))
+                    if st is None:
+                        st = self._stats[(spec.model_id, served_model_id)] = ShadowStats()
+                    st.frames += 1
+                    st.agree += int(agree[row])
+                    st.agree_top3 += int(agree3[row])
+                    st.frame_ms.add(batch_ms / len(batch))
+                    st.confidence.add(float(conf[row]))
+                seen = set(served_model_id for (_, _, served_model_id) in batch)
+                for served_model_id in seen:
+                    self._stats[(spec.model_id, served_model_id)].batch_ms.add(batch_ms)
+
+    def drain(self) -> dict:
+        with self._stats_lock:
+            stats, self._stats = self._stats, {}
+            self._last_flush = time.monotonic()
+        return stats
+
+    def flush(self, force: bool = False):
+        if not force and time.monotonic() - self._last_flush < self.flush_seconds:
+            return
+        stats = self.drain()
+        if stats:
+            write(stats)
+
+
+def write(stats: dict):
+    """
+    Append one ShadowMetrics row per (candidate, served model) for the current
+    hour. Rows of a deleted candidate are dropped; a deleted served model
+    becomes None.
+    """
+    from api.models import MLModel, ShadowMetrics
+
+    from .events import existing_ids
+
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    close_old_connections()
+    try:
+        live = existing_ids(MLModel, {i for pair in stats for i in pair})
+        ShadowMetrics.objects.bulk_create([
+            ShadowMetrics(model_id=model_id, served_model_id=served_id if served_id in live else None,
+                          bucket_start=hour, data=st.to_json())
+            for (model_id, served_id), st in stats.items() if model_id in live
+        ])
+    finally:
+        close_old_connections()
+
+
+def read(since, model_id=None) -> dict:
+    """{(candidate id, served model id): merged ShadowStats} since `since`."""
+    from api.models import ShadowMetrics
+
+    rows = ShadowMetrics.objects.filter(bucket_start__gte=since)
+    if model_id is not None:
+        rows = rows.filter(model_id=model_id)
+    merged = {}
+    for model_id, served_id, data in rows.values_list("model_id", "served_model_id", "data"):
+        merged.setdefault((model_id, served_id), ShadowStats()).merge_json(data)
+    return merged
+
+
+_runner = None
+_runner_pid = None
+_runner_lock = threading.Lock()
+
+
+def get_runner(resolve, num_classes: int):
+    """Process-wide ShadowRunner, or None when INFER_SHADOW_SAMPLE_RATE is 0 (disabled)."""
+    global _runner, _runner_pid
+    if not getattr(settings, "INFER_SHADOW_SAMPLE_RATE", 0):
+        return None
+    if _runner is None or _runner_pid != os.getpid():
+        with _runner_lock:
+            if _runner is None or _runner_pid != os.getpid():
+                from .events import get_event_buffer
+
+                runner = ShadowRunner(
+                    resolve,
+                    num_classes,
+                    batch_size=getattr(settings, "INFER_SHADOW_BATCH_SIZE", 16),
+                    max_wait_ms=getattr(settings, "INFER_SHADOW_MAX_WAIT_MS", 50.0),
+                    max_queue=getattr(settings, "INFER_SHADOW_QUEUE_MAX", 32),
+                    poll_seconds=getattr(settings, "INFER_SHADOW_POLL_SECONDS", 10.0),
+                    flush_seconds=getattr(settings, "INFER_METRICS_FLUSH_SECONDS", 60),
+                )
+                runner.start()
+                _runner, _runner_pid = runner, os.getpid()
+                get_event_buffer().add_hook(_flush_hook)
+    return _runner
+
+
+def _flush_hook(force: bool = False):
+    if _runner is not None and _runner_pid == os.getpid():
+        _runner.flush(force)
+
+
+def maybe_offer(resolve, num_classes: int, x: torch.Tensor, probs: torch.Tensor, served_model_id) -> bool:
+    """Sample this frame for shadow evaluation (cheap no-op when disabled or without candidates)."""
+    rate = getattr(settings, "INFER_SHADOW_SAMPLE_RATE", 0)
+    if not rate or random.random() >= rate:
+        return False
+    runner = get_runner(resolve, num_classes)
+    if runner is None or not runner.has_candidates:
+        return False
+    return runner.offer(x, int(probs.argmax()), served_model_id)
@@ -0,0 +1,288 @@
+import fcntl
+import hashlib
+import mmap
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+
+
+class StreamState:
+    """
+    Temporal smoothing for one continuous signing stream.
+
+    Keeps an exponential moving average over the per-frame softmax vectors.
+    A character is committed once the smoothed top-1 has stayed the same for
+    `stable_frames` consecutive frames with confidence >= `min_confidence`;
+    it is not committed again until the smoothed top-1 changes, so holding a
+    sign produces one character, not a stream of repeats.
+
+    Read or update it only inside `with state.session():`, which serializes
+    concurrent requests for the same stream (and, for states kept in a
+    SharedStreamTable, loads and stores it around the block).
+    """
+
+    def __init__(self, alpha: float = 0.5, stable_frames: int = 4, min_confidence: float = 0.5, max_text: int = 64):
+        self.alpha = float(alpha)
+        self.stable_frames = max(1, int(stable_frames))
+        self.min_confidence = float(min_confidence)
+        self.max_text = int(max_text)
+        self.shared = None  # (SharedStreamTable, key hash), set by StreamSessions
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.ema = None
+        self.candidate = None  # smoothed top-1 index
+        self.run = 0  # consecutive frames with that top-1
+        self.committed_run = False  # already committed during this run
+        self.text = ""
+        self.frames = 0
+        self.touched = time.monotonic()
+        self.hand_track = None  # inference.hands.Track, for clients sending full frames
+
+    @contextmanager
+    def session(self):
+        with self._lock:
+            if self.shared is None:
+                yield self
+                return
+            table, ident = self.shared
+            with table.slot(ident) as (offset, found):
+                if offset is None:  # no free slot near this key: this process's state only
+                    yield self
+                    return
+                if found:
+                    table.load(self, offset)
+                try:
+                    yield self
+                finally:
+                    table.store(self, ident, offset)
+
+    def update(self, probs: torch.Tensor, label_of) -> dict:
+        self.frames += 1
+        self.touched = time.monotonic()
+
+        probs = probs.detach().float()
+        if self.ema is None or self.ema.shape != probs.shape:
+            self.ema = probs.clone()
+        else:
+            self.ema.mul_(1.0 - self.alpha).add_(probs, alpha=self.alpha)
+
+        conf, idx = torch.max(self.ema, dim=0)
+        idx, conf = int(idx), float(conf)
+
+        if idx == self.candidate:
+            self.run += 1
+        else:
+            self.candidate, self.run, self.committed_run = idx, 1, False
+
+        committed = None
+        if not self.committed_run and self.run >= self.stable_frames and conf >= self.min_confidence:
+            committed = label_of(idx)
+            self.committed_run = True
+            self.text = (self.text + committed)[-self.max_text:]
+
+        return {
+            "label": label_of(idx),
+            "index": idx,
+            "confidence": conf,
+            "stable_frames": self.run,
+            "committed": committed,
+            "text": self.text,
+        }
+
+
+class SharedStreamTable:
+    """
+    StreamState for every worker on the host in a fixed table of `slots`
+    entries in an mmap'd file (same scheme as ratelimit.SharedBuckets): a slot
+    holds the session key, the EMA vector, run / commit state, text and the
+    tracked hand box.
+
+    A key lives in the first matching, free or expired slot of a window of
+    `probe` slots starting at its hash (open addressing), so colliding live
+    sessions sit side by side instead of resetting each other. The whole
+    window is locked for the lookup: fcntl.lockf on the byte range across
+    processes, plus a threading.Lock per slot within this process (lockf
+    does not exclude threads of the same process). When every slot of the
+    window holds a live session, the new one keeps its state in its own
+    process (see StreamState.session) rather than evicting anyone. The
+    previous frame kept for hand motion scoring stays in the process that
+    saw it.
+    """
+
+    # key hash, touched, frames, candidate (-1: none), run, committed_run, has track,
+    # has box, box (4), track age, ema length, text bytes, key bytes
+    _HEAD = struct.Struct("<QdIiI???x4dIHHH")
+    KEY_BYTES = 128
+
+    _thread_locks = {}  # path -> [threading.Lock per slot], shared by every table on that file
+    _thread_locks_lock = threading.Lock()
+
+    def __init__(self, path: str, ttl_seconds: float = 120.0, slots: int = 4096,
+                 max_classes: int = 256, max_text: int = 64, probe: int = 8):
+        self.path = path
+        self.ttl = float(ttl_seconds)
+        self.slots = max(1, int(slots))
+        self.probe = max(1, min(int(probe), self.slots))
+        self.max_classes = int(max_classes)
+        self.text_bytes = 4 * int(max_text)
+        self.slot_size = self._HEAD.size + self.KEY_BYTES + 4 * self.max_classes + self.text_bytes
+        self._pid = None
+        self._open_lock = threading.Lock()
+        with self._thread_locks_lock:
+            locks = self._thread_locks.get(path)
+            if locks is None or len(locks) < self.slots:
+                locks = self._thread_locks[path] = [threading.Lock() for _ in range(self.slots)]
+        self._locks = locks
+
+    def _open(self):
+        # one mapping per process (a fork must not share the parent's fd offset/lock state)
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+            size = self.slots * self.slot_size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd = fd
+            self._map = mmap.mmap(fd, size)
+            self._pid = os.getpid()
+
+    @classmethod
+    def key_id(cls, key):
+        """(hash, key bytes) identifying a session in the table."""
+        raw = repr(key).encode()
+        if len(raw) > cls.KEY_BYTES:
+            raw = hashlib.blake2b(raw, digest_size=32).digest()
+        h = int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little") or 1
+        return h, raw
+
+    def _find(self, ident, first: int, now: float):
+        """(offset, found) for `ident` in the window, or (None, False) when all of it is live."""
+        h, raw = ident
+        free = None
+        for i in range(first, first + self.probe):
+            offset = i * self.slot_size
+            head = self._HEAD.unpack_from(self._map, offset)
+            owner, touched, key_len = head[0], head[1], head[-1]
+            live = owner != 0 and now - touched <= self.ttl
+            if live and owner == h and bytes(self._map[offset + self._HEAD.size:offset + self._HEAD.size + key_len]) == raw:
+                return offset, True
+            if not live and free is None:
+                free = offset
+        return free, False
+
+    @contextmanager
+    def slot(self, ident):
+        """Lock the key's window; yields (offset, found) with (None, False) when the window is full."""
+        self._open()
+        first = ident[0] % (self.slots - self.probe + 1)  # windows never wrap
+        locks = self._locks[first:first + self.probe]
+        for lock in locks:  # always in ascending order, as are overlapping windows
+            lock.acquire()
+        try:
+            length, start = self.probe * self.slot_size, first * self.slot_size
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield self._find(ident, first, time.monotonic())
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def load(self, state: StreamState, offset: int):
+        (_, touched, frames, candidate, run, committed_run, has_track, has_box,
+         x0, y0, x1, y1, age, n, text_len, _) = self._HEAD.unpack_from(self._map, offset)
+
+        if frames != state.frames and state.hand_track is not None:
+            state.hand_track.prev = None  # another worker saw the frames in between
+        state.frames, state.touched = frames, touched
+        state.candidate = None if candidate < 0 else candidate
+        state.run, state.committed_run = run, committed_run
+
+        start = offset + self._HEAD.size + self.KEY_BYTES
+        state.ema = torch.from_numpy(np.frombuffer(self._map, np.float32, n, start).copy()) if n else None
+        start += 4 * self.max_classes
+        state.text = bytes(self._map[start:start + text_len]).decode("utf-8", "ignore")
+
+        if not has_track:
+            state.hand_track = None
+            return
+        if state.hand_track is None:
+            from .hands import Track
+
+            state.hand_track = Track()
+        state.hand_track.box = (x0, y0, x1, y1) if has_box else None
+        state.hand_track.age = age
+
+    def store(self, state: StreamState, ident, offset: int):
+        h, raw = ident
+        ema = state.ema
+        if ema is not None and ema.numel() > self.max_classes:
+            ema = None  # more classes than the slot holds: keep the rest of the state
+        text = state.text.encode("utf-8")[:self.text_bytes]
+        track = state.hand_track
+        box = track.box if track is not None and track.box is not None else None
+        self._HEAD.pack_into(
+            self._map, offset, h, state.touched, state.frames,
+            -1 if state.candidate is None else state.candidate, state.run, state.committed_run,
+            track is not None, box is not None, *(box or (math.nan,) * 4),
+            track.age if track is not None else 0, 0 if ema is None else ema.numel(), len(text), len(raw),
+        )
+        start = offset + self._HEAD.size
+        self._map[start:start + len(raw)] = raw
+        start += self.KEY_BYTES
+        if ema is not None:
+            self._map[start:start + 4 * ema.numel()] = ema.numpy().astype(np.float32).tobytes()
+        start += 4 * self.max_classes
+        self._map[start:start + len(text)] = text
+
+
+class StreamSessions:
+    """
+    Bounded, TTL-evicted store of StreamState per (user id, client session id).
+
+    By default state lives in this process only. With `shm` (a file path on
+    tmpfs) the states live in a SharedStreamTable instead, so successive
+    HTTP frames of one session may land on any worker of the host. The
+    WebSocket keeps its own state per connection either way.
+    """
+
+    def __init__(self, factory, ttl_seconds: float = 120.0, max_sessions: int = 10000, shm: str = "",
+                 slots: int = 4096):
+        self.factory = factory
+        self.ttl = float(ttl_seconds)
+        self.max_sessions = max(1, int(max_sessions))
+        self.table = SharedStreamTable(shm, ttl_seconds=ttl_seconds, slots=slots) if shm else None
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> StreamState:
+        now = time.monotonic()
+        with self._lock:
+            # expire idle sessions from the LRU end
+            while self._states:
+                old_key, old = next(iter(self._states.items()))
+                if now - old.touched <= self.ttl and len(self._states) < self.max_sessions:
+                    break
+                del self._states[old_key]
+
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = self.factory()
+                if self.table is not None:
+                    state.shared = (self.table, self.table.key_id(key))
+            self._states.move_to_end(key)
+            return state
+
+    def __len__(self):
+        return len(self._states)
@@ -0,0 +1,434 @@
+"""
+Prometheus text-format telemetry (served at /metrics, see api/views.py).
+
+Counters and histograms are sharded per thread: a thread only ever writes its
+own dict, so the hot path takes no lock (the registry lock is taken once per
+thread, on its first observation). Shards are summed at scrape time. Gauges
+are callbacks evaluated at scrape time.
+
+Each process only sees its own numbers. With INFER_TELEMETRY_DIR set, every
+process (web workers, the WebSocket server, the inference pool and its
+workers) also spools its samples to <dir>/<host>-<pid>.json from the event
+flusher thread, and /metrics merges all files: counters and histograms are
+summed, gauges get `host` and `pid` labels and are dropped once their process
+is gone. Share the directory between containers to see the pool's queue,
+batches, model loads and cache from the web side.
+
+Files of dead processes (pid gone on this host, or not rewritten for a few
+spool intervals on another) are folded into <dir>/_folded.json by the next
+scrape and deleted, so counters stay monotonic and the directory doesn't
+grow with every worker recycle.
+"""
+import fcntl
+import json
+import os
+import resource
+import socket
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        REGISTRY.register(self)
+
+
+class _Sharded(_Metric):
+    def __init__(self, name, doc, labels=()):
+        super().__init__(name, doc, labels)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                merged[key] = self._add(merged.get(key), value)
+        return merged
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    @staticmethod
+    def _add(a, b):
+        return b if a is None else a + b
+
+    def samples(self):
+        return [(self.name, dict(zip(self.labels, key)), v) for key, v in self._merged().items()]
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (len(self.buckets) + 2)  # per-bucket counts, +Inf, sum
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                row[i] += 1
+                break
+        else:
+            row[-2] += 1
+        row[-1] += value
+
+    @staticmethod
+    def _add(a, b):
+        return list(b) if a is None else [x + y for (x, y) in zip(a, b)]
+
+    def samples(self):
+        out = []
+        for key, row in self._merged().items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for b, c in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += c
+                out.append((self.name + "_bucket", {**labels, "le": _fmt(b)}, cumulative))
+            out.append((self.name + "_count", labels, cumulative))
+            out.append((self.name + "_sum", labels, row[-1]))
+        return out
+
+
+class Gauge(_Metric):
+    """Evaluated at scrape time: `fn()` returns a number or [(label values tuple, number)]."""
+    kind = "gauge"
+
+    def __init__(self, name, doc, fn, labels=()):
+        super().__init__(name, doc, labels)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, (int, float)):
+            return [(self.name, {}, value)]
+        return [(self.name, dict(zip(self.labels, key)), v) for key, v in value if v is not None]
+
+
+class CounterFunc(Gauge):
+    """A monotonic total owned by someone else (e.g. PredictionCache.stats()), read at scrape time."""
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def collect(self):
+        """[(name, kind, doc, [(sample name, labels, value)])] for this process."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return [(m.name, m.kind, m.doc, m.samples()) for m in metrics]
+
+
+REGISTRY = Registry()
+
+
+# ---- exposition ----
+def _fmt(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_HOST = socket.gethostname()
+
+
+_FOLDED = "_folded.json"
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fold(directory: Path, dead):
+    """Add the counters / histograms of dead processes' files to _folded.json and delete the files."""
+    with open(directory / ".fold.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # concurrent scrapes must not fold a file twice
+        folded_path = directory / _FOLDED
+        try:
+            folded = {name: (kind, doc, {(sample, json.dumps(labels, sort_keys=True)): value
+                                         for sample, labels, value in rows})
+                      for name, kind, doc, rows in _read(folded_path)}
+        except (OSError, ValueError):
+            folded = {}
+        for path in dead:
+            try:
+                coll = _read(path)
+            except (OSError, ValueError):
+                continue  # already folded by another scrape
+            for name, kind, doc, rows in coll:
+                if kind == "gauge":
+                    continue
+                _, _, acc = folded.setdefault(name, (kind, doc, {}))
+                for sample, labels, value in rows:
+                    key = (sample, json.dumps(labels, sort_keys=True))
+                    acc[key] = acc.get(key, 0) + value
+        out = [(name, kind, doc, [(sample, json.loads(labels), value) for (sample, labels), value in acc.items()])
+               for name, (kind, doc, acc) in folded.items()]
+        tmp = folded_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(out, f)
+        os.replace(tmp, folded_path)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+
+def _spooled():
+    """Collections of *other* processes from INFER_TELEMETRY_DIR: [(host, pid, alive, collection)]."""
+    directory = getattr(settings, "INFER_TELEMETRY_DIR", "")
+    if not directory:
+        return []
+    directory = Path(directory)
+    # a process in another container can't be signalled: it's alive while it keeps spooling
+    stale = max(30.0, 6 * getattr(settings, "INFER_TELEMETRY_SPOOL_SECONDS", 5))
+    out, dead = [], []
+    for path in directory.glob("*.json"):
+        if path.name == _FOLDED:
+            continue
+        try:
+            host, _, pid = path.stem.rpartition("-")
+            host, pid = host or _HOST, int(pid)
+            if host == _HOST and pid == os.getpid():
+                continue
+            if _pid_alive(pid) if host == _HOST else time.time() - path.stat().st_mtime < stale:
+                out.append((host, pid, True, _read(path)))
+            else:
+                dead.append(path)
+        except (ValueError, OSError):
+            continue
+    if dead:
+        try:
+            _fold(directory, dead)
+        except OSError:
+            pass  # read-only or vanished directory: try again next scrape
+    try:
+        out.append(("", 0, False, _read(directory / _FOLDED)))
+    except (OSError, ValueError):
+        pass
+    return out
+
+
+def render() -> str:
+    """This process's metrics merged with the spooled ones, in Prometheus text format 0.0.4."""
+    own = REGISTRY.collect()
+    others = _spooled()
+    multi = bool(getattr(settings, "INFER_TELEMETRY_DIR", ""))
+
+    others = [(host, pid, alive, {c[0]: c[3] for c in coll}) for (host, pid, alive, coll) in others]
+
+    lines = []
+    for name, kind, doc, samples in own:
+        merged = {}  # (sample name, sorted labels) -> value
+        sources = [(_HOST, os.getpid(), True, samples)] + [
+            (host, pid, alive, by_name[name]) for (host, pid, alive, by_name) in others if name in by_name
+        ]
+        for host, pid, alive, rows in sources:
+            for sample, labels, value in rows:
+                if kind == "gauge":
+                    if not alive:
+                        continue
+                    if multi:
+                        labels = {**labels, "host": host, "pid": str(pid)}
+                key = (sample, tuple(sorted(labels.items())))
+                merged[key] = merged.get(key, 0) + value
+
+        lines.append(f"# HELP {name} {doc}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (sample, labels), value in merged.items():
+            if labels:
+                body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{sample}{{{body}}} {_fmt(value)}")
+            else:
+                lines.append(f"{sample} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_last_spool = 0.0
+
+
+def spool(force: bool = False):
+    """Write this process's collection to INFER_TELEMETRY_DIR (event flusher hook)."""
+    global _last_spool
+    directory = getattr(settings, "INFER_TELEMETRY_DIR", "")
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_spool < getattr(settings, "INFER_TELEMETRY_SPOOL_SECONDS", 5):
+        return
+    _last_spool = now
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    path = Path(directory) / f"{_HOST}-{os.getpid()}.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.collect(), f)
+    os.replace(tmp, path)
+
+
+def enable_spool():
+    """Spool this process from its event flusher thread (call once per process, after fork)."""
+    if getattr(settings, "INFER_TELEMETRY_DIR", ""):
+        from .events import get_event_buffer
+
+        get_event_buffer().add_hook(spool)
+
+
+# ---- process-level gauges ----
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system
+
+
+def _torch_threads():
+    import torch
+
+    return [(("intra_op",), torch.get_num_threads()), (("inter_op",), torch.get_num_interop_threads())]
+
+
+Gauge("process_resident_memory_bytes", "Resident set size of the process.", _rss_bytes)
+CounterFunc("process_cpu_seconds_total", "User + system CPU time of the process.", _cpu_seconds)
+Gauge("bsl_torch_threads", "Torch thread pool sizes (compare with rate(process_cpu_seconds_total)).",
+      _torch_threads, labels=("pool",))
+
+
+# ---- request / auth / db ----
+HTTP_REQUESTS = Counter("bsl_http_requests_total", "HTTP requests by view and status.", ("view", "method", "status"))
+HTTP_SECONDS = Histogram("bsl_http_request_duration_seconds", "Request wall time by view.", ("view",))
+DB_SECONDS = Histogram("bsl_db_time_per_request_seconds", "Time spent in SQL per request, by view.", ("view",))
+DB_QUERIES = Counter("bsl_db_queries_total", "SQL queries executed, by view.", ("view",))
+AUTH_SECONDS = Histogram("bsl_auth_duration_seconds", "CookieJWTAuthentication.authenticate time.", ("result",),
+                         buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+AUTH_USER_CACHE = Counter("bsl_auth_user_cache_total", "InferenceJWTAuthentication user lookups.", ("result",))
+THROTTLED = Counter("bsl_throttled_total", "Requests rejected with 429 by InferenceRateThrottle.")
+
+# ---- inference ----
+INFERENCES = Counter("bsl_inferences_total", "Predictions served, by cache outcome (miss|exact|similar|off).", ("cache",))
+STAGE_SECONDS = Histogram("bsl_inference_stage_seconds", "Per-frame time by pipeline stage.", ("stage",))
+ROI_FRAMES = Counter("bsl_roi_frames_total", "Full frames by server-side hand ROI outcome (tracked|detected|none).",
+                     ("result",))
+CASCADE_FRAMES = Counter("bsl_cascade_frames_total",
+                         "Frames per cascade stage (0 = cheapest) by outcome (accepted|escalated|final).",
+                         ("stage", "outcome"))
+BATCH_SIZE = Histogram("bsl_batch_size", "Images per micro-batched forward pass.",
+                       buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64))
+MODEL_LOADS = Counter("bsl_model_loads_total", "Model loads by backend and outcome.", ("backend", "outcome"))
+MODEL_LOAD_SECONDS = Histogram("bsl_model_load_seconds", "Model load + warm-up time.",
+                               buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+MODEL_SWAPS = Counter("bsl_model_swaps_total", "Times the served model changed.")
+SHADOW_FRAMES = Counter("bsl_shadow_frames_total", "Sampled frames for shadow evaluation (queued|dropped).",
+                        ("outcome",))
+
+
+def _queue_depth():
+    from . import predictor
+
+    return predictor._batcher.qsize() if predictor._batcher is not None else None
+
+
+def _cache_stat(field):
+    def read():
+        from . import predictor
+
+        return predictor._cache.stats()[field] if predictor._cache is not None else None
+    return read
+
+
+def _pool_stat(field):
+    def read():
+        from . import pool
+
+        return pool._active.health()[field] if pool._active is not None else None
+    return read
+
+
+def _events_stat(field):
+    def read():
+        from . import events
+
+        return events._buffer.stats()[field] if events._buffer is not None else None
+    return read
+
+
+Gauge("bsl_inference_queue_depth", "Frames waiting for the micro-batcher.", _queue_depth)
+CounterFunc("bsl_cache_hits_exact_total", "Prediction cache hits on identical bytes.", _cache_stat("hits_exact"))
+CounterFunc("bsl_cache_hits_similar_total", "Prediction cache hits on near-identical frames.", _cache_stat("hits_similar"))
+CounterFunc("bsl_cache_misses_total", "Prediction cache misses.", _cache_stat("misses"))
+CounterFunc("bsl_cache_evictions_total", "Prediction cache LRU evictions.", _cache_stat("evictions"))
+Gauge("bsl_cache_entries", "Prediction cache size.", _cache_stat("size"))
+Gauge("bsl_pool_queue_depth", "Requests waiting for an inference pool worker.", _pool_stat("queue_depth"))
+Gauge("bsl_pool_in_flight", "Requests submitted to the inference pool and not answered yet.", _pool_stat("in_flight"))
+Gauge("bsl_pool_workers_ready", "Inference pool workers with a loaded model.", _pool_stat("ready"))
+CounterFunc("bsl_pool_rejected_total", "Requests the inference pool shed because its queue was full.",
+            _pool_stat("rejected"))
+CounterFunc("bsl_pool_timeouts_total", "Inference pool requests that missed their deadline.", _pool_stat("timeouts"))
+CounterFunc("bsl_pool_restarts_total", "Inference pool workers restarted after exiting.", _pool_stat("restarts"))
+Gauge("bsl_event_queue_depth", "InferenceEvents waiting to be written.", _events_stat("queued"))
+CounterFunc("bsl_events_dropped_total", "InferenceEvents dropped because the buffer was full.", _events_stat("dropped"))
+CounterFunc("bsl_events_failed_total", "InferenceEvents lost to failed writes.", _events_stat("failed"))
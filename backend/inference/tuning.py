@@ -0,0 +1,109 @@
+"""
+Host-specific serving layout measured by `manage.py autotune`.
+
+The tuning file (INFER_TUNING_FILE, default backend/tuning.json) holds the
+best worker count, torch threads per worker, micro-batch size and one CPU set
+per worker, found by benchmarking the served model on this host. It is read
+at boot by config/gunicorn.conf.py (workers, threads, pinning),
+run_inference_pool (same, for the pool processes) and the micro-batcher
+(batch size). Explicit env vars always win over it, and a file tuned for a
+different set of CPUs is ignored.
+
+Standard library only: gunicorn.conf.py imports this before Django is set up.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "tuning.json"
+VERSION = 1
+
+
+def tuning_path() -> Path:
+    return Path(os.getenv("INFER_TUNING_FILE", "") or DEFAULT_PATH)
+
+
+def available_cpus() -> list:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def _topology_key(cpu: int):
+    base = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology")
+    try:
+        return (int((base / "physical_package_id").read_text()), int((base / "core_id").read_text()), cpu)
+    except (OSError, ValueError):
+        return (0, cpu, cpu)
+
+
+def cpu_sets(cpus, workers: int, threads: int) -> list:
+    """
+    `workers` CPU sets of `threads` CPUs each, ordered by (socket, core) so a
+    set keeps SMT siblings and nearby cores together. With more workers x
+    threads than CPUs, sets wrap around and overlap.
+    """
+    ordered = sorted(cpus, key=_topology_key)
+    n = len(ordered)
+    return [sorted(ordered[(w * threads + t) % n] for t in range(min(threads, n))) for w in range(workers)]
+
+
+_cached = (None, None)  # ((path, mtime), config)
+
+
+def load(path=None) -> dict:
+    """The tuned "config" dict, or {} when there is no usable file for this host."""
+    global _cached
+    path = Path(path or tuning_path())
+    try:
+        key = (str(path), path.stat().st_mtime_ns)
+    except OSError:
+        return {}
+    if _cached[0] == key:
+        return _cached[1]
+
+    config = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != VERSION:
+            logger.warning("ignoring %s: unknown tuning file version %r", path, data.get("version"))
+        elif sorted(data.get("host", {}).get("cpus", [])) != available_cpus():
+            logger.warning("ignoring %s: tuned for other CPUs; rerun `manage.py autotune`", path)
+        else:
+            config = data.get("config", {})
+    except (OSError, ValueError):
+        logger.exception("could not read tuning file %s", path)
+    _cached = (key, config)
+    return config
+
+
+def save(data: dict, path=None) -> Path:
+    path = Path(path or tuning_path())
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, **data}, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def affinity():
+    """The tuned CPU set per worker, or None (untuned, or INFER_CPU_AFFINITY=0)."""
+    if os.getenv("INFER_CPU_AFFINITY", "1") == "0":
+        return None
+    return load().get("affinity") or None
+
+
+def pin(slot: int):
+    """Pin this process to CPU set `slot` of the tuned layout; returns the CPUs, or None."""
+    sets = affinity()
+    if not sets:
+        return None
+    cpus = sets[slot % len(sets)]
+    os.sched_setaffinity(0, cpus)
+    return cpus
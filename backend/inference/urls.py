@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import InferView
+from .views import InferBatchView, InferView
 
 urlpatterns = [
     path("infer", InferView.as_view(), name="infer"),
+    path("infer/batch", InferBatchView.as_view(), name="infer-batch"),
 ]
@@ -1,14 +1,65 @@
+from contextlib import nullcontext
+
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework import status
-from PIL import Image
-import io
 
-from .predictor import predict_pil
+from api.authentication import InferenceJWTAuthentication
+
+from .archives import archive_count
+from .batcher import BatcherTimeout
+from .events import record_inference
+from .pool import PoolError, PoolInvalid, PoolOverloaded, PoolTimeout
+from .predictor import label_map, new_stream, predict_file, predict_frame, predict_uploads
+from .preprocess import InvalidImage
+from .ratelimit import InferenceRateThrottle
+from .renderers import COMPACT_RENDERERS, compact, is_compact
+from .stream import StreamSessions
+
+
+_streams = StreamSessions(
+    new_stream,
+    ttl_seconds=getattr(settings, "INFER_STREAM_TTL_SECONDS", 120),
+    max_sessions=getattr(settings, "INFER_STREAM_MAX_SESSIONS", 10000),
+    shm=getattr(settings, "INFER_STREAM_SHM", ""),
+)
+
+
+def _flag(value) -> bool:
+    return str(value or "").lower() in ("1", "true")
+
 
 class InferView(APIView):
+    """
+    POST /api/infer (multipart/form-data)
+      - image: one ROI image
+      - session (optional, or X-Stream-Session header): enables temporal
+        smoothing across this client's frames; adds "stream" to the response
+      - reset (optional): "1" clears that session's state first
+      - roi (optional): "1" means `image` is a full camera frame; the hand is
+        cropped server-side (inference/hands.py, tracked per session). Frames
+        without a hand are not classified: "hand" is null and "label" empty.
+
+    JSON by default. `?format=bin` / `?format=msgpack` (or the matching Accept
+    header) returns the compact encoding from inference/renderers.py instead,
+    with `k` top classes (default 3) and, with `full=1`, the whole probability
+    vector. Errors are always JSON.
+
+    Rate limited per user (INFER_RATE_LIMIT_*): 429 with Retry-After.
+    """
+    authentication_classes = [InferenceJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [InferenceRateThrottle]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + COMPACT_RENDERERS
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if response.status_code >= 400 and is_compact(getattr(request, "accepted_renderer", None)):
+            request.accepted_renderer, request.accepted_media_type = JSONRenderer(), JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
     def post(self, request):
         f = request.FILES.get("image")
@@ -18,6 +69,119 @@ class InferView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        img = Image.open(io.BytesIO(f.read()))
-        out = predict_pil(img)
+        stream = None
+        session = request.data.get("session") or request.headers.get("X-Stream-Session")
+        if session:
+            stream = _streams.get((request.user.pk, str(session)[:64]))
+
+        roi = _flag(request.query_params.get("roi") or request.data.get("roi"))
+        if roi and not getattr(settings, "INFER_ROI_DETECTOR", "skin"):
+            return Response({"detail": "Server-side ROI is disabled."}, status=status.HTTP_400_BAD_REQUEST)
+
+        packed = is_compact(request.accepted_renderer)
+        if packed:
+            try:
+                k = max(1, int(request.query_params.get("k") or request.data.get("k") or 3))
+            except (TypeError, ValueError):
+                return Response({"detail": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            full = _flag(request.query_params.get("full") or request.data.get("full"))
+
+        predict = predict_frame if roi else predict_file
+        try:
+            # one frame at a time per session, so the smoothing state sees them in order
+            with stream.session() if stream is not None else nullcontext():
+                if stream is not None and _flag(request.data.get("reset")):
+                    stream.reset()
+                out = predict(f, stream=stream, with_probs=packed, owner=request.user.pk)
+        except (InvalidImage, PoolInvalid) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (PoolOverloaded, BatcherTimeout):
+            return Response(
+                {"detail": "Inference service is busy, retry shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+        except PoolTimeout:
+            return Response({"detail": "Inference timed out."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except PoolError:
+            return Response(
+                {"detail": "Inference service unavailable."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if out.get("label") is not None:
+            record_inference(request.user, out, source="web")
+        if packed:
+            return Response(compact(out, out.pop("probs"), k=k, full=full, labels_etag=label_map()[1]))
+        return Response(out)
+
+
+class LabelsView(APIView):
+    """
+    GET /api/infer/labels: the class index -> label map that compact /api/infer
+    responses refer to. Send If-None-Match with the ETag to get a 304.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        labels, etag = label_map()
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "public, max-age=3600"}
+        if f'"{etag}"' in request.headers.get("If-None-Match", "") or request.headers.get("If-None-Match") == "*":
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(labels, headers=headers)
+
+
+class InferBatchView(APIView):
+    """
+    POST /api/infer/batch (multipart/form-data)
+      - images: repeated image files, or
+      - archive: one .zip of images / .npz of frames
+      - k (optional): top-k per image, default 3
+
+    Rate limited like /api/infer, at one token per image.
+    """
+    authentication_classes = [InferenceJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [InferenceRateThrottle]
+
+    def throttle_cost(self, request) -> int:
+        archive = request.FILES.get("archive")
+        if archive is not None:
+            return max(1, archive_count(archive, archive.name or ""))
+        return max(1, len(request.FILES.getlist("images")))
+
+    def post(self, request):
+        try:
+            k = max(1, int(request.data.get("k", 3)))
+        except (TypeError, ValueError):
+            return Response({"detail": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        archive = request.FILES.get("archive")
+        if archive is not None:
+            files = [(archive.name or "", archive)]
+        else:
+            files = [(f.name, f) for f in request.FILES.getlist("images")]
+        if not files:
+            return Response(
+                {"detail": "No images. Send repeated 'images' files or one 'archive' (.zip/.npz)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            out = predict_uploads(files, k=k, archive=archive is not None, owner=request.user.pk)
+        except (ValueError, PoolInvalid) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except PoolOverloaded:
+            return Response(
+                {"detail": "Inference service is busy, retry shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+        except PoolTimeout:
+            return Response({"detail": "Inference timed out."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except PoolError:
+            return Response(
+                {"detail": "Inference service unavailable."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         return Response(out)
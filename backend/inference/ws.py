@@ -0,0 +1,203 @@
+import asyncio
+import io
+import json
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.request import validate_host
+from django.utils.http import is_same_domain
+
+from .events import record_inference
+from .predictor import new_stream, predict_file, predict_frame
+
+
+WS_PATH = "/api/infer/ws"
+
+# close codes (4000-4999 are application-defined)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN_ORIGIN = 4403
+
+
+def _headers(scope) -> dict:
+    return {k.decode("latin-1").lower(): v.decode("latin-1") for (k, v) in scope.get("headers", [])}
+
+
+def _raw_token(scope):
+    """
+    Same sources as CookieJWTAuthentication: Authorization header first, then
+    the access cookie. Returns (token or None, came from the cookie).
+    """
+    headers = _headers(scope)
+
+    auth = headers.get("authorization", "")
+    parts = auth.split()
+    if len(parts) == 2 and parts[0].lower() == "bearer":
+        return parts[1], False
+
+    cookie = SimpleCookie()
+    cookie.load(headers.get("cookie", ""))
+    morsel = cookie.get(settings.JWT_AUTH_COOKIE)
+    return (morsel.value, True) if morsel else (None, False)
+
+
+def _origin_allowed(scope) -> bool:
+    """
+    Browsers attach cookies to cross-site WebSocket handshakes and do not
+    apply CORS to them, so a cookie-authenticated socket must come from a page
+    we serve: Origin in CSRF_TRUSTED_ORIGINS, or its host in ALLOWED_HOSTS
+    (the checks channels' OriginValidator makes). No Origin at all means a
+    non-browser client, which cannot be riding someone else's cookie.
+    """
+    origin = _headers(scope).get("origin")
+    if origin is None:
+        return True
+    parts = urlsplit(origin)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False  # includes the opaque "null" origin
+    for trusted in getattr(settings, "CSRF_TRUSTED_ORIGINS", []):
+        t = urlsplit(trusted)
+        if t.scheme == parts.scheme and is_same_domain(parts.netloc, t.netloc):
+            return True
+    return validate_host(parts.hostname, settings.ALLOWED_HOSTS)
+
+
+def _authenticate(raw_token):
+    from api.authentication import CookieJWTAuthentication
+
+    close_old_connections()
+    try:
+        auth = CookieJWTAuthentication()
+        user = auth.get_user(auth.get_validated_token(raw_token))
+    except Exception:
+        return None
+    finally:
+        close_old_connections()
+    return user if user.is_active else None
+
+
+def _predict_bytes(data: bytes, stream=None, owner=None, roi: bool = False):
+    predict = predict_frame if roi else predict_file
+    with stream.session():
+        return predict(io.BytesIO(data), stream=stream, owner=owner)
+
+
+class InferSocket:
+    """
+    ASGI WebSocket endpoint for streaming webcam ROIs.
+
+    The client authenticates once (JWT cookie or Bearer header on the
+    handshake; cookie handshakes must come from an allowed Origin), then
+    sends binary JPEG frames. Each completed prediction is
+    pushed back as a JSON text message. Only the newest unprocessed frame is
+    kept: if the client sends faster than the model runs, older pending frames
+    are dropped (latest-frame-wins) and counted in `dropped`. Each
+    connection carries its own temporal smoothing state ("stream" in every
+    result); a text message {"type": "reset"} clears it. With ?roi=1 on the
+    URL the frames are full camera frames and the hand is cropped server-side
+    (see InferView).
+    """
+
+    async def __call__(self, scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        raw, from_cookie = _raw_token(scope)
+        if from_cookie and not _origin_allowed(scope):
+            await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN_ORIGIN})
+            return
+        user = await sync_to_async(_authenticate, thread_sensitive=False)(raw) if raw else None
+        if user is None:
+            await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+            return
+
+        await send({"type": "websocket.accept"})
+        roi = parse_qs(scope.get("query_string", b"").decode()).get("roi", [""])[0] in ("1", "true") \
+            and bool(getattr(settings, "INFER_ROI_DETECTOR", "skin"))
+        await _Session(user, receive, send, roi=roi).run()
+
+
+class _Session:
+    def __init__(self, user, receive, send, roi: bool = False):
+        self.user = user
+        self.roi = roi
+        self.receive = receive
+        self.send = send
+
+        self.latest = None  # (frame_no, bytes) waiting to be processed
+        self.received = 0
+        self.dropped = 0
+        self.reset = False  # applied by _work between frames, never during one
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.stream = new_stream()
+
+    async def run(self):
+        worker = asyncio.create_task(self._work())
+        try:
+            await self._read()
+        finally:
+            self.closed = True
+            self.ready.set()
+            await worker
+
+    async def _read(self):
+        while True:
+            message = await self.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            data = message.get("bytes")
+            if data is None:
+                self._control(message.get("text"))
+                continue
+
+            self.received += 1
+            if self.latest is not None:
+                self.dropped += 1
+            self.latest = (self.received, data)
+            self.ready.set()
+
+    def _control(self, text):
+        try:
+            msg = json.loads(text or "")
+        except ValueError:
+            return
+        if isinstance(msg, dict) and msg.get("type") == "reset":
+            self.reset = True
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            if self.closed:
+                return
+            if self.latest is None:
+                continue
+
+            frame_no, data = self.latest
+            self.latest = None
+            if self.reset:
+                self.stream.reset()
+                self.reset = False
+
+            try:
+                out = await loop.run_in_executor(None, _predict_bytes, data, self.stream, self.user.pk, self.roi)
+                if out.get("label") is not None:
+                    record_inference(self.user, out, source="ws")
+            except Exception as e:
+                out = {"error": f"Inference failed: {e}"}
+
+            out["frame"] = frame_no
+            out["dropped"] = self.dropped
+            if self.closed:
+                return
+            await self.send({"type": "websocket.send", "text": json.dumps(out, ensure_ascii=False)})
+
+
+infer_socket = InferSocket()
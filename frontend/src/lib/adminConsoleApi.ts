@@ -16,10 +16,40 @@ export async function listModels() {
   return res.data;
 }
 
-export async function uploadModel(fd: FormData) {
-  const res = await api.post("/api/admin/models/upload/", fd, {
-    headers: { "Content-Type": "multipart/form-data" },
-  });
+export type ModelMeta = { name: string; arch: string; version?: string; description?: string };
+
+/**
+ * Chunked, resumable upload (init / PUT chunks / complete). A failed chunk is
+ * retried from the offset the server reports, so only missing bytes are resent.
+ */
+export async function uploadModelChunked(
+  file: File,
+  meta: ModelMeta,
+  onProgress?: (sent: number, total: number) => void,
+  retries = 5,
+) {
+  const init = await api.post("/api/admin/models/uploads/", { ...meta, filename: file.name, size: file.size });
+  const id: string = init.data.id;
+  const chunkSize: number = init.data.chunk_size;
+  let offset: number = init.data.offset;
+
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const res = await api.put(`/api/admin/models/uploads/${id}/`, file.slice(offset, offset + chunkSize), {
+        headers: { "Content-Type": "application/octet-stream", "Upload-Offset": String(offset) },
+      });
+      offset = res.data.offset;
+      failures = 0;
+      onProgress?.(offset, file.size);
+    } catch (err) {
+      if (++failures > retries) throw err;
+      await new Promise((r) => setTimeout(r, 500 * 2 ** failures));
+      offset = (await api.get(`/api/admin/models/uploads/${id}/`)).data.offset;
+    }
+  }
+
+  const res = await api.post(`/api/admin/models/uploads/${id}/complete/`, {});
   return res.data;
 }
 
@@ -28,8 +58,45 @@ export async function toggleModel(id: number, enabled: boolean) {
   return res.data;
 }
 
-export async function activateModel(id: number) {
-  const res = await api.post(`/api/admin/models/${id}/activate/`, {});
+// 409 while the model is being profiled, and when its profile is missing, failed or shows a p95
+// regression; force overrides all but a run in progress
+export async function activateModel(id: number, force = false) {
+  const res = await api.post(`/api/admin/models/${id}/activate/`, force ? { force: true } : {});
+  return res.data;
+}
+
+export async function profileModel(id: number) {
+  const res = await api.post(`/api/admin/models/${id}/profile/`, {});
+  return res.data;
+}
+
+export async function modelUsage(id: number) {
+  const res = await api.get(`/api/admin/models/${id}/usage/`);
+  return res.data;
+}
+
+export async function modelMetrics(id: number, hours = 24) {
+  const res = await api.get(`/api/admin/models/${id}/metrics/`, { params: { hours } });
+  return res.data;
+}
+
+export async function setModelCascade(id: number, opts: { enabled?: boolean; threshold?: number | null }) {
+  const res = await api.post(`/api/admin/models/${id}/cascade/`, opts);
+  return res.data;
+}
+
+export async function cascadeStats(hours = 24) {
+  const res = await api.get("/api/admin/cascade/", { params: { hours } });
+  return res.data;
+}
+
+export async function setModelShadow(id: number, enabled: boolean) {
+  const res = await api.post(`/api/admin/models/${id}/shadow/`, { enabled });
+  return res.data;
+}
+
+export async function shadowStats(hours = 24) {
+  const res = await api.get("/api/admin/shadow/", { params: { hours } });
   return res.data;
 }
 
@@ -8,6 +8,7 @@ type InferResp = {
   confidence: number;
   top3: Top[];
   latency_ms: number;
+  error?: string;
 };
 
 function fmtPct(x: number) {
@@ -32,6 +33,11 @@ export default function InferDemo() {
   const fullCanvasRef = useRef<HTMLCanvasElement | null>(null);
   const roiCanvasRef = useRef<HTMLCanvasElement | null>(null);
 
+  // Streaming transport: one authenticated socket, binary JPEG frames up, JSON results down.
+  // Falls back to the HTTP POST loop whenever the socket is not open.
+  const [useSocket, setUseSocket] = useState(true);
+  const wsRef = useRef<WebSocket | null>(null);
+
 
 
   // ===== Styles (mockup-like glass) =====
@@ -461,6 +467,12 @@ export default function InferDemo() {
       );
     });
   
+    const ws = wsRef.current;
+    if (useSocket && ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(blob); // server keeps only the latest pending frame
+      return;
+    }
+
     const form = new FormData();
     form.append("image", blob, "roi.jpg");
   
@@ -488,6 +500,33 @@ export default function InferDemo() {
   }
   
 
+  // WebSocket lifecycle (only while running)
+  useEffect(() => {
+    if (!running || !useSocket) return;
+
+    const proto = window.location.protocol === "https:" ? "wss" : "ws";
+    const ws = new WebSocket(`${proto}://${window.location.host}/api/infer/ws`);
+    wsRef.current = ws;
+
+    ws.onmessage = (ev) => {
+      const data = JSON.parse(ev.data) as InferResp;
+      if (data.error) {
+        setErr(data.error);
+        return;
+      }
+      setErr(null);
+      setResult(data);
+    };
+    ws.onclose = () => {
+      if (wsRef.current === ws) wsRef.current = null;
+    };
+
+    return () => {
+      if (wsRef.current === ws) wsRef.current = null;
+      ws.close();
+    };
+  }, [running, useSocket]);
+
   // Main loop
   useEffect(() => {
     if (!running) return;
@@ -509,7 +548,7 @@ export default function InferDemo() {
       if (t) clearTimeout(t);
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [running, reqEveryMs, jpegQuality, busy]);
+  }, [running, reqEveryMs, jpegQuality, busy, useSocket]);
 
   useEffect(() => {
     startCam().catch((e) => setErr(e?.message ?? "Camera error"));
@@ -728,6 +767,21 @@ export default function InferDemo() {
                     />
                   </div>
 
+                  <div style={s.optRow}>
+                    <div>
+                      <span style={s.optLabel}>Stream</span>
+                      <span style={s.optSub}>WebSocket</span>
+                    </div>
+                    <div
+                      style={s.toggle}
+                      onClick={() => setUseSocket((x) => !x)}
+                      role="button"
+                      aria-label="Stream over WebSocket"
+                    >
+                      <div style={s.knob(useSocket)} />
+                    </div>
+                  </div>
+
                   <div style={s.optRow}>
                     <div>
                       <span style={s.optLabel}>Two-Hand</span>
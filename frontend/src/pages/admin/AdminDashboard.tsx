@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import "../../styles/dashboard.css";
-import { adminOverview, adminLogout } from "../../lib/adminConsoleApi";
+import { adminOverview, adminLogout, cascadeStats, listModels, modelMetrics, shadowStats } from "../../lib/adminConsoleApi";
 import { useNavigate } from "react-router-dom";
 
 type Overview = {
@@ -12,18 +12,77 @@ type Overview = {
   usage: {
     active_users_7d: number;
     daily_inferences_7d: { day: string; count: number }[];
+    by_model_7d?: {
+      model_id: number | null;
+      count: number;
+      cache_hit_rate: number | null;
+      avg_latency_ms: number | null;
+      avg_confidence: number | null;
+    }[];
   };
 };
 
+type Pcts = { p50: number | null; p95: number | null; p99: number | null };
+
+type ModelMetrics = {
+  model_id: number;
+  count: number;
+  latency_ms: { total?: Pcts };
+  confidence: Pcts;
+};
+
+type CascadeStage = {
+  model_id: number | null;
+  name: string;
+  threshold: number | null;
+  reached: number;
+  answered: number;
+  escalation_rate: number | null;
+};
+
+type Cascade = { enabled: boolean; frames: number; stages: CascadeStage[]; escalated_to_final: number | null };
+
+type ShadowResult = {
+  model_id: number;
+  name: string | null;
+  served_name: string | null;
+  frames: number;
+  agreement: number | null;
+  agreement_top3: number | null;
+  latency_ms: { frame: Pcts };
+  served_forward_ms: Pcts | null;
+};
+
+type Shadow = { sample_rate: number; results: ShadowResult[] };
+
+const ms = (v: number | null | undefined) => (v == null ? "—" : `${Math.round(v)} ms`);
+const pct = (v: number | null | undefined) => (v == null ? "—" : `${(v * 100).toFixed(1)}%`);
+
 export default function AdminDashboard() {
   const nav = useNavigate();
   const [data, setData] = useState<Overview | null>(null);
+  const [names, setNames] = useState<Record<number, string>>({});
+  const [perModel, setPerModel] = useState<Record<number, ModelMetrics>>({});
+  const [cascade, setCascade] = useState<Cascade | null>(null);
+  const [shadow, setShadow] = useState<Shadow | null>(null);
 
   useEffect(() => {
-    adminOverview().then(setData).catch(() => {
-      // if admin session missing
-      nav("/admin/login", { replace: true });
-    });
+    adminOverview()
+      .then(async (o: Overview) => {
+        setData(o);
+        const models: { id: number; name: string }[] = await listModels();
+        setNames(Object.fromEntries(models.map((m) => [m.id, m.name])));
+        // latency / confidence percentiles come from the serving metrics, one request per model
+        const ids = (o.usage.by_model_7d ?? []).flatMap((r) => (r.model_id == null ? [] : [r.model_id]));
+        const rows = await Promise.all(ids.map((id) => modelMetrics(id, 24 * 7).catch(() => null)));
+        setPerModel(Object.fromEntries(rows.filter(Boolean).map((r: ModelMetrics) => [r.model_id, r])));
+      })
+      .catch(() => {
+        // if admin session missing
+        nav("/admin/login", { replace: true });
+      });
+    cascadeStats().then(setCascade).catch(() => {});
+    shadowStats().then(setShadow).catch(() => {});
   }, []);
 
   const activeName =
@@ -115,6 +174,94 @@ export default function AdminDashboard() {
               </div>
             </div>
 
+            <div className="dashPanel">
+              <div className="dashPanelTitle">Models (7 days)</div>
+              <div className="dashPanelBody">
+                {(data?.usage.by_model_7d ?? []).map((r) => {
+                  const m = r.model_id == null ? undefined : perModel[r.model_id];
+                  const lat = m?.latency_ms.total;
+                  return (
+                    <div className="dashRow" key={r.model_id ?? "bundled"}>
+                      <div className="dot" />
+                      <div>
+                        <div className="dashRowTitle">
+                          {r.model_id == null ? "Bundled weights" : names[r.model_id] ?? `Model #${r.model_id}`}
+                        </div>
+                        <div className="dashRowSub">
+                          latency p50 {ms(lat?.p50 ?? r.avg_latency_ms)} • p95 {ms(lat?.p95)} • p99 {ms(lat?.p99)}
+                        </div>
+                        <div className="dashRowSub">
+                          confidence p50 {pct(m?.confidence.p50 ?? r.avg_confidence)} • p95 {pct(m?.confidence.p95)} • p99{" "}
+                          {pct(m?.confidence.p99)}
+                        </div>
+                      </div>
+                      <div className="dashRowMeta">
+                        {r.count} • {pct(r.cache_hit_rate)} cached
+                      </div>
+                    </div>
+                  );
+                })}
+                {data && !data.usage.by_model_7d?.length && <div className="dashRowSub">No inferences yet.</div>}
+                {!data && <div className="dashRowSub">Loading…</div>}
+              </div>
+            </div>
+          </section>
+
+          <section className="dashWide">
+            <div className="dashPanel">
+              <div className="dashPanelTitle">Cascade (24h){cascade && !cascade.enabled ? " — disabled" : ""}</div>
+              <div className="dashPanelBody">
+                {(cascade?.stages ?? []).map((st, i) => (
+                  <div className="dashRow" key={`${st.model_id ?? "bundled"}-${i}`}>
+                    <div className="dot" />
+                    <div>
+                      <div className="dashRowTitle">{st.name}</div>
+                      <div className="dashRowSub">
+                        {st.threshold == null ? "final stage" : `answers at confidence ≥ ${st.threshold}`} • reached by{" "}
+                        {st.reached} • answered {st.answered}
+                      </div>
+                    </div>
+                    <div className="dashRowMeta">{st.threshold == null ? "—" : `${pct(st.escalation_rate)} escalated`}</div>
+                  </div>
+                ))}
+                {cascade && (
+                  <div className="dashRowSub">
+                    {cascade.frames} frames • {pct(cascade.escalated_to_final)} reached the active model
+                  </div>
+                )}
+                {!cascade && <div className="dashRowSub">Loading…</div>}
+              </div>
+            </div>
+
+            <div className="dashPanel">
+              <div className="dashPanelTitle">Shadow evaluation (24h)</div>
+              <div className="dashPanelBody">
+                {(shadow?.results ?? []).map((r) => (
+                  <div className="dashRow" key={`${r.model_id}-${r.served_name}`}>
+                    <div className="dot" />
+                    <div>
+                      <div className="dashRowTitle">
+                        {r.name ?? `Model #${r.model_id}`} vs {r.served_name ?? "—"}
+                      </div>
+                      <div className="dashRowSub">
+                        agreement {pct(r.agreement)} (top-3 {pct(r.agreement_top3)}) • p95 {ms(r.latency_ms.frame.p95)} vs{" "}
+                        {ms(r.served_forward_ms?.p95)}
+                      </div>
+                    </div>
+                    <div className="dashRowMeta">{r.frames} frames</div>
+                  </div>
+                ))}
+                {shadow && !shadow.results.length && (
+                  <div className="dashRowSub">
+                    {shadow.sample_rate > 0 ? "No shadowed frames yet." : "Shadow sampling is off (INFER_SHADOW_SAMPLE_RATE)."}
+                  </div>
+                )}
+                {!shadow && <div className="dashRowSub">Loading…</div>}
+              </div>
+            </div>
+          </section>
+
+          <section className="dashWide">
             <div className="dashPanel">
               <div className="dashPanelTitle">Actions</div>
               <div className="dashPanelBody">
@@ -1,6 +1,15 @@
 import { useEffect, useState } from "react";
 import "../../styles/dashboard.css";
-import { listModels, uploadModel, toggleModel, activateModel, deleteModel } from "../../lib/adminConsoleApi";
+import {
+  listModels,
+  uploadModelChunked,
+  toggleModel,
+  activateModel,
+  deleteModel,
+  profileModel,
+  setModelCascade,
+  setModelShadow,
+} from "../../lib/adminConsoleApi";
 import { useNavigate } from "react-router-dom";
 
 type ModelRow = {
@@ -10,6 +19,11 @@ type ModelRow = {
   version: string;
   enabled: boolean;
   is_active: boolean;
+  cascade_enabled: boolean;
+  cascade_threshold: number | null;
+  shadow_enabled: boolean;
+  profile_status: string;
+  profile_p95_ms: number | null;
   created_at: string;
 };
 
@@ -17,6 +31,7 @@ export default function AdminModels() {
   const nav = useNavigate();
   const [rows, setRows] = useState<ModelRow[]>([]);
   const [busy, setBusy] = useState(false);
+  const [progress, setProgress] = useState<number | null>(null);
   const [err, setErr] = useState<string | null>(null);
 
   async function refresh() {
@@ -32,18 +47,66 @@ export default function AdminModels() {
     e.preventDefault();
     setErr(null);
     setBusy(true);
+    const form = e.currentTarget;
     try {
-      const fd = new FormData(e.currentTarget);
-      await uploadModel(fd);
-      (e.currentTarget as any).reset?.();
+      const fd = new FormData(form);
+      const meta = {
+        name: String(fd.get("name") ?? ""),
+        arch: String(fd.get("arch") ?? ""),
+        version: String(fd.get("version") ?? ""),
+        description: String(fd.get("description") ?? ""),
+      };
+      // chunked + resumable: a dropped connection resends only the missing bytes
+      await uploadModelChunked(fd.get("file") as File, meta, (sent, total) => setProgress(sent / total));
+      form.reset();
       await refresh();
     } catch (ex: any) {
       setErr(ex?.response?.data?.detail ?? "Upload failed");
     } finally {
       setBusy(false);
+      setProgress(null);
     }
   }
 
+  async function run(action: () => Promise<unknown>, failed: string) {
+    setErr(null);
+    try {
+      await action();
+    } catch (ex: any) {
+      setErr(ex?.response?.data?.detail ?? failed);
+    }
+    await refresh();
+  }
+
+  function onCascade(m: ModelRow) {
+    if (m.cascade_enabled) return run(() => setModelCascade(m.id, { enabled: false }), "Cascade update failed");
+    const answer = prompt("Answer at confidence ≥ (0–1]; empty uses the default threshold", m.cascade_threshold?.toString() ?? "");
+    if (answer === null) return;
+    const threshold = answer.trim() === "" ? null : Number(answer);
+    if (Number.isNaN(threshold)) return setErr("threshold must be a number");
+    return run(() => setModelCascade(m.id, { enabled: true, threshold }), "Cascade update failed");
+  }
+
+  async function onActivate(id: number) {
+    setErr(null);
+    try {
+      await activateModel(id);
+    } catch (ex: any) {
+      const detail = ex?.response?.data?.detail ?? "Activation failed";
+      // a still-running profile refuses even with force; the rest can be overridden
+      if (ex?.response?.status !== 409 || /still being profiled/.test(detail) || !confirm(`${detail}\n\nActivate anyway?`)) {
+        setErr(detail);
+        return;
+      }
+      try {
+        await activateModel(id, true);
+      } catch (ex2: any) {
+        setErr(ex2?.response?.data?.detail ?? "Activation failed");
+      }
+    }
+    await refresh();
+  }
+
   return (
     <div className="dashPage">
       <div className="dashShell">
@@ -87,7 +150,7 @@ export default function AdminModels() {
                   <input name="description" placeholder="Description (optional)" />
                   <input name="file" type="file" accept=".pth" required />
                   <button className="dashPrimaryBtn" type="submit" disabled={busy}>
-                    {busy ? "Uploading…" : "Upload"}
+                    {busy ? (progress == null ? "Uploading…" : `Uploading… ${Math.round(progress * 100)}%`) : "Upload"}
                   </button>
                 </form>
               </div>
@@ -108,6 +171,12 @@ export default function AdminModels() {
                         <div className="dashRowSub">
                           {m.arch} • {m.version} • {m.enabled ? "Enabled" : "Disabled"}
                         </div>
+                        <div className="dashRowSub">
+                          profile {m.profile_status || "—"}
+                          {m.profile_p95_ms != null ? ` (p95 ${Math.round(m.profile_p95_ms)} ms)` : ""}
+                          {m.cascade_enabled ? ` • cascade stage ≥ ${m.cascade_threshold ?? "default"}` : ""}
+                          {m.shadow_enabled ? " • shadowing" : ""}
+                        </div>
                       </div>
 
                       <div className="dashRowMeta" style={{ display: "flex", gap: 8 }}>
@@ -124,14 +193,31 @@ export default function AdminModels() {
                         <button
                           className="dashPrimaryBtn"
                           disabled={!m.enabled || m.is_active}
-                          onClick={async () => {
-                            await activateModel(m.id);
-                            await refresh();
-                          }}
+                          onClick={() => onActivate(m.id)}
                         >
                           Activate
                         </button>
 
+                        <button
+                          className="dashGhostBtn"
+                          disabled={m.profile_status === "pending"}
+                          onClick={() => run(() => profileModel(m.id), "Profiling failed")}
+                        >
+                          Profile
+                        </button>
+
+                        <button className="dashGhostBtn" disabled={m.is_active} onClick={() => onCascade(m)}>
+                          {m.cascade_enabled ? "Remove from cascade" : "Add to cascade"}
+                        </button>
+
+                        <button
+                          className="dashGhostBtn"
+                          disabled={m.is_active}
+                          onClick={() => run(() => setModelShadow(m.id, !m.shadow_enabled), "Shadow update failed")}
+                        >
+                          {m.shadow_enabled ? "Stop shadow" : "Shadow"}
+                        </button>
+
                         <button
                             className="dashGhostBtn"
                             onClick={async () => {